@@ -0,0 +1,167 @@
+"""
+Admission control on the audio WebSocket under overload
+
+    python -m benchmarks.backpressure --clients 12 --messages 30 --interval-ms 100
+
+Every client sends short utterances faster than the stand-in models can
+process them, over /ws/{client_id} of the app served by uvicorn. Three
+configurations run in turn:
+  unbounded     queues and budget large enough to take everything (the old loop)
+  drop_oldest   bounded inbound queue, stale audio dropped, global budget
+  coalesce      as drop_oldest, but a full queue merges new audio into its tail
+
+Each utterance carries its message number in its pitch, which the
+stand-in STT reads back, so every response is matched to the audio it
+answers. The report has response lag (receipt minus send time of that audio),
+how long the backlog takes to clear once clients stop, busy messages seen by
+clients, and the server's drop counters.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import numpy as np
+import soundfile as sf
+
+from benchmarks.e2e import SAMPLE_RATE, configure_environment, percentiles, serve
+from benchmarks.postgrest_stub import PostgRESTStub
+from benchmarks.streaming_tts import StageCostTTS
+from benchmarks.stubs import MyMemoryStub
+
+BASE_PITCH = 150.0
+PITCH_STEP = 10.0
+
+CONFIGS = {
+    "unbounded": {"WS_INBOUND_QUEUE": "100000", "WS_INBOUND_MAX_AGE_MS": "1e9", "WS_INBOUND_POLICY": "drop_oldest"},
+    "drop_oldest": {"WS_INBOUND_POLICY": "drop_oldest"},
+    "coalesce": {"WS_INBOUND_POLICY": "coalesce"},
+}
+
+class NumberSTT:
+    """Transcribes an utterance to its message number, costing rtf seconds per second of audio"""
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int = SAMPLE_RATE, language: str = "en") -> str:
+        time.sleep(len(audio) / sample_rate * self.rtf)
+        # The last half second: coalesced audio answers for its newest message
+        tail = audio[-sample_rate // 2:]
+        pitch = np.argmax(np.abs(np.fft.rfft(tail))) * sample_rate / len(tail)
+        return f"message {round((pitch - BASE_PITCH) / PITCH_STEP)}"
+
+class NoDiarization:
+    """One speaker: every voiced segment is a single turn"""
+    def window_embeddings(self, audio: np.ndarray, sample_rate: int):
+        return None
+
+def make_utterance(number: int, seconds: float) -> bytes:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    audio = 0.3 * np.sin(2 * np.pi * (BASE_PITCH + number * PITCH_STEP) * t)
+    with io.BytesIO() as buffer:
+        sf.write(buffer, audio.astype(np.float32), SAMPLE_RATE, format="WAV", subtype="PCM_16")
+        return buffer.getvalue()
+
+async def run_client(port: int, index: int, utterances, args) -> dict:
+    import websockets
+    sent_at, lags, busy = {}, [], []
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/overload-{index}", max_size=None) as websocket:
+        async def receive():
+            while True:
+                message = json.loads(await websocket.recv())
+                if message.get("type") in ("busy", "ready"):
+                    busy.append(message)
+                elif message.get("original_text", "").startswith("message "):
+                    number = int(message["original_text"].split()[1])
+                    lags.append(time.perf_counter() - sent_at[number])
+
+        receiver = asyncio.create_task(receive())
+        for number, wav in enumerate(utterances):
+            sent_at[number] = time.perf_counter()
+            await websocket.send(wav)
+            await asyncio.sleep(args.interval_ms / 1000)
+        finished_sending = time.perf_counter()
+        # Wait for the backlog to clear: no response for idle_seconds
+        answered = -1
+        while answered != len(lags):
+            answered = len(lags)
+            await asyncio.sleep(args.idle_seconds)
+        receiver.cancel()
+    return {
+        "lags": lags,
+        "busy": sum(1 for m in busy if m["type"] == "busy"),
+        "ready": sum(1 for m in busy if m["type"] == "ready"),
+        "drain_seconds": max(0.0, time.perf_counter() - args.idle_seconds - finished_sending),
+    }
+
+async def run_config(app_main, port: int, args) -> dict:
+    utterances = [make_utterance(number, args.seconds) for number in range(args.messages)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_client(port, i, utterances, args) for i in range(args.clients)))
+    lags = [lag for result in results for lag in result["lags"]]
+    return {
+        "seconds": time.perf_counter() - start,
+        "responses": len(lags),
+        "lag": percentiles(lags),
+        "drain_seconds": max(result["drain_seconds"] for result in results),
+        "busy_messages": sum(result["busy"] for result in results),
+        "ready_messages": sum(result["ready"] for result in results),
+        "server": app_main.admission.stats(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=12)
+    parser.add_argument("--messages", type=int, default=30, help="Utterances per client")
+    parser.add_argument("--interval-ms", type=float, default=100.0, help="Time between a client's utterances")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Length of each utterance")
+    parser.add_argument("--stt-rtf", type=float, default=0.3)
+    parser.add_argument("--budget", type=int, default=4, help="ADMISSION_MAX_CONCURRENT for the bounded configs")
+    parser.add_argument("--queue", type=int, default=4, help="WS_INBOUND_QUEUE for the bounded configs")
+    parser.add_argument("--max-age-ms", type=float, default=2000.0)
+    parser.add_argument("--idle-seconds", type=float, default=2.0, help="Quiet time that ends a client's run")
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--translator-latency-ms", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=54350)
+    args = parser.parse_args()
+
+    mymemory = MyMemoryStub(latency=args.translator_latency_ms / 1000).start()
+    supabase = PostgRESTStub()
+    supabase.serve_in_thread(args.port + 1)
+    configure_environment(args, mymemory, args.port + 1)
+
+    import main as app_main
+    from src.services.admission import AdmissionController
+    from src.services.translation_service import TranslationService
+    app_main.translation_service = TranslationService(
+        NumberSTT(args.stt_rtf), app_main.translator, StageCostTTS(), NoDiarization(),
+        app_main.storage_service, app_main.db_client, vad=app_main.vad
+    )
+    server, _ = serve(app_main.app, args.port)
+
+    reports = {}
+    for name in args.configs.split(","):
+        bounded = name != "unbounded"
+        os.environ.update({"WS_INBOUND_QUEUE": str(args.queue), "WS_INBOUND_MAX_AGE_MS": str(args.max_age_ms)})
+        os.environ.update(CONFIGS[name])
+        app_main.admission = AdmissionController(
+            max_concurrent=args.budget if bounded else 100000,
+            max_wait_ms=args.max_age_ms if bounded else 1e9
+        )
+        reports[name] = asyncio.run(run_config(app_main, args.port, args))
+    server.should_exit = True
+    mymemory.stop()
+
+    sent = args.clients * args.messages
+    print(f"{args.clients} clients x {args.messages} utterances of {args.seconds:.1f} s every {args.interval_ms:.0f} ms")
+    print(f"{'config':<12} {'answered':>9} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'drain_s':>8} "
+          f"{'busy':>5} {'full':>5} {'stale':>6} {'merged':>7} {'shed':>5}")
+    for name, report in reports.items():
+        lag, stats = report["lag"], report["server"]
+        print(f"{name:<12} {report['responses']:>4}/{sent:<4} {lag['p50_ms'] or 0:>8.0f} {lag['p95_ms'] or 0:>8.0f} "
+              f"{lag['p99_ms'] or 0:>8.0f} {report['drain_seconds']:>8.1f} {report['busy_messages']:>5} "
+              f"{stats['dropped_full']:>5} {stats['dropped_stale']:>6} {stats['coalesced']:>7} {stats['shed']:>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Broadcast rooms under load: one speaker, hundreds of listeners
+
+    python -m benchmarks.broadcast --listeners 300 --languages es,fr,de,it,pt --turns 6
+
+The app is served by uvicorn with the same local stand-ins as benchmarks.e2e.
+Every listener is a real WebSocket client joined to one room with its own
+target language; most speak the binary protocol with Opus audio, a few JSON.
+--stalled listeners (on JSON, the largest frames) never read: their sockets
+back up, their send queues drop the oldest messages, and the keepalive ping
+eventually disconnects them, while everyone else keeps receiving on time.
+
+The report has delivery latency (from the room's fan-out to a listener
+receiving the turn), the translation and synthesis calls actually made against
+what one pipeline per listener would need, and messages dropped per listener.
+"""
+import argparse
+import asyncio
+import os
+import time
+import numpy as np
+
+from benchmarks.e2e import SAMPLE_RATE, StandInSTT, configure_environment, make_fixtures, percentiles, serve
+from benchmarks.diarization import SpectralDiarization
+from benchmarks.postgrest_stub import PostgRESTStub
+from benchmarks.streaming_tts import StageCostTTS
+from benchmarks.stubs import MyMemoryStub
+
+ROOM = "bench-room"
+
+class CountingTTS(StageCostTTS):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def synthesize(self, text: str, lang: str = "en", voice: str = "default") -> np.ndarray:
+        self.calls += 1
+        return super().synthesize(text, lang, voice)
+
+async def listen(port: int, index: int, language: str, binary: bool, stalled: bool, received: list, stop: asyncio.Event):
+    import websockets
+    query = f"room={ROOM}&role=listener&target_lang={language}"
+    if binary:
+        query += "&protocol=binary&audio=opus"
+    async with websockets.connect(f"ws://127.0.0.1:{port}/ws/listener-{index}?{query}", max_size=None, max_queue=1) as websocket:
+        if binary:
+            await websocket.recv()  # hello
+        if stalled:
+            await stop.wait()
+            return
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(websocket.recv(), 0.2)
+            except asyncio.TimeoutError:
+                continue
+            received.append(time.perf_counter())
+
+async def count_turns(service, wav: bytes, session_id: str) -> int:
+    """Speaker turns the room will broadcast for one fixture, found the way the pipeline finds them"""
+    from src.services.ws_protocol import WebSocketProtocol
+    audio = WebSocketProtocol().read_audio(wav)  # 16-bit, as the server hears it
+    turns = 0
+    for _, _, segment in service.vad.segments(audio, SAMPLE_RATE):
+        turns += len(await service.diarize(segment, SAMPLE_RATE, session_id))
+    return turns
+
+async def speak(port: int, service, fixtures):
+    import websockets
+    uri = f"ws://127.0.0.1:{port}/ws/speaker?room={ROOM}&role=speaker&source_lang=en"
+    async with websockets.connect(uri, max_size=None) as websocket:
+        for _, wav in fixtures:
+            # Speakers are tracked across a session, so count in a session that hears the same fixtures
+            turns = await count_turns(service, wav, "count")
+            await websocket.send(wav)
+            # The speaker gets one transcript back per broadcast turn
+            for _ in range(turns):
+                await asyncio.wait_for(websocket.recv(), 60)
+    service.end_session("count")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listeners", type=int, default=300)
+    parser.add_argument("--languages", default="es,fr,de,it,pt")
+    parser.add_argument("--json-share", type=float, default=0.1, help="Share of listeners on the JSON protocol")
+    parser.add_argument("--stalled", type=int, default=5, help="Listeners that never read")
+    parser.add_argument("--queue-size", type=int, default=4, help="ROOM_QUEUE_SIZE, messages per listener")
+    parser.add_argument("--turns", type=int, default=6, help="Fixtures the speaker sends")
+    parser.add_argument("--seconds", type=float, default=8.0)
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--stt-rtf", type=float, default=0.05)
+    parser.add_argument("--translator-latency-ms", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=54340)
+    args = parser.parse_args()
+    languages = args.languages.split(",")
+
+    mymemory = MyMemoryStub(latency=args.translator_latency_ms / 1000).start()
+    supabase = PostgRESTStub()
+    supabase.serve_in_thread(args.port + 1)
+    configure_environment(args, mymemory, args.port + 1)
+    os.environ["ROOM_QUEUE_SIZE"] = str(args.queue_size)
+
+    import main as app_main
+    from src.services.translation_service import TranslationService
+    tts = CountingTTS()
+    app_main.translation_service = TranslationService(
+        StandInSTT(args.stt_rtf), app_main.translator, tts, SpectralDiarization(),
+        app_main.storage_service, app_main.db_client, vad=app_main.vad
+    )
+    server, _ = serve(app_main.app, args.port)
+
+    # Fan-out times, recorded by the server thread on the shared perf_counter clock
+    fanned_out = []
+    room = app_main.room_manager.speaker_joined(ROOM)  # Keeps the room while listeners come and go
+    broadcast = room.broadcast
+
+    def timed_broadcast(responses):
+        fanned_out.append(time.perf_counter())
+        broadcast(responses)
+
+    room.broadcast = timed_broadcast
+
+    async def run():
+        stop = asyncio.Event()
+        received = [[] for _ in range(args.listeners)]
+        stalled = set(range(args.stalled))
+        json_every = max(1, round(1 / args.json_share)) if args.json_share > 0 else None
+        tasks = [
+            asyncio.create_task(listen(
+                args.port, i, languages[i % len(languages)],
+                binary=i not in stalled and not (json_every and i % json_every == 0), stalled=i in stalled,
+                received=received[i], stop=stop
+            ))
+            for i in range(args.listeners)
+        ]
+        while len(room.listeners) < args.listeners:
+            await asyncio.sleep(0.05)
+        fixtures = make_fixtures(args.turns, args.seconds, args.speakers)
+        mymemory_before = mymemory.requests
+        start = time.perf_counter()
+        await speak(args.port, app_main.translation_service, fixtures)
+        elapsed = time.perf_counter() - start
+        # Let the last fan-out reach everyone who reads
+        deadline = time.perf_counter() + 10
+        while time.perf_counter() < deadline and any(
+            len(times) < len(fanned_out) for i, times in enumerate(received) if i not in stalled
+        ):
+            await asyncio.sleep(0.1)
+        room_stats = room.stats()
+        room_stats["stalled_joined"] = sum(1 for i in stalled if f"listener-{i}" in room.listeners)
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return room_stats["broadcasts"], elapsed, received, stalled, room_stats, mymemory.requests - mymemory_before
+
+    turns, elapsed, received, stalled, room_stats, translations = asyncio.run(run())
+    server.should_exit = True
+    mymemory.stop()
+
+    latencies = []
+    for i, times in enumerate(received):
+        if i in stalled:
+            continue
+        # Listeners joined before the first turn, so message k is the k-th fan-out
+        latencies.extend(t - fanned_out[k] for k, t in enumerate(times) if k < len(fanned_out))
+    readers = args.listeners - len(stalled)
+    complete = sum(1 for i, times in enumerate(received) if i not in stalled and len(times) == len(fanned_out))
+    print(f"{args.listeners} listeners in {len(languages)} languages, {turns} speaker turns in {elapsed:.1f} s")
+    lat = percentiles(latencies)
+    print(f"delivery latency: p50 {lat['p50_ms'] or 0:.1f} ms, p95 {lat['p95_ms'] or 0:.1f} ms, p99 {lat['p99_ms'] or 0:.1f} ms")
+    print(f"reading listeners with every turn: {complete}/{readers}")
+    print(f"{'work':<12} {'actual':>8} {'per-listener':>13}")
+    print(f"{'stt':<12} {turns:>8} {turns * args.listeners:>13}")
+    print(f"{'translate':<12} {translations:>8} {turns * args.listeners:>13}")
+    print(f"{'tts':<12} {tts.calls:>8} {turns * args.listeners:>13}")
+    print(f"{'encode':<12} {room_stats['encodes']:>8} {turns * args.listeners:>13}")
+    print(f"stalled listeners: {room_stats['stalled_joined']}/{len(stalled)} still joined, "
+          f"{room_stats['dropped']} messages dropped, {room_stats['queued']} still queued")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+End-to-end benchmark of the speech translation service with local stand-ins
+
+    python -m benchmarks.e2e --requests 40 --concurrency 8 --output runs/today.json
+    python -m benchmarks.e2e --compare runs/yesterday.json --output runs/today.json
+
+Nothing leaves the machine: MyMemory, Supabase (REST and Storage) run as
+local stubs, and the speech models are deterministic stand-ins whose cost
+grows with the audio or text they process. Fixtures are synthetic
+conversations: harmonic voices taking turns, with pauses between them.
+
+Three drivers run in turn, each at --concurrency:
+  pipeline    TranslationService.process_audio called directly
+  websocket   audio sent over /ws/{client_id} to the app served by uvicorn
+  translate   GET /translate against the same server
+
+The report has throughput, p50/p95/p99 latency per driver and per pipeline
+stage, real-time factor (processing seconds per second of audio) and peak
+RSS. With --compare, latencies and throughput are checked against an earlier
+report and the run exits non-zero when one is worse by more than --tolerance.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import soundfile as sf
+
+from benchmarks.diarization import SAMPLE_RATE, SpectralDiarization, make_conversation
+from benchmarks.postgrest_stub import PostgRESTStub
+from benchmarks.streaming_tts import StageCostTTS
+from benchmarks.stubs import MyMemoryStub
+
+WORDS = ("the train leaves at nine from the north station please bring your ticket and a coat "
+         "because the weather will turn cold later tonight").split()
+
+class StandInSTT:
+    """Deterministic transcriber costing rtf seconds per second of audio, ~2.5 words per second"""
+    def __init__(self, rtf: float = 0.05):
+        self.rtf = rtf
+
+    def transcribe(self, audio: np.ndarray, sample_rate: int = SAMPLE_RATE, language: str = "en") -> str:
+        seconds = len(audio) / sample_rate
+        time.sleep(seconds * self.rtf)
+        start = int(np.abs(audio).sum() * 1000) % len(WORDS)
+        return " ".join(WORDS[(start + i) % len(WORDS)] for i in range(max(1, int(seconds * 2.5))))
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    ms = np.array(values) * 1000
+    return {f"p{q}_ms": float(np.percentile(ms, q)) for q in (50, 95, 99)}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def make_fixtures(count: int, seconds: float, speakers: int):
+    fixtures = []
+    for seed in range(count):
+        audio, _ = make_conversation(speakers, seconds, seed=seed)
+        with io.BytesIO() as buffer:
+            sf.write(buffer, audio, SAMPLE_RATE, format="WAV", subtype="PCM_16")
+            fixtures.append((audio, buffer.getvalue()))
+    return fixtures
+
+def configure_environment(args, mymemory: MyMemoryStub, supabase_port: int):
+    """Point the app at the stubs before main is imported; quotas high enough not to throttle the run"""
+    os.environ.update({
+        "SUPABASE_URL": f"http://127.0.0.1:{supabase_port}",
+        "SUPABASE_KEY": "stub.stub.stub",
+        "MYMEMORY_API_URL": mymemory.url,
+        "TRANSLATOR_RATE": "100000",
+        "TRANSLATOR_BURST": "100000",
+        "USER_RATE": "100000",
+        "USER_BURST": "100000",
+        "RATE_LIMIT_DIR": tempfile.mkdtemp(prefix="ratelimit_"),
+        "DB_JOURNAL_DIR": tempfile.mkdtemp(prefix="journal_"),
+        "AUTH_VERIFY": "0",
+    })
+    os.environ.pop("ENABLE_STT", None)
+
+def build_translation_service(main, args):
+    """The app's TranslationService, wired to stand-in models instead of the model pool"""
+    from src.services.translation_service import TranslationService
+    from src.services.tts_cache import CachedTTS, TTSCache
+    return TranslationService(
+        StandInSTT(args.stt_rtf),
+        main.translator,
+        CachedTTS(StageCostTTS(), TTSCache()) if args.tts_cache else StageCostTTS(),
+        SpectralDiarization(),
+        main.storage_service,
+        main.db_client,
+        vad=main.vad
+    )
+
+async def drive(items, concurrency: int, one) -> dict:
+    """Run one(item) over items with at most concurrency in flight"""
+    gate = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def run(item):
+        nonlocal errors
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await one(item)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                errors += 1
+                print(f"Benchmark request failed: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(item) for item in items))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(items),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        **percentiles(latencies),
+    }
+
+async def run_pipeline(service, fixtures, args) -> tuple:
+    turns = {}
+    rtfs = []
+
+    async def one(index):
+        audio, _ = fixtures[index % len(fixtures)]
+        start = time.perf_counter()
+        responses = await service.process_audio(audio, SAMPLE_RATE, "en", "es", user_id="bench-user",
+                                                session_id=f"pipeline-{index}")
+        rtfs.append((time.perf_counter() - start) / (len(audio) / SAMPLE_RATE))
+        if any(response.error for response in responses):
+            raise RuntimeError(responses[0].error)
+        turns[index % len(fixtures)] = len(responses)
+
+    report = await drive(list(range(args.requests)), args.concurrency, one)
+    report["rtf_mean"] = float(np.mean(rtfs)) if rtfs else None
+    report["rtf_p95"] = float(np.percentile(rtfs, 95)) if rtfs else None
+    return report, turns
+
+async def run_websocket(port: int, fixtures, turns, args) -> dict:
+    import websockets
+    first_response, rtfs = [], []
+
+    async def one(index):
+        audio, wav = fixtures[index % len(fixtures)]
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws/bench-{index}", max_size=None) as websocket:
+            start = time.perf_counter()
+            await websocket.send(wav)
+            # One message per speaker turn; the pipeline run counted them for each fixture
+            for received in range(turns.get(index % len(fixtures), 1)):
+                message = json.loads(await websocket.recv())
+                if received == 0:
+                    first_response.append(time.perf_counter() - start)
+                if message.get("error"):
+                    raise RuntimeError(message["error"])
+            rtfs.append((time.perf_counter() - start) / (len(audio) / SAMPLE_RATE))
+
+    report = await drive(list(range(args.requests)), args.concurrency, one)
+    report["first_response"] = percentiles(first_response)
+    report["rtf_mean"] = float(np.mean(rtfs)) if rtfs else None
+    report["rtf_p95"] = float(np.percentile(rtfs, 95)) if rtfs else None
+    return report
+
+async def run_translate(port: int, args) -> dict:
+    import httpx
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60.0) as client:
+        async def one(index):
+            response = await client.get("/translate", params={
+                "text": f"where is platform {index}", "source_lang": "en", "target_lang": "es"
+            })
+            if response.status_code != 200 or "error" in response.json():
+                raise RuntimeError(response.text)
+
+        return await drive(list(range(args.translate_requests)), args.concurrency, one)
+
+def serve(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws_max_size=64 * 1024 * 1024))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+# Metrics compared between runs: path into the report, and whether higher is better
+COMPARED = [
+    (("drivers", "pipeline", "p95_ms"), False),
+    (("drivers", "pipeline", "throughput_rps"), True),
+    (("drivers", "pipeline", "rtf_mean"), False),
+    (("drivers", "websocket", "p95_ms"), False),
+    (("drivers", "websocket", "throughput_rps"), True),
+    (("drivers", "translate", "p95_ms"), False),
+    (("drivers", "translate", "throughput_rps"), True),
+    (("peak_rss_mb",), False),
+]
+
+def compare(report: dict, baseline: dict, tolerance: float) -> bool:
+    """Print changes against baseline; False if any metric regressed past tolerance"""
+    ok = True
+    print(f"\n{'metric':<36} {'baseline':>10} {'now':>10} {'change':>8}")
+    for path, higher_is_better in COMPARED:
+        old, new = baseline, report
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else None
+            new = new.get(key, {}) if isinstance(new, dict) else None
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+            continue
+        change = (new - old) / old
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"{'.'.join(path):<36} {old:>10.2f} {new:>10.2f} {change:>+7.0%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40, help="Audio requests per audio driver")
+    parser.add_argument("--translate-requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--fixtures", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=12.0, help="Length of each fixture")
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--stt-rtf", type=float, default=0.05, help="Stand-in STT cost per second of audio")
+    parser.add_argument("--translator-latency-ms", type=float, default=30.0)
+    parser.add_argument("--db-latency-ms", type=float, default=10.0)
+    parser.add_argument("--tts-cache", action="store_true", help="Put the TTS cache in front of the stand-in")
+    parser.add_argument("--drivers", default="pipeline,websocket,translate")
+    parser.add_argument("--port", type=int, default=54330)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+    drivers = args.drivers.split(",")
+
+    mymemory = MyMemoryStub(latency=args.translator_latency_ms / 1000).start()
+    supabase = PostgRESTStub()
+    supabase.serve_in_thread(args.port + 1)
+    supabase.latency = args.db_latency_ms / 1000
+    configure_environment(args, mymemory, args.port + 1)
+
+    import main as app_main
+    app_main.translation_service = build_translation_service(app_main, args)
+    service = app_main.translation_service
+    server, _ = serve(app_main.app, args.port)  # Runs startup: write-behind queues and upload workers
+
+    fixtures = make_fixtures(args.fixtures, args.seconds, args.speakers)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "args": vars(args),
+        "audio_seconds_per_request": args.seconds,
+        "drivers": {},
+    }
+
+    async def run_all():
+        # The pipeline run also counts responses per fixture for the WebSocket clients
+        pipeline, turns = await run_pipeline(service, fixtures, args)
+        if "pipeline" in drivers:
+            report["drivers"]["pipeline"] = pipeline
+        if "websocket" in drivers:
+            report["drivers"]["websocket"] = await run_websocket(args.port, fixtures, turns, args)
+        if "translate" in drivers:
+            report["drivers"]["translate"] = await run_translate(args.port, args)
+
+    asyncio.run(run_all())
+    report["stages"] = service.stats()
+    report["peak_rss_mb"] = peak_rss_mb()
+    report["upstreams"] = {"mymemory_requests": mymemory.requests, "supabase_requests": supabase.requests}
+    server.should_exit = True
+    mymemory.stop()
+
+    print(f"{'driver':<10} {'req':>5} {'err':>4} {'req/s':>7} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'rtf':>6}")
+    for name, result in report["drivers"].items():
+        rtf = f"{result['rtf_mean']:.3f}" if result.get("rtf_mean") is not None else "-"
+        print(f"{name:<10} {result['requests']:>5} {result['errors']:>4} {result['throughput_rps']:>7.1f} "
+              f"{result['p50_ms'] or 0:>8.0f} {result['p95_ms'] or 0:>8.0f} {result['p99_ms'] or 0:>8.0f} {rtf:>6}")
+    print(f"\n{'stage':<12} {'items':>6} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'wait_ms':>8} {'max_queue':>9}")
+    for name, stage in report["stages"]["stages"].items():
+        print(f"{name:<12} {stage['items']:>6} {stage['p50_ms'] or 0:>8.1f} {stage['p95_ms'] or 0:>8.1f} "
+              f"{stage['p99_ms'] or 0:>8.1f} {stage['mean_wait_ms'] or 0:>8.1f} {stage['max_queue_depth']:>9}")
+    print(f"bottleneck: {report['stages']['bottleneck']}, peak RSS {report['peak_rss_mb']:.0f} MB")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
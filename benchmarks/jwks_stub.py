@@ -0,0 +1,89 @@
+"""
+Local stand-in for the Supabase auth JWKS endpoint, with key rotation
+
+    python -m benchmarks.jwks_stub --port 54322
+    AUTH_JWKS_URL=http://127.0.0.1:54322/auth/v1/.well-known/jwks.json uvicorn main:app
+
+Serves symmetric (oct/HS256) keys so it runs without the cryptography
+package; RS256 keys are added with --alg RS256 when it is installed.
+POST /_rotate adds a new signing key and retires the oldest one.
+"""
+import argparse
+import base64
+import json
+import secrets
+import threading
+import time
+from typing import List, Optional
+
+import jwt
+from fastapi import FastAPI
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+class JWKSStub:
+    def __init__(self, algorithm: str = "HS256", keep: int = 2):
+        self.algorithm = algorithm
+        self.keep = keep
+        self.keys: List[dict] = []  # (public JWK, signing key) pairs, newest last
+        self.fetches = 0
+        self.rotate()
+        self.app = self._build()
+
+    def rotate(self) -> str:
+        kid = secrets.token_hex(8)
+        if self.algorithm == "RS256":
+            from cryptography.hazmat.primitives.asymmetric import rsa
+            private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+            public = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private.public_key()))
+            self.keys.append({"jwk": {**public, "kid": kid, "alg": "RS256", "use": "sig"}, "signing_key": private})
+        else:
+            secret = secrets.token_bytes(32)
+            jwk = {"kty": "oct", "kid": kid, "alg": "HS256", "use": "sig", "k": _b64(secret)}
+            self.keys.append({"jwk": jwk, "signing_key": secret})
+        del self.keys[:-self.keep]
+        return kid
+
+    def issue(self, sub: str, ttl: float = 3600, kid: Optional[str] = None, audience: str = "authenticated") -> str:
+        """A token for sub, signed with the newest key (or kid)"""
+        key = next((k for k in self.keys if k["jwk"]["kid"] == kid), self.keys[-1])
+        claims = {"sub": sub, "aud": audience, "role": "authenticated", "exp": int(time.time() + ttl)}
+        return jwt.encode(claims, key["signing_key"], algorithm=self.algorithm, headers={"kid": key["jwk"]["kid"]})
+
+    def _build(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.get("/auth/v1/.well-known/jwks.json")
+        async def jwks():
+            self.fetches += 1
+            return {"keys": [key["jwk"] for key in self.keys]}
+
+        @app.post("/_rotate")
+        async def rotate():
+            return {"kid": self.rotate()}
+
+        return app
+
+    def serve_in_thread(self, port: int) -> threading.Thread:
+        """Run on 127.0.0.1:port in a daemon thread and wait until it accepts requests"""
+        import uvicorn
+        server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        return thread
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=54322)
+    parser.add_argument("--alg", choices=["HS256", "RS256"], default="HS256")
+    args = parser.parse_args()
+    stub = JWKSStub(args.alg)
+    print(f"sample token: {stub.issue('00000000-0000-0000-0000-000000000000')}")
+    import uvicorn
+    uvicorn.run(stub.app, host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Throughput vs added latency of dynamic micro-batching
+
+    python -m benchmarks.micro_batching --clients 32 --requests 20
+    python -m benchmarks.micro_batching --model whisper   # needs openai-whisper
+
+The default model is a stack of dense layers, which has the same shape of
+cost as transformer inference on CPU: a batched matmul costs far less than
+the same number of batch-size-1 calls.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+
+from src.services.batching import BatchedModel
+
+class DenseStackModel:
+    """Deterministic stand-in with a batched and an unbatched entry point"""
+    def __init__(self, dim: int = 1024, layers: int = 8):
+        rng = np.random.default_rng(0)
+        self.weights = [rng.standard_normal((dim, dim), dtype=np.float32) / np.sqrt(dim) for _ in range(layers)]
+        self.dim = dim
+
+    def infer(self, x: np.ndarray) -> float:
+        return self.infer_batch([x])[0]
+
+    def infer_batch(self, xs) -> list:
+        h = np.stack(xs)
+        for w in self.weights:
+            h = np.tanh(h @ w)
+        return [float(row.sum()) for row in h]
+
+class SerialModel:
+    """Model handle that runs one call at a time, like a single model worker process"""
+    def __init__(self, model):
+        self.model = model
+        self.lock = asyncio.Lock()
+
+    async def call(self, method: str, *args, session_id=None, **kwargs):
+        async with self.lock:
+            return await asyncio.to_thread(getattr(self.model, method), *args, **kwargs)
+
+async def run(model, method: str, batch_method: str, make_input, clients: int, requests: int,
+              max_batch_size: int, max_wait_ms: float) -> dict:
+    handle = BatchedModel(SerialModel(model), method, batch_method, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    latencies = []
+
+    async def client(c: int):
+        for i in range(requests):
+            start = time.perf_counter()
+            await handle.call(method, make_input(c, i))
+            latencies.append(time.perf_counter() - start)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    wall = time.perf_counter() - wall
+    ms = np.array(latencies) * 1000
+    return {
+        "max_batch": max_batch_size,
+        "max_wait_ms": max_wait_ms,
+        "throughput_rps": clients * requests / wall,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_batch": handle.stats()["mean_batch_size"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["dense", "whisper"], default="dense")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16")
+    parser.add_argument("--waits", default="2,10")
+    args = parser.parse_args()
+
+    if args.model == "whisper":
+        from src.services.speech_to_text import WhisperSTTService
+        model, method, batch_method = WhisperSTTService("tiny"), "transcribe", "transcribe_batch"
+        rng = np.random.default_rng(0)
+        clip = (0.1 * rng.standard_normal(16000 * 3)).astype(np.float32)
+        make_input = lambda c, i: clip
+    else:
+        model, method, batch_method = DenseStackModel(), "infer", "infer_batch"
+        rng = np.random.default_rng(0)
+        inputs = rng.standard_normal((64, model.dim), dtype=np.float32)
+        make_input = lambda c, i: inputs[(c + i) % len(inputs)]
+
+    print(f"{'batch':>5} {'wait_ms':>7} {'rps':>8} {'p50_ms':>8} {'p99_ms':>8} {'mean_batch':>10}")
+    for max_wait_ms in [float(w) for w in args.waits.split(",")]:
+        for max_batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+            report = asyncio.run(run(
+                model, method, batch_method, make_input,
+                args.clients, args.requests, max_batch_size, max_wait_ms
+            ))
+            print(f"{report['max_batch']:>5} {report['max_wait_ms']:>7.1f} {report['throughput_rps']:>8.1f} "
+                  f"{report['p50_ms']:>8.1f} {report['p99_ms']:>8.1f} {report['mean_batch']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+In-memory stand-in for the Supabase REST (PostgREST) and Storage endpoints, for local runs
+
+    python -m benchmarks.postgrest_stub --port 54321
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=stub.stub.stub uvicorn main:app
+
+Accepts single and bulk inserts/upserts into any table, honours
+on_conflict + Prefer: resolution=ignore-duplicates, answers selects with
+eq/in/lt/gte/wfts filters, and/or trees, order and limit, and updates. Storage takes object uploads and TUS resumable uploads. It
+can be told to fail or slow down to simulate an outage:
+
+    curl -X POST 'http://127.0.0.1:54321/_control?fail=1&latency_ms=50'
+"""
+import argparse
+import asyncio
+import base64
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from fastapi import FastAPI, Request, Response
+
+_LOGIC = re.compile(r'(and|or)\((.*)\)$')
+
+def _split_conditions(text: str) -> List[str]:
+    """Split a logic tree on top-level commas, outside quotes and parentheses"""
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    return parts + [current]
+
+def _condition(row: dict, column: str, expression: str) -> bool:
+    operator, _, value = expression.partition(".")
+    value = value.strip('"')
+    actual = row.get(column)
+    if operator.startswith("wfts"):
+        text = str(row.get("original_text", "")) + " " + str(row.get("translated_text", ""))
+        return all(word.lower() in text.lower().split() for word in value.split())
+    if operator == "eq":
+        return str(actual) == value
+    if operator == "in":
+        return str(actual) in [item.strip('"') for item in _split_conditions(value.strip("()"))]
+    # ISO timestamps and uuids compare correctly as strings
+    return {"lt": str(actual) < value, "lte": str(actual) <= value,
+            "gt": str(actual) > value, "gte": str(actual) >= value}[operator]
+
+def _tree(row: dict, text: str) -> bool:
+    match = _LOGIC.match(text)
+    if match:
+        results = [_tree(row, part) for part in _split_conditions(match.group(2))]
+        return all(results) if match.group(1) == "and" else any(results)
+    column, _, expression = text.partition(".")
+    return _condition(row, column, expression)
+
+def _matches(row: dict, params) -> bool:
+    for key, value in params.multi_items():
+        if key in ("select", "order", "limit", "offset"):
+            continue
+        if key in ("or", "and"):
+            if not _tree(row, f"{key}{value}"):
+                return False
+        elif not _condition(row, key, value):
+            return False
+    return True
+
+class PostgRESTStub:
+    def __init__(self):
+        self.tables: Dict[str, List[dict]] = defaultdict(list)
+        self.objects: Dict[str, bytes] = {}
+        self.uploads: Dict[str, dict] = {}
+        self.fail_chunks = 0
+        self.fail = False
+        self.latency = 0.0
+        self.requests = 0
+        self.app = self._build()
+
+    def _build(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/_control")
+        async def control(fail: int = 0, latency_ms: float = 0.0):
+            self.fail = bool(fail)
+            self.latency = latency_ms / 1000
+            return {"fail": self.fail, "latency_ms": latency_ms}
+
+        @app.post("/rest/v1/{table}")
+        async def insert(table: str, request: Request):
+            self.requests += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.fail:
+                return Response(status_code=503, content='{"message":"Service Unavailable"}',
+                                media_type="application/json")
+            body = await request.json()
+            rows = body if isinstance(body, list) else [body]
+            prefer = request.headers.get("prefer", "")
+            conflict = request.query_params.get("on_conflict")
+            if conflict and "ignore-duplicates" in prefer:
+                seen = {row.get(conflict) for row in self.tables[table]}
+                rows = [row for row in rows if row.get(conflict) not in seen]
+            self.tables[table].extend(rows)
+            if "return=minimal" in prefer:
+                return Response(status_code=201)
+            return Response(status_code=201, content=json.dumps(rows), media_type="application/json")
+
+        @app.patch("/rest/v1/{table}")
+        async def update(table: str, request: Request):
+            self.requests += 1
+            if self.fail:
+                return Response(status_code=503, content='{"message":"Service Unavailable"}',
+                                media_type="application/json")
+            changes = await request.json()
+            rows = [row for row in self.tables[table] if _matches(row, request.query_params)]
+            for row in rows:
+                row.update(changes)
+            if "return=representation" not in request.headers.get("prefer", ""):
+                return Response(status_code=204)
+            columns = request.query_params.get("select", "*")
+            if columns != "*":
+                rows = [{column: row.get(column) for column in columns.split(",")} for row in rows]
+            return rows
+
+        @app.post("/storage/v1/object/{bucket}/{path:path}")
+        async def upload_object(bucket: str, path: str, request: Request):
+            self.requests += 1
+            if self.fail:
+                return Response(status_code=503, content='{"message":"Service Unavailable"}',
+                                media_type="application/json")
+            key = f"{bucket}/{path}"
+            if key in self.objects and request.headers.get("x-upsert") != "true":
+                return Response(status_code=400, media_type="application/json",
+                                content='{"statusCode":"409","error":"Duplicate","message":"The resource already exists"}')
+            form = await request.form()
+            self.objects[key] = await form["file"].read()
+            return {"Key": key}
+
+        @app.post("/storage/v1/upload/resumable")
+        async def create_upload(request: Request):
+            metadata = dict(
+                (name, base64.b64decode(value).decode())
+                for name, value in (item.split(" ") for item in request.headers["upload-metadata"].split(","))
+            )
+            key = f"{metadata['bucketName']}/{metadata['objectName']}"
+            if key in self.objects:
+                return Response(status_code=409)
+            upload_id = f"{len(self.uploads)}"
+            self.uploads[upload_id] = {"key": key, "length": int(request.headers["upload-length"]), "data": b""}
+            return Response(status_code=201, headers={
+                "location": f"{request.base_url}storage/v1/upload/resumable/{upload_id}"
+            })
+
+        @app.head("/storage/v1/upload/resumable/{upload_id}")
+        async def upload_offset(upload_id: str):
+            upload = self.uploads[upload_id]
+            return Response(status_code=200, headers={"upload-offset": str(len(upload["data"]))})
+
+        @app.patch("/storage/v1/upload/resumable/{upload_id}")
+        async def upload_chunk(upload_id: str, request: Request):
+            self.requests += 1
+            upload = self.uploads[upload_id]
+            if int(request.headers["upload-offset"]) != len(upload["data"]):
+                return Response(status_code=409)
+            chunk = await request.body()
+            if self.fail_chunks > 0:
+                # Keep half the chunk, as if the connection dropped mid-request
+                self.fail_chunks -= 1
+                upload["data"] += chunk[:len(chunk) // 2]
+                return Response(status_code=503)
+            upload["data"] += chunk
+            if len(upload["data"]) == upload["length"]:
+                self.objects[upload["key"]] = upload["data"]
+            return Response(status_code=204, headers={"upload-offset": str(len(upload["data"]))})
+
+        @app.get("/rest/v1/{table}")
+        async def select(table: str, request: Request):
+            self.requests += 1
+            rows = [row for row in self.tables[table] if _matches(row, request.query_params)]
+            for key in reversed((request.query_params.get("order") or "").split(",")):
+                if key:
+                    column, _, direction = key.partition(".")
+                    rows.sort(key=lambda row: row.get(column) or "", reverse=direction == "desc")
+            rows = rows[:int(request.query_params.get("limit", len(rows)))]
+            columns = request.query_params.get("select", "*")
+            if columns != "*":
+                rows = [{column: row.get(column) for column in columns.split(",")} for row in rows]
+            return rows
+
+        return app
+
+    def serve_in_thread(self, port: int) -> threading.Thread:
+        """Run on 127.0.0.1:port in a daemon thread and wait until it accepts requests"""
+        import uvicorn
+        server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        return thread
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+    import uvicorn
+    uvicorn.run(PostgRESTStub().app, host="127.0.0.1", port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Startup cost of the API and the speech services
+
+    python -m benchmarks.startup_time            # import/construct only
+    python -m benchmarks.startup_time --warm     # also time first model loads
+
+Each measurement runs in a fresh interpreter so module caches don't hide import cost.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+SNIPPETS = {
+    "import main (API startup)": "import main",
+    "import translation_service": "import src.services.translation_service",
+    "construct speech services": (
+        "from src.services.speech_to_text import WhisperSTTService\n"
+        "from src.services.text_to_speech import VITSService\n"
+        "from src.services.speaker_recognition import SpeechBrainDiarization\n"
+        "WhisperSTTService(); VITSService(); SpeechBrainDiarization()"
+    ),
+}
+
+# The registry logs load failures and carries on; surface them as errors here
+_CHECK_LOADED = (
+    "\nfrom src.services.model_registry import registry"
+    "\nfailed = {k: v['failed'] for k, v in registry.stats().items() if v['failed']}"
+    "\nassert not failed, failed"
+)
+
+WARM_SNIPPETS = {
+    "warm whisper-small": "from src.services.speech_to_text import WhisperSTTService\nWhisperSTTService().warm_up()" + _CHECK_LOADED,
+    "warm speecht5": "from src.services.text_to_speech import VITSService\nVITSService().warm_up()" + _CHECK_LOADED,
+    "warm ecapa": "from src.services.speaker_recognition import SpeechBrainDiarization\nSpeechBrainDiarization().warm_up()" + _CHECK_LOADED,
+}
+
+TEMPLATE = """
+import json, sys, time
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ("torch", "transformers", "whisper", "speechbrain") if m in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy_modules": heavy}}))
+"""
+
+def measure(body: str, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", TEMPLATE.format(body=body)],
+            capture_output=True,
+            text=True
+        )
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            return {"error": (completed.stderr.strip().splitlines() or ["failed"])[-1]}
+        runs.append(json.loads(lines[-1]))
+    return {
+        "best_seconds": min(run["seconds"] for run in runs),
+        "heavy_modules": runs[-1]["heavy_modules"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warm", action="store_true", help="also time first-use model loads")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    snippets = dict(SNIPPETS)
+    if args.warm:
+        snippets.update(WARM_SNIPPETS)
+    for label, body in snippets.items():
+        result = measure(body, args.repeat if label in SNIPPETS else 1)
+        if "error" in result:
+            print(f"{label:>30}: error: {result['error']}")
+        else:
+            print(f"{label:>30}: {result['best_seconds']:.3f}s  heavy imports: {result['heavy_modules'] or 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Time-to-first-audio of streaming synthesis vs whole-text synthesis
+
+    python -m benchmarks.streaming_tts --workers 2
+    python -m benchmarks.streaming_tts --model speecht5   # needs transformers
+
+The default model is a stand-in whose acoustic model and vocoder cost time
+in proportion to the text and audio they produce, like SpeechT5 + HiFi-GAN
+on CPU. "stall" is how long playback would starve waiting for the next
+chunk if it started the moment the first chunk arrived.
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+
+from src.services.streaming_tts import StreamingSynthesizer, split_text
+
+TEXT = (
+    "Buenos días a todos, gracias por venir hoy a esta reunión tan importante para nuestro equipo. "
+    "Hoy vamos a hablar del presupuesto del próximo trimestre. ¿Alguna pregunta antes de empezar? "
+    "Perfecto, empecemos con el primer punto de la agenda, que es la revisión de ventas, "
+    "seguida del plan de marketing y la contratación de nuevos empleados."
+)
+
+class StageCostTTS:
+    """Deterministic stand-in: ~70 ms of audio per character, stage costs proportional to size"""
+    def __init__(self, acoustic_ms_per_char: float = 4.0, vocoder_ms_per_frame: float = 0.8):
+        self.acoustic_ms_per_char = acoustic_ms_per_char
+        self.vocoder_ms_per_frame = vocoder_ms_per_frame
+
+    def spectrogram(self, text: str, lang: str = "en", voice: str = "default") -> np.ndarray:
+        time.sleep(len(text) * self.acoustic_ms_per_char / 1000)
+        return np.zeros((len(text) * 4, 80), dtype=np.float32)  # ~17 ms hop at 16 kHz
+
+    def vocode(self, spectrogram: np.ndarray) -> np.ndarray:
+        time.sleep(len(spectrogram) * self.vocoder_ms_per_frame / 1000)
+        return np.zeros(len(spectrogram) * 256 + 1, dtype=np.float32)
+
+    def synthesize(self, text: str, lang: str = "en", voice: str = "default") -> np.ndarray:
+        return self.vocode(self.spectrogram(text, lang, voice))
+
+class WorkerLimited:
+    """Model handle allowing `workers` concurrent calls, like the model worker pool"""
+    def __init__(self, model, workers: int):
+        self.model = model
+        self.slots = asyncio.Semaphore(workers)
+
+    async def call(self, method: str, *args, session_id=None, **kwargs):
+        async with self.slots:
+            return await asyncio.to_thread(getattr(self.model, method), *args, **kwargs)
+
+def playback_stall(arrivals, durations) -> float:
+    """Seconds of silence inside playback that starts at the first arrival"""
+    stall, playhead = 0.0, arrivals[0]
+    for arrival, duration in zip(arrivals, durations):
+        stall += max(0.0, arrival - playhead)
+        playhead = max(playhead, arrival) + duration
+    return stall
+
+async def run_whole(model, text: str, workers: int) -> dict:
+    handle = WorkerLimited(model, workers)
+    start = time.perf_counter()
+    audio = await handle.call("synthesize", text)
+    elapsed = time.perf_counter() - start
+    return {"ttfa_ms": elapsed * 1000, "total_ms": elapsed * 1000, "chunks": 1, "stall_ms": 0.0,
+            "audio_seconds": len(audio) / 16000}
+
+async def run_streaming(model, text: str, workers: int, first_max_chars: int) -> dict:
+    synthesizer = StreamingSynthesizer(WorkerLimited(model, workers), first_max_chars=first_max_chars)
+    start = time.perf_counter()
+    arrivals, durations = [], []
+    async for audio in synthesizer.stream(text, "es"):
+        arrivals.append(time.perf_counter() - start)
+        durations.append(len(audio) / synthesizer.sample_rate)
+    metrics = synthesizer.metrics()
+    return {"ttfa_ms": metrics["time_to_first_audio_ms"], "total_ms": metrics["total_ms"],
+            "chunks": metrics["chunks"], "stall_ms": playback_stall(arrivals, durations) * 1000,
+            "audio_seconds": metrics["audio_seconds"]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["stand-in", "speecht5"], default="stand-in")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--first-max-chars", type=int, default=60)
+    parser.add_argument("--text", default=TEXT)
+    args = parser.parse_args()
+
+    if args.model == "speecht5":
+        from src.services.text_to_speech import VITSService
+        model = VITSService()
+        model.warm_up()
+    else:
+        model = StageCostTTS()
+
+    print(f"chunks: {split_text(args.text, first_max_chars=args.first_max_chars)}")
+    print(f"{'mode':<10} {'ttfa_ms':>9} {'total_ms':>9} {'stall_ms':>9} {'chunks':>6} {'audio_s':>8}")
+    for mode, run in (("whole", run_whole(model, args.text, args.workers)),
+                      ("streaming", run_streaming(model, args.text, args.workers, args.first_max_chars))):
+        report = asyncio.run(run)
+        print(f"{mode:<10} {report['ttfa_ms']:>9.0f} {report['total_ms']:>9.0f} {report['stall_ms']:>9.0f} "
+              f"{report['chunks']:>6} {report['audio_seconds']:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Whisper inference profiles on CPU: speed, memory and accuracy
+
+    python -m benchmarks.stt_profiles --models tiny,base,small --profiles accurate,fast
+
+Every (model, profile) pair runs in a fresh process, pinned to the thread
+count a model worker gets, and transcribes the same fixture clips. The report
+has load time, real-time factor (compute seconds per second of audio; below 1
+keeps up with a live speaker), peak resident memory of the process and how
+much of it loading and running the model added, and word error rate against
+the reference transcripts.
+
+The fixture is a directory of clip.wav / clip.txt pairs. If --fixtures has
+none, the sentences below are synthesized into it once with the app's TTS
+model, so later runs and other machines compare on identical audio; any
+recorded set (e.g. a slice of LibriSpeech test-clean) can be used instead.
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+import soundfile as sf
+
+from benchmarks.e2e import SAMPLE_RATE, peak_rss_mb
+
+DEFAULT_FIXTURES = Path(__file__).parent / "fixtures" / "stt"
+
+SENTENCES = [
+    "Good morning, I would like to book a table for two people at seven tonight.",
+    "The train to the airport leaves from platform four every twenty minutes.",
+    "Could you tell me where the nearest pharmacy is?",
+    "We are running about fifteen minutes late because of traffic on the bridge.",
+    "Please send the signed contract back to our office before Friday.",
+    "The weather forecast says it will rain all afternoon, so bring an umbrella.",
+    "My flight was cancelled and I need to rebook for tomorrow morning.",
+    "Thank you for your help, it was a pleasure talking to you.",
+]
+
+def normalize(text: str) -> List[str]:
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+def word_errors(reference: str, hypothesis: str) -> Tuple[int, int]:
+    """Word-level edit distance and reference length"""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (ref_word != hyp_word))
+    return row[-1], len(ref)
+
+def load_fixtures(directory: Path) -> List[Tuple[str, np.ndarray, str]]:
+    fixtures = []
+    for wav in sorted(directory.glob("*.wav")):
+        transcript = wav.with_suffix(".txt")
+        if transcript.exists():
+            audio, sample_rate = sf.read(wav, dtype="float32")
+            if sample_rate != SAMPLE_RATE or audio.ndim > 1:
+                from src.services.audio_ingest import prepare_audio
+                audio = prepare_audio(audio, sample_rate)
+            fixtures.append((wav.stem, audio, transcript.read_text().strip()))
+    return fixtures
+
+def synthesize_fixtures(directory: Path):
+    """Write SENTENCES as 16 kHz clips with the app's TTS model"""
+    from src.services.text_to_speech import VITSService
+    from src.services.model_registry import registry
+    tts = VITSService()
+    tts.warm_up()
+    failed = {name: stats["failed"] for name, stats in registry.stats().items() if stats["failed"]}
+    if failed:
+        raise RuntimeError(f"TTS model unavailable: {failed}")
+    directory.mkdir(parents=True, exist_ok=True)
+    for i, sentence in enumerate(SENTENCES):
+        audio = tts.synthesize(sentence)
+        sf.write(directory / f"clip{i:02d}.wav", audio, SAMPLE_RATE, subtype="PCM_16")
+        (directory / f"clip{i:02d}.txt").write_text(sentence + "\n")
+
+def run_config(model: str, profile: str, fixtures_dir: str, torch_threads: int, repeat: int) -> dict:
+    """One (model, profile) pair; runs in its own process so memory is measured from a clean start"""
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    import torch
+    torch.set_num_threads(torch_threads)
+    from src.services.model_registry import registry
+    from src.services.speech_to_text import WhisperSTTService
+
+    fixtures = load_fixtures(Path(fixtures_dir))
+    baseline_mb = peak_rss_mb()
+    service = WhisperSTTService(model, profile=profile)
+    start = time.perf_counter()
+    service.warm_up()
+    load_seconds = time.perf_counter() - start
+    failed = registry.stats()[service.registry_key]["failed"]
+    if failed:
+        return {"error": failed}
+
+    # First pass warms kernels and allocator; it is not timed
+    service.transcribe(fixtures[0][1], SAMPLE_RATE)
+    compute, errors, words, hypotheses = 0.0, 0, 0, {}
+    for _ in range(repeat):
+        for name, audio, _ in fixtures:
+            start = time.perf_counter()
+            hypotheses[name] = service.transcribe(audio, SAMPLE_RATE)
+            compute += time.perf_counter() - start
+    for name, _, reference in fixtures:
+        edits, length = word_errors(reference, hypotheses[name])
+        errors += edits
+        words += length
+    audio_seconds = repeat * sum(len(audio) for _, audio, _ in fixtures) / SAMPLE_RATE
+    return {
+        "load_seconds": load_seconds,
+        "rtf": compute / audio_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "added_mb": peak_rss_mb() - baseline_mb,
+        "wer": errors / words if words else 0.0,
+        "hypotheses": hypotheses,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", default="tiny,base,small")
+    parser.add_argument("--profiles", default="accurate,fast")
+    parser.add_argument("--fixtures", type=Path, default=DEFAULT_FIXTURES)
+    parser.add_argument("--repeat", type=int, default=2, help="Timed passes over the fixture")
+    parser.add_argument("--torch-threads", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="Threads per process, as a model worker gets with MODEL_WORKERS=2")
+    parser.add_argument("--verbose", action="store_true", help="Print every hypothesis")
+    args = parser.parse_args()
+
+    try:
+        import torch  # noqa: F401
+        import whisper  # noqa: F401
+    except ImportError as e:
+        sys.exit(f"Whisper is not installed ({e}); pip install openai-whisper torch to run this benchmark")
+
+    if not load_fixtures(args.fixtures):
+        print(f"No fixture clips in {args.fixtures}; synthesizing {len(SENTENCES)} with the TTS model")
+        synthesize_fixtures(args.fixtures)
+    fixtures = load_fixtures(args.fixtures)
+    audio_seconds = sum(len(audio) for _, audio, _ in fixtures) / SAMPLE_RATE
+    print(f"{len(fixtures)} clips, {audio_seconds:.1f} s of audio, {args.torch_threads} torch threads per process")
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'model':<8} {'profile':<9} {'load_s':>7} {'rtf':>6} {'peak_mb':>8} {'added_mb':>9} {'wer':>6}")
+    for model in args.models.split(","):
+        for profile in args.profiles.split(","):
+            with context.Pool(1) as pool:
+                report = pool.apply(run_config, (model, profile, str(args.fixtures), args.torch_threads, args.repeat))
+            if "error" in report:
+                print(f"{model:<8} {profile:<9} error: {report['error']}")
+                continue
+            print(f"{model:<8} {profile:<9} {report['load_seconds']:>7.1f} {report['rtf']:>6.2f} "
+                  f"{report['peak_rss_mb']:>8.0f} {report['added_mb']:>9.0f} {report['wer']:>6.1%}")
+            if args.verbose:
+                for name, text in report["hypotheses"].items():
+                    print(f"    {name}: {text}")
+
+if __name__ == "__main__":
+    main()
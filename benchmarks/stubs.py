@@ -0,0 +1,68 @@
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real upstream
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class MyMemoryStub:
+    """
+    Local stand-in for the MyMemory /get endpoint
+    Echoes each line of the query prefixed with the target language after a fixed latency
+    """
+    def __init__(self, latency: float = 0.05, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.requests = 0
+        stub = self
+
+        class Handler(_StubHandler):
+            def do_GET(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                text = query.get("q", [""])[0]
+                target = query.get("langpair", ["en|es"])[0].split("|")[-1]
+                stub.requests += 1
+                time.sleep(stub.latency)
+                # Line by line, so packed batch queries split back cleanly
+                translated = "\n".join(f"[{target}] {line}" for line in text.split("\n"))
+                self._send_json(200, {
+                    "responseStatus": 200,
+                    "responseData": {"translatedText": translated}
+                })
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/get"
+
+    def start(self) -> "MyMemoryStub":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
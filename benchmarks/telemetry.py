@@ -0,0 +1,70 @@
+"""
+Cost of the instrumentation layer on the request path
+
+    python -m benchmarks.telemetry --calls 100000
+
+Times a bare call against the same call under instrument() (histogram,
+error counter, span), outside and inside a trace, and the time a logging
+call takes to return when the log sink is slow: written directly by a
+StreamHandler versus handed to the background thread by configure_logging().
+"""
+import argparse
+import io
+import logging
+import time
+
+from src.services.telemetry import configure_logging, instrument, shutdown_logging, tracer
+
+class SlowSink(io.StringIO):
+    """A stdout that takes `delay` seconds per write, like a blocked pipe or a busy log shipper"""
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return super().write(text)
+
+def per_call_us(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+def instrumented():
+    with instrument("bench"):
+        pass
+
+def log_cost(logger: logging.Logger, calls: int) -> float:
+    return per_call_us(lambda: logger.info("Sent response to client: %s", "bench"), calls)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--log-calls", type=int, default=200)
+    parser.add_argument("--sink-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'case':<28} {'us/call':>9}")
+    print(f"{'bare call':<28} {per_call_us(lambda: None, args.calls):>9.2f}")
+    print(f"{'instrument, no trace':<28} {per_call_us(instrumented, args.calls):>9.2f}")
+    with tracer.trace("bench"):
+        # Spans per trace are capped, so this measures the steady state of a long trace
+        print(f"{'instrument, in a trace':<28} {per_call_us(instrumented, args.calls):>9.2f}")
+
+    sink = SlowSink(args.sink_delay_ms / 1000)
+    logger = logging.getLogger("bench")
+    direct = logging.StreamHandler(sink)
+    logger.addHandler(direct)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    print(f"{'log, direct to slow sink':<28} {log_cost(logger, args.log_calls):>9.2f}")
+
+    logger.removeHandler(direct)
+    logger.propagate = True
+    configure_logging("INFO", stream=sink)
+    print(f"{'log, queued to slow sink':<28} {log_cost(logger, args.log_calls):>9.2f}")
+    shutdown_logging()
+
+if __name__ == "__main__":
+    main()
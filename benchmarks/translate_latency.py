@@ -0,0 +1,74 @@
+"""
+Measure /translate upstream latency under concurrent load against a local stub
+
+    python -m benchmarks.translate_latency --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+
+from benchmarks.stubs import MyMemoryStub
+from src.services.rate_limiter import RateLimiter
+from src.services.translation import MyMemoryTranslator
+
+async def _loop_lag(stop: asyncio.Event, interval: float = 0.005) -> list:
+    """Sample how late the event loop wakes up; large values mean something blocked it"""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+    return lags
+
+async def run(n_requests: int, concurrency: int, latency: float, max_concurrency: int, rate: float) -> dict:
+    with MyMemoryStub(latency=latency) as stub:
+        translator = MyMemoryTranslator(
+            api_url=stub.url,
+            max_connections=max_concurrency,
+            max_concurrency=max_concurrency,
+            rate_limiter=RateLimiter(upstream_rate=rate, upstream_burst=rate, max_wait=60.0)
+        )
+        gate = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(i: int):
+            async with gate:
+                start = time.perf_counter()
+                await translator.translate_async(f"segment {i}", "en", "es")
+                latencies.append(time.perf_counter() - start)
+
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(_loop_lag(stop))
+        wall = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        wall = time.perf_counter() - wall
+        stop.set()
+        lags = await lag_task
+        await translator.aclose()
+
+    ms = np.array(latencies) * 1000
+    return {
+        "requests": n_requests,
+        "throughput_rps": n_requests / wall,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_loop_lag_ms": float(max(lags) * 1000) if lags else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub upstream latency in seconds")
+    parser.add_argument("--max-concurrency", type=int, default=20, help="translator in-flight cap")
+    parser.add_argument("--rate", type=float, default=1e6, help="upstream token bucket rate (req/s)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.requests, args.concurrency, args.latency, args.max_concurrency, args.rate))
+    for key, value in report.items():
+        print(f"{key:>16}: {value:.2f}" if isinstance(value, float) else f"{key:>16}: {value}")
+
+if __name__ == "__main__":
+    main()
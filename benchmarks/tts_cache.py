@@ -0,0 +1,65 @@
+"""
+Latency of cached vs uncached text-to-speech
+
+    python -m benchmarks.tts_cache --phrases 20 --repeats 5
+    python -m benchmarks.tts_cache --disk          # also measure the memory-mapped disk tier
+
+Each phrase is synthesized once (a miss, paid in full by the model) and then
+requested again; repeats are served from the cache without reaching the
+model. With --disk the memory tier is cleared between rounds so hits come
+from the memory-mapped files, as they would after a restart.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import numpy as np
+
+from benchmarks.streaming_tts import StageCostTTS, WorkerLimited
+from src.services.tts_cache import CachedTTS, TTSCache
+
+PHRASES = [
+    "Buenos días, ¿cómo está?",
+    "La reunión empieza en cinco minutos.",
+    "¿Puede repetir la pregunta, por favor?",
+    "Gracias por su paciencia.",
+    "Vamos a revisar el presupuesto del trimestre.",
+]
+
+async def run(handle: CachedTTS, phrases, repeats: int, clear_memory: bool) -> dict:
+    misses, hits = [], []
+    for round_index in range(repeats + 1):
+        if clear_memory and round_index:
+            handle.cache._entries.clear()
+            handle.cache.bytes = 0
+        for phrase in phrases:
+            start = time.perf_counter()
+            await handle.call("synthesize", phrase, lang="es")
+            (hits if round_index else misses).append((time.perf_counter() - start) * 1000)
+    return {"miss_ms": float(np.mean(misses)), "hit_ms": float(np.mean(hits)),
+            "p95_hit_ms": float(np.percentile(hits, 95)), **handle.stats()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phrases", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--disk", action="store_true")
+    args = parser.parse_args()
+
+    phrases = [f"{PHRASES[i % len(PHRASES)]} ({i})" for i in range(args.phrases)]
+    model = WorkerLimited(StageCostTTS(), workers=2)
+
+    tiers = [("memory", None)]
+    if args.disk:
+        tiers.append(("disk", tempfile.mkdtemp(prefix="tts_cache_")))
+
+    print(f"{'tier':<8} {'miss_ms':>9} {'hit_ms':>9} {'p95_hit_ms':>11} {'hit_rate':>9} {'MB':>7}")
+    for name, disk_dir in tiers:
+        handle = CachedTTS(model, TTSCache(disk_dir=disk_dir))
+        report = asyncio.run(run(handle, phrases, args.repeats, clear_memory=disk_dir is not None))
+        size = report["disk_bytes"] if disk_dir else report["bytes"]
+        print(f"{name:<8} {report['miss_ms']:>9.1f} {report['hit_ms']:>9.3f} {report['p95_hit_ms']:>11.3f} "
+              f"{report['hit_rate']:>9.2f} {size / 1e6:>7.1f}")
+
+if __name__ == "__main__":
+    main()
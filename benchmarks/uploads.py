@@ -0,0 +1,108 @@
+"""
+Audio upload size, request-path cost, deduplication and resumability
+
+    python -m benchmarks.uploads --clips 40 --unique 10
+
+Runs StorageService and SupabaseClient against the local Supabase stand-in.
+Clips are synthetic TTS-like audio; --unique of them are distinct, the rest
+repeat, as common phrases do. The resumable run sends a long recording in
+small TUS chunks and drops two chunks midway.
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+import numpy as np
+import soundfile as sf
+
+from benchmarks.postgrest_stub import PostgRESTStub
+from src.models.translation import TranslationResponse
+
+def make_clip(seed: int, seconds: float = 3.0, sample_rate: int = 16000) -> bytes:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = rng.uniform(100, 250)
+    speech = 0.3 * np.sin(2 * np.pi * pitch * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    speech += 0.01 * rng.standard_normal(len(t))
+    with io.BytesIO() as buffer:
+        sf.write(buffer, speech.astype(np.float32), sample_rate, format="WAV")
+        return buffer.getvalue()
+
+def make_services(port: int):
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["SUPABASE_KEY"] = "stub.stub.stub"
+    os.environ["DB_JOURNAL_DIR"] = tempfile.mkdtemp(prefix="journal_")
+    from src.database.supabase_client import SupabaseClient
+    from src.services.storage_service import StorageService
+    db_client = SupabaseClient()
+    return db_client, lambda **kwargs: StorageService(db_client.client, **kwargs)
+
+async def request_path(db_client, make_storage, clips) -> dict:
+    results = {}
+    storage = make_storage(audio_format="wav")
+    start = time.perf_counter()
+    for clip in clips:
+        await storage.upload_audio(clip)
+    results["inline wav"] = ((time.perf_counter() - start) / len(clips) * 1000, storage.stats())
+
+    db_client.translations.start()
+    db_client.audio_links.start()
+    storage = make_storage()
+    storage.start()
+    start = time.perf_counter()
+    for i, clip in enumerate(clips):
+        response = TranslationResponse(original_text=f"hi {i}", translated_text=f"hola {i}", audio_data=clip)
+        row_id = await db_client.store_translation(response, "u", "en", "es")
+        storage.submit_upload(clip, lambda url, row_id=row_id: db_client.link_audio(row_id, url))
+    elapsed = (time.perf_counter() - start) / len(clips) * 1000
+    await storage.drain()
+    await db_client.translations.drain()
+    await db_client.audio_links.drain()
+    results["background opus"] = (elapsed, storage.stats())
+    return results
+
+async def resumable(make_storage, stub: PostgRESTStub) -> str:
+    recording = make_clip(0, seconds=120.0)
+    storage = make_storage(audio_format="wav", resumable_threshold=1024 * 1024)
+    storage.chunk_size = 256 * 1024
+    stub.fail_chunks = 2
+    url = await storage.upload_audio(recording)
+    key = url.split("/object/public/")[1].rstrip("?")
+    intact = stub.objects.get(key) == recording
+    return f"resumable: {len(recording) / 1e6:.1f} MB in {storage.chunk_size // 1024} kB chunks, " \
+           f"2 dropped chunks, stored intact: {intact}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=40)
+    parser.add_argument("--unique", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated storage round trip")
+    parser.add_argument("--port", type=int, default=54323)
+    args = parser.parse_args()
+
+    stub = PostgRESTStub()
+    stub.serve_in_thread(args.port)
+    stub.latency = args.latency_ms / 1000
+    db_client, make_storage = make_services(args.port)
+
+    from src.services.audio_ingest import decode_audio
+    from src.services.ws_protocol import encode_samples
+    samples, sample_rate = decode_audio(make_clip(0))
+    wav_size = len(make_clip(0))
+    print("bytes per 3 s clip: " + ", ".join(
+        [f"wav {wav_size}"] + [f"{fmt} {len(encode_samples(samples, sample_rate, fmt)[0])}" for fmt in ("flac", "opus")]
+    ))
+
+    clips = [make_clip(i % args.unique) for i in range(args.clips)]
+    print(f"{'mode':<16} {'request_ms':>11} {'uploads':>8} {'dedupe_hits':>12} {'ratio':>6}")
+    for name, (ms, stats) in asyncio.run(request_path(db_client, make_storage, clips)).items():
+        ratio = f"{stats['compression_ratio']:.1f}" if stats["compression_ratio"] else "-"
+        print(f"{name:<16} {ms:>11.3f} {stats['uploads']:>8} {stats['dedupe_hits']:>12} {ratio:>6}")
+    rows = stub.tables["translations"]
+    print(f"linked audio_url on {sum(1 for row in rows if row.get('audio_url'))}/{len(rows)} rows")
+    print(asyncio.run(resumable(make_storage, stub)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Bytes on the wire and encode time per WebSocket wire format
+
+    python -m benchmarks.ws_framing --seconds 3 --iterations 200
+
+Encodes the same translation response (a synthetic TTS clip) the way each
+negotiated protocol would send it. "json (double base64)" reproduces the
+old behaviour, where the service base64-encoded the WAV and the response
+model encoded it again.
+"""
+import argparse
+import base64
+import io
+import time
+import numpy as np
+import soundfile as sf
+
+from src.models.translation import TranslationResponse
+from src.services.ws_protocol import WebSocketProtocol, _msgpack
+
+def make_response(seconds: float, sample_rate: int = 16000) -> TranslationResponse:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    speech = 0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    with io.BytesIO() as audio_buffer:
+        sf.write(audio_buffer, speech.astype(np.float32), sample_rate, format="WAV")
+        wav = audio_buffer.getvalue()
+    return TranslationResponse(
+        original_text="Where is the train station?",
+        translated_text="¿Dónde está la estación de tren?",
+        speaker_id="speaker_1",
+        audio_data=wav,
+        start=0.0,
+        end=seconds
+    )
+
+def measure(encode, iterations: int) -> tuple:
+    data = encode()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode()
+    elapsed = (time.perf_counter() - start) / iterations
+    return len(data), elapsed * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Length of the synthesized clip")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    response = make_response(args.seconds)
+    legacy = response.model_copy(update={"audio_data": base64.b64encode(response.audio_data)})
+
+    formats = [
+        ("json (double base64)", lambda: WebSocketProtocol().encode_response(legacy), args.iterations),
+        ("json", lambda: WebSocketProtocol().encode_response(response), args.iterations),
+    ]
+    headers = ["json"] + (["msgpack"] if _msgpack() is not None else [])
+    for header in headers:
+        for audio in ("wav", "pcm_s16le", "opus"):
+            protocol = WebSocketProtocol("binary", header, audio)
+            # Opus encoding is orders of magnitude slower; fewer iterations keep the run short
+            iterations = args.iterations if audio != "opus" else max(1, args.iterations // 20)
+            formats.append((f"binary {header}/{audio}", lambda p=protocol: p.encode_response(response), iterations))
+
+    print(f"{'format':<24} {'bytes':>9} {'bytes/s audio':>14} {'encode_ms':>10}")
+    for name, encode, iterations in formats:
+        size, ms = measure(encode, iterations)
+        print(f"{name:<24} {size:>9} {size / args.seconds:>14.0f} {ms:>10.3f}")
+
+if __name__ == "__main__":
+    main()
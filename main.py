@@ -1,23 +1,65 @@
-from fastapi import FastAPI, WebSocket, Depends, Form
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+from collections import deque
 import asyncio
 import numpy as np
 import os
 import sys
 import json
-import soundfile as sf
-import io
+import logging
+import time
 
 from src.services.translation import MyMemoryTranslator
+from src.services.translation_cache import TranslationCache, CachedTranslator
+from src.services.rate_limiter import RateLimiter, RateLimitExceeded
+from src.services.batch_translation import BatchTranslator
+from src.services.speech_to_text import stt_options
+from src.services.language_id import AUTO, SessionLanguages, TextLanguageDetector
+from src.services.streaming_stt import StreamingTranscriber
+from src.services.streaming_tts import StreamingSynthesizer
+from src.services.tts_cache import TTSCache, CachedTTS
+from src.services.audio_ingest import TARGET_SAMPLE_RATE, StreamResampler, pcm_to_float32
+from src.services.ws_protocol import WebSocketProtocol
+from src.services.vad import VoiceActivityDetector
+from src.services.model_workers import ModelWorkerPool
+from src.services.batching import BatchedModel
+from src.services.model_registry import registry as model_registry
+from src.services.translation_service import TranslationService
 from src.services.storage_service import StorageService
 from src.services.auth_service import AuthService
-from src.database.supabase_client import SupabaseClient
-from src.models.translation import TranslationResponse
+from src.services.rooms import RoomManager
+from src.services.admission import AdmissionController, InboundQueue
+from src.services.telemetry import configure_logging, shutdown_logging, metrics, tracer
+from src.database.supabase_client import SupabaseClient, parse_timestamp
+from src.models.translation import TranslationRequest, TranslationResponse
+
+# Log records are written by a background thread, never on the request path
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="AI Translator")
 
+http_seconds = metrics.histogram("http_request_duration_seconds", "HTTP request latency by route and status")
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """One trace per request; its id comes from X-Trace-Id when the caller sends one and is returned in the response"""
+    start = time.perf_counter()
+    with tracer.trace(f"{request.method} {request.url.path}", trace_id=request.headers.get("x-trace-id")) as span:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    http_seconds.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=response.status_code
+    )
+    response.headers["X-Trace-Id"] = span.trace_id
+    return response
+
 # Get the frontend URL from environment or use a default for development
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
@@ -35,107 +77,715 @@ try:
     db_client = SupabaseClient()
     auth_service = AuthService(db_client.client)
     storage_service = StorageService(db_client.client)
-    translator = MyMemoryTranslator()
+    translation_cache = TranslationCache(
+        max_entries=int(os.getenv("TRANSLATION_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("TRANSLATION_CACHE_TTL", str(24 * 3600))),
+        persist_path=os.getenv("TRANSLATION_CACHE_PATH")  # e.g. cache/translations.sqlite3
+    )
+    # Quotas are shared by every worker process through RATE_LIMIT_DIR
+    rate_limiter = RateLimiter.from_env()
+    translator = CachedTranslator(MyMemoryTranslator(rate_limiter=rate_limiter), translation_cache)
+    batch_translator = BatchTranslator(translator, max_items=int(os.getenv("BATCH_MAX_ITEMS", "100")))
 except Exception as e:
-    print(f"Error initializing services: {e}")
+    logger.error("Error initializing services: %s", e)
     sys.exit(1)
 
+# /translate without source_lang: each text is identified on its own; a text too short to
+# tell falls back to the language the caller's earlier, clearer texts were in
+text_language = TextLanguageDetector()
+caller_languages = SessionLanguages(max_sessions=int(os.getenv("LANGUAGE_ID_MAX_CALLERS", "10000")))
+TEXT_LID_MIN_CONFIDENCE = float(os.getenv("TEXT_LID_MIN_CONFIDENCE", "0.6"))
+
+# Speech models are optional and run in worker processes; the free tier runs without them
+model_pool = None
+stt_model = None
+tts_model = None
+# Synthesized audio is cached here, in the main process, so repeated phrases skip the workers
+tts_cache = TTSCache.from_env()
+if os.getenv("ENABLE_STT") == "1":
+    model_pool = ModelWorkerPool.from_env(preload=("stt",))
+    tts_model = CachedTTS(model_pool.proxy("tts"), tts_cache)
+    # Concurrent sessions' decodes are merged into batched Whisper passes
+    stt_model = BatchedModel(
+        model_pool.proxy("stt"),
+        "transcribe",
+        "transcribe_batch",
+        max_batch_size=int(os.getenv("STT_MAX_BATCH", "8")),
+        max_wait_ms=float(os.getenv("STT_MAX_WAIT_MS", "10")),
+        length_bucket=lambda audio: len(audio) > 30 * 16000  # Beyond Whisper's window
+    )
+
+# Global budget of audio messages in processing at once, sized to the model workers
+admission = AdmissionController.from_env(model_pool.workers if model_pool is not None else None)
+
+# Gates audio before it reaches the speech models
+vad = VoiceActivityDetector(
+    energy_threshold_db=float(os.getenv("VAD_ENERGY_THRESHOLD_DB", "-45")),
+    hangover_ms=float(os.getenv("VAD_HANGOVER_MS", "300"))
+)
+
+# Full speech-to-speech pipeline for uploaded audio, when the speech models are enabled
+translation_service = None
+if model_pool is not None:
+    translation_service = TranslationService(
+        stt_model,
+        translator,
+        tts_model,
+        model_pool.proxy("diarization"),
+        storage_service,
+        db_client,
+        vad=vad
+    )
+
 # Store active WebSocket connections
 active_connections: Dict[str, WebSocket] = {}
 
+# Broadcast rooms: one speaker, many listeners, each with a bounded send queue
+room_manager = RoomManager(max_queue=int(os.getenv("ROOM_QUEUE_SIZE", "32")))
+
+# Per-session streaming metrics, most recent first out
+streaming_metrics = deque(maxlen=1000)
+speech_metrics = deque(maxlen=1000)
+
+# Outbound traffic per wire format, folded in as connections close
+websocket_traffic: Dict[str, Dict[str, float]] = {}
+
+def record_traffic(protocol: WebSocketProtocol):
+    traffic = websocket_traffic.setdefault(
+        protocol.mode,
+        {"connections": 0, "messages_sent": 0, "bytes_sent": 0, "encode_ms": 0.0}
+    )
+    traffic["connections"] += 1
+    for key, value in protocol.stats().items():
+        if key in traffic:
+            traffic[key] += value
+
+async def read_control(websocket: WebSocket, protocol: WebSocketProtocol, text: str) -> Optional[dict]:
+    """A text frame as a control message; a malformed one is answered with an error and skipped"""
+    try:
+        control = json.loads(text)
+    except ValueError:
+        control = None
+    if not isinstance(control, dict):
+        await protocol.send(websocket, {"type": "error", "error": "Control messages must be JSON objects"})
+        return None
+    return control
+
+async def listen_to_room(websocket: WebSocket, protocol: WebSocketProtocol, client_id: str, room_id: str, language: str):
+    """
+    Listener side of a room: translations arrive through the room's fan-out,
+    and {"type": "language", "language": "fr"} switches language mid-session
+    """
+    listener = room_manager.join(room_id, client_id, websocket, protocol, language)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text"):
+                control = await read_control(websocket, protocol, message["text"])
+                if control is not None and control.get("type") == "language" and control.get("language"):
+                    listener.language = control["language"]
+    finally:
+        room_manager.leave(room_id, client_id)
+
+async def speak_to_room(
+    websocket: WebSocket,
+    protocol: WebSocketProtocol,
+    client_id: str,
+    room_id: str,
+    source_lang: str,
+    session_stt: dict
+):
+    """
+    Speaker side of a room: each turn is transcribed once, translated and
+    synthesized once per language the room's listeners want, then fanned out
+    """
+    room = room_manager.speaker_joined(room_id)
+
+    async def broadcast_audio(audio: np.ndarray):
+        if translation_service is None:
+            await protocol.send_response(websocket, TranslationResponse(
+                original_text="",
+                translated_text="",
+                speaker_id="system",
+                error="Speech-to-text is not available in the free tier"
+            ))
+            return
+        async for responses in translation_service.process_audio_broadcast(
+            audio,
+            TARGET_SAMPLE_RATE,
+            source_lang,
+            room.languages,
+            session_id=client_id,
+            stt_options=session_stt,
+            prepared=True
+        ):
+            room.broadcast(responses)
+            # The speaker gets their own transcript back, without audio
+            first = next(iter(responses.values()), None)
+            if first is not None:
+                await protocol.send(websocket, {
+                    "type": "transcript",
+                    "text": first.original_text,
+                    "speaker_id": first.speaker_id,
+                    "source_lang": first.source_lang,
+                    "listeners": len(room.listeners)
+                })
+
+    try:
+        await receive_audio(websocket, protocol, broadcast_audio)
+    finally:
+        room_manager.speaker_left(room_id)
+
+async def receive_audio(websocket: WebSocket, protocol: WebSocketProtocol, process, on_control=None):
+    """
+    Receive loop for audio connections, with admission control
+    Decoded audio waits in the connection's bounded inbound queue; one task per
+    connection takes it from there, within the global processing budget.
+    Whatever is shed on the way is reported as {"type": "busy"}, followed by
+    {"type": "ready"} once the connection's backlog has cleared
+    """
+    inbound = InboundQueue.from_env(TARGET_SAMPLE_RATE)
+    admission.register(inbound)
+    client_id = websocket.path_params.get("client_id")
+
+    async def notify_busy(reason: str):
+        if inbound.should_notify():
+            await protocol.send(websocket, admission.busy_message(reason, inbound))
+
+    async def work():
+        while True:
+            stale = inbound.dropped_stale
+            audio = await inbound.get()
+            if audio is None:
+                return
+            if inbound.dropped_stale > stale:
+                await notify_busy("stale_audio_dropped")
+            if not await admission.acquire():
+                await notify_busy("server_busy")
+                continue
+            start = time.perf_counter()
+            try:
+                with tracer.trace("ws.audio", client_id=client_id, seconds=len(audio) / TARGET_SAMPLE_RATE):
+                    await process(audio)
+            except Exception as e:
+                logger.error("Error processing audio: %s", e)
+                await protocol.send_response(websocket, TranslationResponse(
+                    original_text="",
+                    translated_text="",
+                    speaker_id="error",
+                    error=str(e)
+                ))
+            finally:
+                admission.release(time.perf_counter() - start)
+            if inbound.busy and not len(inbound):
+                inbound.busy = False
+                await protocol.send(websocket, {"type": "ready"})
+
+    worker = asyncio.create_task(work())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("text"):
+                if on_control is not None:
+                    control = await read_control(websocket, protocol, message["text"])
+                    if control is not None:
+                        await on_control(control)
+                continue
+            audio_data = message.get("bytes")
+            if not audio_data:
+                continue
+            try:
+                # Decode, downmix and resample to 16 kHz once, before queueing
+                audio = protocol.read_audio(audio_data)
+            except Exception as e:
+                logger.error("Error decoding audio: %s", e)
+                await protocol.send_response(websocket, TranslationResponse(
+                    original_text="",
+                    translated_text="",
+                    speaker_id="error",
+                    error=str(e)
+                ))
+                continue
+            shed = inbound.put(audio)
+            if shed is not None:
+                await notify_busy(shed)
+    finally:
+        inbound.close()
+        worker.cancel()
+        admission.unregister(inbound)
+
+async def stream_transcription(
+    websocket: WebSocket,
+    protocol: WebSocketProtocol,
+    client_id: str,
+    sample_rate: int,
+    encoding: str,
+    session_stt: dict,
+    source_lang: str
+):
+    """
+    Streaming mode: binary messages are raw PCM frames, text messages are JSON control
+    Sends partial hypotheses as they stabilize and a final one per window or on {"type": "stop"}
+    """
+    if stt_model is None:
+        await protocol.send(websocket, {"type": "error", "error": "Speech-to-text is not available in the free tier"})
+        return
+
+    transcriber = StreamingTranscriber(
+        stt_model,
+        vad=vad,
+        stt_options=session_stt,
+        session_id=client_id,
+        source_lang=source_lang,
+        # Shared with the pipeline, so the session's detection is dropped with the rest of its state
+        languages=translation_service.languages if translation_service is not None else None
+    )
+    resampler = StreamResampler(sample_rate, transcriber.sample_rate)
+    decode_task = None
+
+    async def run_step():
+        try:
+            for message in await transcriber.step():
+                await protocol.send(websocket, message)
+        except Exception as e:
+            logger.error("Streaming transcription error: %s", e)
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes"):
+                samples = resampler.process(pcm_to_float32(message["bytes"], encoding))
+                transcriber.push(samples)
+                # Decode in the background so frames keep flowing into the buffer
+                if (decode_task is None or decode_task.done()) and transcriber.ready():
+                    decode_task = asyncio.create_task(run_step())
+
+            elif message.get("text"):
+                control = await read_control(websocket, protocol, message["text"])
+                if control is not None and control.get("type") == "stop":
+                    if decode_task is not None:
+                        await decode_task
+                    transcriber.push(resampler.flush())
+                    for final in await transcriber.flush():
+                        await protocol.send(websocket, final)
+                    await protocol.send(websocket, {"type": "metrics", **transcriber.metrics()})
+    finally:
+        if decode_task is not None and not decode_task.done():
+            decode_task.cancel()
+        streaming_metrics.append(transcriber.metrics())
+        logger.info("Streaming session closed for %s: %s", client_id, transcriber.metrics())
+
+async def speak(websocket: WebSocket, protocol: WebSocketProtocol, client_id: str, control: dict):
+    """
+    Stream synthesized speech for {"type": "speak", "text": ..., "lang": ..., "voice"?: ...}
+    With "source_lang" the text is translated into lang first. Audio goes out
+    as "audio_chunk" messages as each chunk is ready, then "audio_end" with timings
+    """
+    if tts_model is None:
+        await protocol.send(websocket, {"type": "error", "error": "Text-to-speech is not available in the free tier"})
+        return
+
+    text, lang = control.get("text", ""), control.get("lang", "en")
+    voice = control.get("voice", "default")
+    source_lang = control.get("source_lang")
+    if source_lang and source_lang != lang:
+        text = await translator.translate_async(text, source_lang=source_lang, target_lang=lang)
+
+    synthesizer = StreamingSynthesizer(tts_model, cache=tts_cache)
+    try:
+        index = 0
+        async for audio in synthesizer.stream(text, lang, voice, session_id=client_id):
+            await protocol.send_audio(websocket, {"type": "audio_chunk", "index": index}, audio, synthesizer.sample_rate)
+            index += 1
+        await protocol.send(websocket, {"type": "audio_end", "text": text, **synthesizer.metrics()})
+    finally:
+        speech_metrics.append(synthesizer.metrics())
+
 @app.websocket("/ws/{client_id}")
 async def websocket_endpoint(websocket: WebSocket, client_id: str):
+    protocol = None
+    # The token is checked once, at the handshake; messages on the socket are trusted after that
+    try:
+        user_id = await auth_service.authenticate_websocket(websocket)
+    except Exception as e:
+        logger.warning("Rejected WebSocket client %s: %s", client_id, e)
+        await websocket.close(code=1008)
+        return
+    if user_id is None and os.getenv("WS_REQUIRE_AUTH") == "1":
+        await websocket.close(code=1008)
+        return
+
     try:
         await websocket.accept()
         active_connections[client_id] = websocket
-        print(f"WebSocket client connected: {client_id}")
-        
-        while True:
-            try:
-                # Receive audio data from the client
-                audio_data = await websocket.receive_bytes()
-                print(f"Received audio data from client: {client_id}")
-                
-                # Convert audio bytes to numpy array
-                with io.BytesIO(audio_data) as audio_buffer:
-                    audio_array, sample_rate = sf.read(audio_buffer)
-                
-                # Convert to mono if stereo
-                if len(audio_array.shape) > 1:
-                    audio_array = audio_array.mean(axis=1)
-                
-                # For now, we'll just return an empty response since we're not doing STT
+        logger.info("WebSocket client connected: %s", client_id)
+
+        # Wire format and mode are chosen at connect time, e.g.
+        # /ws/{client_id}?protocol=binary&audio=opus or ?mode=stream&sample_rate=16000
+        params = websocket.query_params
+        protocol = WebSocketProtocol.negotiate(params)
+        hello = protocol.hello()
+        if hello is not None:
+            await protocol.send(websocket, hello)
+
+        # Whisper size and inference profile for this session, e.g. ?stt_model=base&stt_profile=fast;
+        # ?source_lang=auto detects the spoken language once and keeps it for the session
+        try:
+            session_stt = stt_options(params.get("stt_model"), params.get("stt_profile"))
+        except ValueError as e:
+            await protocol.send(websocket, {"type": "error", "error": str(e)})
+            await websocket.close(code=1008)
+            return
+
+        if params.get("mode") == "stream":
+            await stream_transcription(
+                websocket,
+                protocol,
+                client_id,
+                int(params.get("sample_rate", "16000")),
+                params.get("encoding", "pcm_s16le"),
+                session_stt,
+                params.get("source_lang", "en")
+            )
+            return
+
+        # ?room=lecture&role=listener&target_lang=fr or ?room=lecture&role=speaker&source_lang=en
+        room_id = params.get("room")
+        if room_id:
+            if params.get("role") == "speaker":
+                await speak_to_room(websocket, protocol, client_id, room_id, params.get("source_lang", "en"), session_stt)
+            else:
+                await listen_to_room(websocket, protocol, client_id, room_id, params.get("target_lang", "es"))
+            return
+
+        async def translate_audio(audio_array: np.ndarray):
+            if translation_service is None:
+                # Without the speech models there is no STT to run
                 response = TranslationResponse(
                     original_text="Speech-to-text not implemented",
                     translated_text="Please type your text instead",
                     speaker_id="system",
                     error="Speech-to-text is not available in the free tier"
                 )
-                
-                await websocket.send_json(response.dict())
-                print(f"Sent response to client: {client_id}")
-                
-            except Exception as e:
-                print(f"Error processing audio: {e}")
-                error_response = TranslationResponse(
-                    original_text="",
-                    translated_text="",
-                    speaker_id="error",
-                    error=str(e)
-                )
-                await websocket.send_json(error_response.dict())
-                
+                await protocol.send_response(websocket, response)
+                return
+            # Each speaker turn is sent as soon as it is ready, in order
+            async for response in translation_service.process_audio_stream(
+                audio_array,
+                TARGET_SAMPLE_RATE,
+                params.get("source_lang", "en"),
+                params.get("target_lang", "es"),
+                user_id=user_id,
+                session_id=client_id,
+                stt_options=dict(session_stt),
+                prepared=True
+            ):
+                await protocol.send_response(websocket, response)
+            logger.debug("Sent response to client: %s", client_id)
+
+        async def control(message: dict):
+            # {"type": "stt", "model": "tiny", "profile": "fast"} changes STT for the following audio
+            if message.get("type") == "stt":
+                try:
+                    options = stt_options(message.get("model"), message.get("profile"))
+                except ValueError as e:
+                    await protocol.send(websocket, {"type": "error", "error": str(e)})
+                    return
+                session_stt.update(options)
+            elif message.get("type") == "speak":
+                with tracer.trace("ws.speak", client_id=client_id):
+                    await speak(websocket, protocol, client_id, message)
+
+        await receive_audio(websocket, protocol, translate_audio, control)
+
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
     finally:
+        if stt_model is not None:
+            # Decodes still waiting to be batched, or batched only with this session's
+            stt_model.cancel_session(client_id)
+        if model_pool is not None:
+            model_pool.cancel_session(client_id)
+        if translation_service is not None:
+            translation_service.end_session(client_id)
+        if protocol is not None:
+            record_traffic(protocol)
         if client_id in active_connections:
             del active_connections[client_id]
-            print(f"WebSocket client disconnected: {client_id}")
+            logger.info("WebSocket client disconnected: %s", client_id)
+
+def rate_limited_response(e: RateLimitExceeded) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Translation service is rate limited. Please try again in a few seconds."},
+        headers={"Retry-After": str(max(1, int(e.retry_after + 0.999)))}
+    )
+
+def detect_text_language(text: str, caller: str) -> Tuple[Optional[str], float]:
+    """
+    Language of a text to translate and the confidence in it
+    (None, confidence) when neither the text nor the caller's earlier texts
+    make any language likely enough to translate from
+    """
+    probabilities = text_language.probabilities(text)
+    lang = max(probabilities, key=probabilities.get) if probabilities else None
+    confidence = probabilities[lang] if lang else 0.0
+    if confidence >= TEXT_LID_MIN_CONFIDENCE:
+        caller_languages.observe(caller, probabilities)
+        return lang, confidence
+    cached = caller_languages.get(caller)
+    if cached is not None and cached[1] >= TEXT_LID_MIN_CONFIDENCE:
+        return cached
+    return None, confidence
 
 @app.get("/translate")
 async def translate_text(
+    request: Request,
     text: str,
-    source_lang: str,
-    target_lang: str
+    target_lang: str,
+    source_lang: str = AUTO
 ):
     """
     Translate text using MyMemory Translation API
+    Without source_lang (or with source_lang=auto) the language is detected; see
+    language_id.TextLanguageDetector for the languages it can tell apart
     Authentication disabled for development
     """
     try:
         if not text.strip():
             return {"error": "Please enter text to translate"}
-            
-        translated_text = translator.translate(text, source_lang, target_lang)
+
+        # Per-caller quota; keyed by client address until auth is enabled here
+        caller = request.client.host if request.client else "anonymous"
+        await rate_limiter.check_user(caller)
+        detected = None
+        if source_lang == AUTO:
+            source_lang, confidence = detect_text_language(text, caller)
+            if source_lang is None:
+                return {
+                    "error": "Could not detect the source language; please pass source_lang",
+                    "detected": {"source_lang": None, "confidence": round(confidence, 3)}
+                }
+            detected = {"source_lang": source_lang, "confidence": round(confidence, 3)}
+        translated_text = await translator.translate_async(text, source_lang, target_lang)
         
         if translated_text == text and source_lang != target_lang:
             return {"error": "Translation service is rate limited. Please try again in a few seconds."}
         
-        return {
+        response = {
             "original_text": text,
             "translated_text": translated_text
         }
+        if detected is not None:
+            response["detected"] = detected
+        return response
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
     except Exception as e:
-        print(f"Translation error: {e}")
+        logger.error("Translation error: %s", e)
+        return {"error": str(e)}
+
+@app.post("/translate/batch")
+async def translate_batch(request: Request, items: List[TranslationRequest]):
+    """
+    Translate a list of segments in one call
+    Results come back in input order with per-item errors
+    """
+    try:
+        await rate_limiter.check_user(request.client.host if request.client else "anonymous")
+        results = await batch_translator.translate(items)
+        return [result.dict() for result in results]
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except ValueError as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except Exception as e:
+        logger.error("Batch translation error: %s", e)
         return {"error": str(e)}
 
 @app.get("/translations")
-async def get_translations(user_id: str = Depends(auth_service.get_current_user)):
+async def get_translations(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    source_lang: Optional[str] = None,
+    target_lang: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    q: Optional[str] = None,
+    user_id: str = Depends(auth_service.get_current_user)
+):
     """
-    Get user's translation history
+    Get a page of the user's translation history, newest first
+    Pass next_cursor back as cursor for the following page; fields picks columns,
+    e.g. ?fields=original_text,translated_text&source_lang=en&target_lang=es&q=train
     """
     try:
-        result = await db_client.client \
-            .from_("translations") \
-            .select("*") \
-            .eq("user_id", user_id) \
-            .order("created_at", desc=True) \
-            .execute()
-        
-        return result.data
+        # Spliced into the PostgREST query; anything but a timestamp is the caller's mistake
+        since = parse_timestamp(since, "since") if since else None
+        until = parse_timestamp(until, "until") if until else None
+        items, next_cursor = await asyncio.to_thread(
+            db_client.list_translations,
+            user_id,
+            limit=max(1, min(limit, 200)),
+            cursor=cursor,
+            columns=fields.split(",") if fields else None,
+            source_lang=source_lang,
+            target_lang=target_lang,
+            since=since,
+            until=until,
+            search=q
+        )
+        return {"items": items, "next_cursor": next_cursor}
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
-        print(f"Error fetching translations: {e}")
-        return []
+        logger.error("Error fetching translations: %s", e)
+        return {"items": [], "next_cursor": None}
+
+@app.on_event("startup")
+async def startup():
+    db_client.translations.start()
+    db_client.audio_links.start()
+    storage_service.start()
+    rate_limiter.start()
+    if model_pool is not None:
+        model_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await translator.aclose()
+    # Uploads first, since they queue links; then rows still queued are written, or journaled for the next start
+    await storage_service.drain()
+    await db_client.translations.drain()
+    await db_client.audio_links.drain()
+    if model_pool is not None:
+        model_pool.shutdown()
+    shutdown_logging()
+
+def collect_service_metrics():
+    """Gauges and totals read from the services' stats() at scrape time"""
+    admission_stats = admission.stats()
+    translations = db_client.translations.stats()
+    audio_links = db_client.audio_links.stats()
+    storage = storage_service.stats()
+    rooms = room_manager.stats()
+    queues = [
+        ({"queue": "inbound_audio"}, admission_stats["queued"]),
+        ({"queue": "admission"}, admission_stats["waiting"]),
+        ({"queue": "db_translations"}, translations["pending"]),
+        ({"queue": "db_audio_links"}, audio_links["pending"]),
+        ({"queue": "storage_uploads"}, storage["pending"]),
+        ({"queue": "room_listeners"}, sum(room["queued"] for room in rooms["by_room"].values())),
+    ]
+    if model_pool is not None:
+        queues.append(({"queue": "model_pool"}, model_pool.stats()["queued"]))
+    yield "queue_depth", "Items waiting in each queue", "gauge", queues
+    yield "admission_active", "Audio messages being processed", "gauge", [({}, admission_stats["active"])]
+    yield "inbound_audio_shed_total", "Inbound audio dropped or merged under load", "counter", [
+        ({"reason": "queue_full"}, admission_stats["dropped_full"]),
+        ({"reason": "stale"}, admission_stats["dropped_stale"]),
+        ({"reason": "coalesced"}, admission_stats["coalesced"]),
+        ({"reason": "over_budget"}, admission_stats["shed"]),
+    ]
+
+    caches = {"translation": translation_cache.stats(), "tts": tts_cache.stats()}
+    yield "cache_hit_ratio", "Share of cache lookups that hit", "gauge", [
+        ({"cache": name}, cache["hit_rate"]) for name, cache in caches.items()
+    ]
+    yield "cache_lookups_total", "Cache lookups by result", "counter", [
+        ({"cache": name, "result": result}, cache[key])
+        for name, cache in caches.items() for result, key in (("hit", "hits"), ("miss", "misses"))
+    ]
+
+    # Models load in the worker processes when there is a pool, in this one otherwise
+    registries = {"main": model_registry.stats()}
+    if model_pool is not None:
+        registries = {str(pid): models for pid, models in model_pool.model_stats().items()}
+    yield "model_load_seconds", "Time the last load of each model took", "gauge", [
+        ({"model": name, "worker": worker}, entry["load_seconds"])
+        for worker, models in registries.items() for name, entry in models.items()
+    ]
+    yield "model_loaded", "Whether each model is in memory", "gauge", [
+        ({"model": name, "worker": worker}, int(entry["loaded"]))
+        for worker, models in registries.items() for name, entry in models.items()
+    ]
+    yield "db_rows_written_total", "Rows written by the write-behind queues", "counter", [
+        ({"table": "translations"}, translations["written"]),
+        ({"table": "audio_links"}, audio_links["written"]),
+    ]
+    yield "websocket_connections", "Open WebSocket connections", "gauge", [({}, len(active_connections))]
+    yield "room_listeners", "Listeners joined to broadcast rooms", "gauge", [({}, rooms["listeners"])]
+
+metrics.add_collector(collect_service_metrics)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: stage latency histograms, queue depths, cache hit rates, model load times"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+async def recent_traces(limit: int = 20):
+    """The latest traces, root span only"""
+    return {"traces": tracer.recent(min(limit, 200))}
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Every span of one trace, in start order"""
+    spans = tracer.get(trace_id)
+    if spans is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired trace"})
+    return {"trace_id": trace_id, "spans": spans}
+
+@app.get("/stats")
+async def stats():
+    """
+    Runtime counters for capacity planning
+    """
+    first_partials = [
+        m["time_to_first_partial_ms"] for m in streaming_metrics
+        if m["time_to_first_partial_ms"] is not None
+    ]
+    first_audio = [
+        m["time_to_first_audio_ms"] for m in speech_metrics
+        if m["time_to_first_audio_ms"] is not None
+    ]
+    return {
+        "translation_cache": translation_cache.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "model_pool": model_pool.stats() if model_pool is not None else None,
+        "stt_batching": stt_model.stats() if stt_model is not None else None,
+        "persistence": {
+            "translations": db_client.translations.stats(),
+            "audio_links": db_client.audio_links.stats()
+        },
+        "storage": storage_service.stats(),
+        "auth": auth_service.stats(),
+        "rooms": room_manager.stats(),
+        "admission": admission.stats(),
+        "text_language_id": caller_languages.stats(),
+        "speech_pipeline": translation_service.stats() if translation_service is not None else None,
+        "models": model_registry.stats(),
+        "worker_models": model_pool.model_stats() if model_pool is not None else None,
+        "websocket": websocket_traffic,
+        "streaming": {
+            "sessions": len(streaming_metrics),
+            "mean_time_to_first_partial_ms": float(np.mean(first_partials)) if first_partials else None
+        },
+        "tts_cache": tts_cache.stats(),
+        "speech_synthesis": {
+            "sessions": len(speech_metrics),
+            "mean_time_to_first_audio_ms": float(np.mean(first_audio)) if first_audio else None,
+            "p95_time_to_first_audio_ms": float(np.percentile(first_audio, 95)) if first_audio else None
+        }
+    }
 
 @app.get("/")
 async def root():
@@ -1,10 +1,51 @@
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
+import base64
+import json
+import logging
 import os
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
 from src.models.translation import TranslationResponse
+from src.database.write_behind import WriteBehindQueue
+from src.services.telemetry import timed
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Columns a history query may project; created_at and id are always returned for the cursor
+HISTORY_COLUMNS = (
+    "id", "original_text", "translated_text", "source_lang", "target_lang",
+    "speaker_id", "audio_url", "created_at"
+)
+
+def encode_cursor(row: dict) -> str:
+    """Opaque cursor pointing just past row in (created_at desc, id desc) order"""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def parse_timestamp(value: str, name: str = "timestamp") -> str:
+    """An ISO 8601 timestamp, re-serialized; raises ValueError for anything else"""
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat()
+    except (TypeError, ValueError, AttributeError):
+        raise ValueError(f"Invalid {name}: expected an ISO 8601 timestamp")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    The (created_at, id) a cursor points past, both parsed and re-serialized
+    They are spliced into a PostgREST or=() filter, so nothing but a timestamp
+    and a UUID may come through
+    """
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return parse_timestamp(str(created_at)), str(uuid.UUID(str(row_id)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
 class SupabaseClient:
     def __init__(self):
         supabase_url = os.getenv("SUPABASE_URL")
@@ -15,19 +56,142 @@ class SupabaseClient:
             
         # Initialize Supabase client with older version syntax
         self.client: Client = create_client(supabase_url, supabase_key)
-    
-    async def store_translation(self, translation: TranslationResponse):
+
+        # History rows are written in the background, in bulk, off the request path
+        self.translations = WriteBehindQueue(
+            self.insert_translations,
+            max_batch=int(os.getenv("DB_BATCH_SIZE", "100")),
+            flush_interval_ms=float(os.getenv("DB_FLUSH_INTERVAL_MS", "500")),
+            max_attempts=int(os.getenv("DB_MAX_ATTEMPTS", "4")),
+            journal_dir=os.getenv("DB_JOURNAL_DIR", "data/journal"),
+            name="translations"
+        )
+        # Audio URLs arrive after their rows, once the upload finishes
+        self.audio_links = WriteBehindQueue(
+            self.update_audio_urls,
+            max_batch=int(os.getenv("DB_BATCH_SIZE", "100")),
+            flush_interval_ms=float(os.getenv("DB_FLUSH_INTERVAL_MS", "500")),
+            max_attempts=int(os.getenv("DB_MAX_ATTEMPTS", "4")),
+            journal_dir=os.getenv("DB_JOURNAL_DIR", "data/journal"),
+            name="audio_links"
+        )
+        # Updates a link may match no rows before it is dropped; its insert normally lands within a few
+        self.link_max_misses = int(os.getenv("DB_LINK_MAX_MISSES", "12"))
+
+    @timed("store_translation")
+    async def store_translation(
+        self,
+        translation: TranslationResponse,
+        user_id: str,
+        source_lang: str,
+        target_lang: str,
+        audio_url: Optional[str] = None
+    ):
         """
-        Store translation record in Supabase
+        Queue a translation record for Supabase and return its id
+        Returns without waiting for the write
         """
-        try:
-            data = {
-                "original_text": translation.original_text,
-                "translated_text": translation.translated_text,
-                "speaker_id": translation.speaker_id,
-            }
-            
-            return await self.client.table("translations").insert(data).execute()
-        except Exception as e:
-            print(f"Error storing translation: {e}")
-            return None
\ No newline at end of file
+        # Generated here so a retried batch that already landed is ignored, not duplicated
+        row_id = str(uuid.uuid4())
+        self.translations.enqueue({
+            "id": row_id,
+            "user_id": user_id,
+            "original_text": translation.original_text,
+            "translated_text": translation.translated_text,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "speaker_id": translation.speaker_id,
+            "audio_url": audio_url,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        return row_id
+
+    def link_audio(self, row_id: str, audio_url: str):
+        """Set a translation's audio_url, in its queued row if it hasn't been written yet"""
+        if not self.translations.patch_pending(lambda row: row["id"] == row_id, {"audio_url": audio_url}):
+            self.audio_links.enqueue({"id": row_id, "audio_url": audio_url})
+
+    def update_audio_urls(self, links: List[dict]):
+        """
+        One update per distinct URL; identical clips share a URL, so this is often a single request
+        Raises if a row isn't there yet, so the link is retried after its insert lands. Each link
+        counts the updates that missed its row; past link_max_misses the row is taken to be gone
+        for good (deleted, or not writable with this key) and the link is dropped
+        """
+        by_url = {}
+        for link in links:
+            if link.get("misses", 0) < self.link_max_misses:
+                by_url.setdefault(link["audio_url"], []).append(link)
+        waiting = 0
+        for audio_url, url_links in by_url.items():
+            ids = [link["id"] for link in url_links]
+            query = self.client.table("translations").update({"audio_url": audio_url}).in_("id", ids)
+            # Only the ids come back, to tell which rows were there
+            query.params = query.params.add("select", "id")
+            updated = {row["id"] for row in query.execute().data}
+            for link in url_links:
+                if link["id"] in updated:
+                    continue
+                # Counted on the link itself, so the count survives retries and the journal
+                link["misses"] = link.get("misses", 0) + 1
+                if link["misses"] < self.link_max_misses:
+                    waiting += 1
+                else:
+                    self.audio_links.dropped += 1
+                    logger.warning(
+                        "Dropping audio link for translation %s: no row matched after %s updates",
+                        link["id"], link["misses"]
+                    )
+        if waiting:
+            raise ValueError(f"{waiting} translation rows not written yet")
+
+    def insert_translations(self, rows: List[dict]):
+        """Bulk insert in one request; raises so the queue can retry"""
+        self.client.table("translations").upsert(
+            rows, returning=ReturnMethod.minimal, ignore_duplicates=True, on_conflict="id"
+        ).execute()
+
+    @timed("list_translations")
+    def list_translations(
+        self,
+        user_id: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        source_lang: Optional[str] = None,
+        target_lang: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        search: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of a user's history, newest first, and the cursor for the next page
+        Pages are keyset-paginated on (created_at, id), so each one is an index
+        range scan however deep the client has paged
+        """
+        columns = [column for column in (columns or HISTORY_COLUMNS) if column in HISTORY_COLUMNS]
+        columns = list(dict.fromkeys(columns + ["created_at", "id"]))
+
+        query = self.client.table("translations").select(",".join(columns)).eq("user_id", user_id)
+        if source_lang:
+            query = query.eq("source_lang", source_lang)
+        if target_lang:
+            query = query.eq("target_lang", target_lang)
+        if since:
+            query = query.gte("created_at", since)
+        if until:
+            query = query.lt("created_at", until)
+        if search:
+            query = query.filter("search", "wfts(simple)", search)
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            query.params = query.params.add(
+                "or", f'(created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id}))'
+            )
+        # One order parameter, so PostgREST sorts on both keys of the index
+        query.params = query.params.add("order", "created_at.desc,id.desc")
+
+        # One extra row tells us whether there is a next page
+        rows = query.limit(limit + 1).execute().data
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
@@ -0,0 +1,269 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+from src.services.telemetry import instrument
+
+logger = logging.getLogger(__name__)
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, under another user
+        return True
+    return True
+
+class WriteBehindQueue:
+    """
+    Buffers rows off the request path and writes them in bulk
+    A batch is flushed once it reaches max_batch rows or its oldest row has
+    waited flush_interval_ms. Failed writes are retried with exponential
+    backoff; rows that still can't be written are appended to a JSON-lines
+    journal and replayed once the database accepts writes again
+    """
+    def __init__(
+        self,
+        write_rows: Callable[[List[dict]], None],
+        max_batch: int = 100,
+        flush_interval_ms: float = 500.0,
+        max_attempts: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 10.0,
+        max_pending: int = 10000,
+        journal_dir: Optional[str] = None,
+        name: str = "rows"
+    ):
+        self.write_rows = write_rows  # Blocking bulk insert; raises on failure
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_pending = max_pending
+        self.journal_dir = journal_dir
+        self.name = name
+
+        self._pending: List[dict] = []
+        self._oldest: Optional[float] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._writing: Optional[List[dict]] = None  # Batch taken off _pending and not yet written or journaled
+        self._overflow: List[dict] = []  # Rows past max_pending, waiting to be journaled off the event loop
+        self._spiller: Optional[asyncio.Task] = None
+        self._journal_lock = threading.Lock()
+        self._closing = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.journaled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self.flush_seconds = 0.0
+
+        if journal_dir:
+            os.makedirs(journal_dir, exist_ok=True)
+
+    @property
+    def journal_path(self) -> Optional[str]:
+        if not self.journal_dir:
+            return None
+        # One file per process, so workers never interleave partial lines
+        return os.path.join(self.journal_dir, f"{self.name}-{os.getpid()}.jsonl")
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, row: dict):
+        """Queue a row for writing; never blocks on the database"""
+        self.enqueued += 1
+        if len(self._pending) >= self.max_pending:
+            # The database has been away long enough to fill memory; keep the row on disk instead
+            if self._task is None:
+                self._spill([row])
+                return
+            # Journaled by a background task, so the caller never waits on the disk
+            self._overflow.append(row)
+            if self._spiller is None or self._spiller.done():
+                self._spiller = asyncio.create_task(self._spill_overflow())
+            return
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._pending.append(row)
+        if self._wake is not None and len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    def patch_pending(self, match: Callable[[dict], bool], changes: dict) -> bool:
+        """Update a row that is still queued; False once it has left the queue"""
+        for row in self._pending:
+            if match(row):
+                row.update(changes)
+                return True
+        return False
+
+    async def _run(self):
+        await self._replay()
+        while not self._closing:
+            timeout = self.flush_interval
+            if self._oldest is not None:
+                timeout = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._pending:
+                if await self._flush_pending() and self.journal_dir:
+                    # The database is reachable again; catch up on anything spilled earlier
+                    await self._replay()
+
+    async def _flush_pending(self) -> bool:
+        """Write out the queue; True if the last write landed, i.e. the database is reachable now"""
+        ok = True
+        while self._pending:
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            self._oldest = time.monotonic() if self._pending else None
+            self._writing = batch
+            written = await self._write(batch)
+            self._writing = None
+            ok = written
+            if not written:
+                await asyncio.to_thread(self._spill, batch)
+        return ok
+
+    async def _write(self, batch: List[dict]) -> bool:
+        for attempt in range(self.max_attempts):
+            start = time.perf_counter()
+            try:
+                with instrument(f"db_write.{self.name}", rows=len(batch)):
+                    await asyncio.to_thread(self.write_rows, batch)
+                self.flush_seconds += time.perf_counter() - start
+                self.batches += 1
+                self.written += len(batch)
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning("Error writing %s %s (attempt %s): %s", len(batch), self.name, attempt + 1, e)
+                if attempt + 1 == self.max_attempts or self._closing:
+                    break
+                self.retries += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        return False
+
+    def _spill(self, rows: List[dict]):
+        if not self.journal_dir:
+            self.dropped += len(rows)
+            logger.warning("Dropping %s %s: database unreachable and no journal configured", len(rows), self.name)
+            return
+        with self._journal_lock, open(self.journal_path, "a", encoding="utf-8") as journal:
+            journal.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+            journal.flush()
+            os.fsync(journal.fileno())
+        self.journaled += len(rows)
+
+    def _claims(self) -> List[Tuple[str, str]]:
+        """
+        (journal, name to claim it under) for every journal this process may replay
+        Files left claimed by a process that died mid-replay come first; a live
+        process's claim is left alone
+        """
+        pattern = os.path.join(self.journal_dir, f"{self.name}-*.jsonl")
+        claims = []
+        for path in glob.glob(f"{pattern}.replay-*"):
+            journal, _, pid = path.rpartition(".replay-")
+            if pid.isdigit() and (int(pid) == os.getpid() or not _pid_alive(int(pid))):
+                claims.append((path, f"{journal}.replay-{os.getpid()}"))
+        claims.extend((path, f"{path}.replay-{os.getpid()}") for path in glob.glob(pattern))
+        return claims
+
+    async def _replay(self):
+        """Write journaled rows from any process; a file is deleted only once all of it is written"""
+        if not self.journal_dir:
+            return
+        for path, claimed in self._claims():
+            try:
+                # Whoever renames the file first replays it
+                with self._journal_lock:
+                    if path != claimed:
+                        os.rename(path, claimed)
+            except OSError:
+                continue
+            with open(claimed, encoding="utf-8") as journal:
+                # A crash mid-append can leave a torn last line
+                rows = [json.loads(line) for line in journal if line.endswith("\n")]
+            for start in range(0, len(rows), self.max_batch):
+                batch = rows[start:start + self.max_batch]
+                if not await self._write(batch):
+                    await asyncio.to_thread(self._spill, rows[start:])
+                    os.remove(claimed)
+                    return
+                self.replayed += len(batch)
+            os.remove(claimed)
+
+    async def _spill_overflow(self):
+        while self._overflow:
+            rows, self._overflow = self._overflow, []
+            try:
+                await asyncio.to_thread(self._spill, rows)
+            except OSError as e:
+                self.dropped += len(rows)
+                logger.error("Dropping %s %s: journal write failed: %s", len(rows), self.name, e)
+
+    async def _spill_writing(self):
+        """Journal a batch whose write was cancelled; rows that did land are ignored on replay"""
+        if self._writing:
+            rows, self._writing = self._writing, None
+            await asyncio.to_thread(self._spill, rows)
+
+    async def drain(self, timeout: float = 10.0):
+        """Flush everything still queued, then stop; what can't be written in time goes to the journal"""
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            try:
+                # Cancels the task on timeout; a cancelled replay keeps its claimed file for the next start
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                await self._spill_writing()
+            self._task = None
+        if self._spiller is not None:
+            await self._spiller
+            self._spiller = None
+        try:
+            await asyncio.wait_for(self._flush_pending(), timeout)
+        except asyncio.TimeoutError:
+            await self._spill_writing()
+        rows = self._pending + self._overflow
+        self._pending, self._overflow = [], []
+        if rows:
+            await asyncio.to_thread(self._spill, rows)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending) + len(self._overflow),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "mean_batch_size": self.written / self.batches if self.batches else 0.0,
+            "mean_flush_ms": self.flush_seconds / self.batches * 1000 if self.batches else None,
+            "retries": self.retries,
+            "journaled": self.journaled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+        }
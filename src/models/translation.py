@@ -14,6 +14,9 @@ class TranslationResponse(BaseModel):
     speaker_id: Optional[str] = None
     audio_data: Optional[bytes] = None
     error: Optional[str] = None
+    start: Optional[float] = None  # Seconds from the start of the submitted audio
+    end: Optional[float] = None
+    source_lang: Optional[str] = None  # Language the audio was transcribed as, e.g. when it was detected
 
     def dict(self, *args, **kwargs):
         # Convert to a JSON-serializable dictionary
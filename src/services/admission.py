@@ -0,0 +1,209 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Optional, Set, Tuple
+import numpy as np
+
+POLICIES = ("drop_oldest", "coalesce")
+
+class InboundQueue:
+    """
+    Bounded queue of decoded audio between one connection's socket and its processing
+    When full, "drop_oldest" discards the stalest message and "coalesce" appends
+    the new audio to the last queued message (up to max_coalesced_seconds), so the
+    backlog is processed in one pass. Audio older than max_age_ms when it reaches
+    the front is dropped as stale
+    """
+    def __init__(
+        self,
+        max_messages: int = 8,
+        max_age_ms: float = 5000.0,
+        policy: str = "drop_oldest",
+        max_coalesced_seconds: float = 30.0,
+        sample_rate: int = 16000,
+        busy_interval: float = 1.0
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown inbound queue policy: {policy}")
+        self.max_messages = max_messages
+        self.max_age = max_age_ms / 1000
+        self.policy = policy
+        self.max_coalesced_samples = int(max_coalesced_seconds * sample_rate)
+        self.busy_interval = busy_interval
+
+        self._items: Deque[Tuple[float, np.ndarray]] = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._last_busy = 0.0
+        self.busy = False  # Told the client it is busy and not yet that it is ready again
+
+        self.received = 0
+        self.processed = 0
+        self.dropped_full = 0
+        self.dropped_stale = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    @classmethod
+    def from_env(cls, sample_rate: int = 16000) -> "InboundQueue":
+        return cls(
+            max_messages=int(os.getenv("WS_INBOUND_QUEUE", "8")),
+            max_age_ms=float(os.getenv("WS_INBOUND_MAX_AGE_MS", "5000")),
+            policy=os.getenv("WS_INBOUND_POLICY", "drop_oldest"),
+            max_coalesced_seconds=float(os.getenv("WS_COALESCE_MAX_SECONDS", "30")),
+            sample_rate=sample_rate
+        )
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, audio: np.ndarray) -> Optional[str]:
+        """Queue audio; returns what was shed to make room ("dropped_oldest" or "coalesced"), if anything"""
+        self.received += 1
+        now = time.monotonic()
+        shed = None
+        if len(self._items) >= self.max_messages:
+            _, last = self._items[-1]
+            if self.policy == "coalesce" and len(last) + len(audio) <= self.max_coalesced_samples:
+                # Aged by its newest audio, so the merged message isn't dropped as stale right away
+                self._items[-1] = (now, np.concatenate([last, audio]))
+                self.coalesced += 1
+                return "coalesced"
+            self._items.popleft()
+            self.dropped_full += 1
+            shed = "dropped_oldest"
+        self._items.append((now, audio))
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._ready.set()
+        return shed
+
+    async def get(self) -> Optional[np.ndarray]:
+        """Next audio that isn't stale; None once the queue is closed"""
+        while True:
+            while self._items:
+                received_at, audio = self._items.popleft()
+                if time.monotonic() - received_at > self.max_age:
+                    self.dropped_stale += 1
+                    continue
+                self.processed += 1
+                return audio
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
+
+    def should_notify(self) -> bool:
+        """Throttles busy messages to one per busy_interval"""
+        now = time.monotonic()
+        if now - self._last_busy < self.busy_interval:
+            return False
+        self._last_busy = now
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._items),
+            "max_depth": self.max_depth,
+            "received": self.received,
+            "processed": self.processed,
+            "dropped_full": self.dropped_full,
+            "dropped_stale": self.dropped_stale,
+            "coalesced": self.coalesced,
+        }
+
+class AdmissionController:
+    """
+    Global budget of audio messages processed at once, across every connection
+    Sized to the model workers, so work beyond what they can run waits here
+    for at most max_wait_ms instead of piling up in the worker pool; what
+    can't get a slot in time is shed and its client is told the server is busy
+    """
+    def __init__(self, max_concurrent: int = 4, max_wait_ms: float = 1000.0):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait_ms / 1000
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._queues: Set[InboundQueue] = set()
+        self._closed_totals = {"received": 0, "processed": 0, "dropped_full": 0, "dropped_stale": 0, "coalesced": 0}
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self._service_seconds = 1.0
+        self._busy_messages = 0
+
+    @classmethod
+    def from_env(cls, model_workers: Optional[int] = None) -> "AdmissionController":
+        # Concurrent sessions share batched STT passes, so a couple of messages per worker keeps them busy
+        default = 2 * model_workers if model_workers else 8
+        return cls(
+            max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", str(default))),
+            max_wait_ms=float(os.getenv("ADMISSION_MAX_WAIT_MS", "1000"))
+        )
+
+    def register(self, queue: InboundQueue):
+        self._queues.add(queue)
+
+    def unregister(self, queue: InboundQueue):
+        if queue in self._queues:
+            self._queues.discard(queue)
+            for key, value in queue.stats().items():
+                if key in self._closed_totals:
+                    self._closed_totals[key] += value
+
+    async def acquire(self) -> bool:
+        """Take a processing slot, waiting up to max_wait; False means the message should be shed"""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self, service_seconds: float):
+        self.active -= 1
+        self._slots.release()
+        # Moving average of how long a slot is held, for retry hints
+        self._service_seconds += 0.1 * (service_seconds - self._service_seconds)
+
+    def retry_after_ms(self) -> int:
+        """Rough time until a slot frees up for a new message"""
+        backlog = (self.waiting + self.active) / self.max_concurrent
+        return int(max(1.0, backlog) * self._service_seconds * 1000)
+
+    def busy_message(self, reason: str, queue: InboundQueue) -> dict:
+        self._busy_messages += 1
+        queue.busy = True
+        return {
+            "type": "busy",
+            "reason": reason,
+            "retry_after_ms": self.retry_after_ms(),
+            "queue_depth": len(queue),
+            "dropped": queue.dropped_full + queue.dropped_stale,
+        }
+
+    def stats(self) -> dict:
+        queues = [queue.stats() for queue in self._queues]
+        totals = {key: value + sum(q[key] for q in queues) for key, value in self._closed_totals.items()}
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "mean_service_ms": self._service_seconds * 1000,
+            "busy_messages": self._busy_messages,
+            "connections": len(queues),
+            "queued": sum(q["depth"] for q in queues),
+            "max_queue_depth": max((q["max_depth"] for q in queues), default=0),
+            **totals,
+        }
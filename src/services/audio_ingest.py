@@ -0,0 +1,261 @@
+import io
+import struct
+from functools import lru_cache
+from math import gcd
+from typing import Tuple
+import numpy as np
+
+TARGET_SAMPLE_RATE = 16000
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def pcm_to_float32(frame: bytes, encoding: str = "pcm_s16le") -> np.ndarray:
+    """
+    Decode a raw little-endian PCM frame into float32 samples in [-1, 1]
+    float32 frames are returned as a read-only view of the bytes, without a copy
+    """
+    if encoding == "pcm_f32le":
+        return np.frombuffer(frame, dtype="<f4")
+    return np.multiply(np.frombuffer(frame, dtype="<i2"), 1 / 32768.0, dtype=np.float32)
+
+def _decode_int24(data: memoryview) -> np.ndarray:
+    raw = np.frombuffer(data, dtype=np.uint8)
+    raw = raw[:len(raw) // 3 * 3].reshape(-1, 3).astype(np.int32)
+    samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+    samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples)
+    return np.multiply(samples, 1 / float(1 << 23), dtype=np.float32)
+
+def wav_payload(data: bytes) -> Tuple[int, int, int, int, memoryview]:
+    """
+    Locate the sample data of a RIFF/WAVE file without copying it
+    Returns (format code, channels, sample rate, bits per sample, data chunk view)
+    """
+    view = memoryview(data)
+    if len(data) < 12 or view[:4] != b"RIFF" or view[8:12] != b"WAVE":
+        raise ValueError("Not a WAV file")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = view[offset:offset + 4]
+        (chunk_size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # The real format code is the first two bytes of the subformat GUID
+                (sub_format,) = struct.unpack_from("<H", data, body + 24)
+                fmt = (sub_format,) + fmt[1:]
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            format_code, channels, sample_rate, _, _, bits = fmt
+            # Streamed WAVs may declare a bogus size; trust the bytes actually present
+            payload = view[body:min(body + chunk_size, len(data))]
+            frame_bytes = max(bits // 8, 1) * channels
+            return format_code, channels, sample_rate, bits, payload[:len(payload) // frame_bytes * frame_bytes]
+        # Chunks are padded to an even size
+        offset = body + chunk_size + (chunk_size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+def _decode_wav(data: bytes) -> Tuple[np.ndarray, int]:
+    """Parse a RIFF/WAVE file; samples are views of `data` wherever the sample format allows"""
+    format_code, channels, sample_rate, bits, payload = wav_payload(data)
+    if format_code == _WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        samples = np.frombuffer(payload, dtype="<f4")
+    elif format_code == _WAVE_FORMAT_IEEE_FLOAT and bits == 64:
+        samples = np.frombuffer(payload, dtype="<f8").astype(np.float32)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 16:
+        samples = np.multiply(np.frombuffer(payload, dtype="<i2"), 1 / 32768.0, dtype=np.float32)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 32:
+        samples = np.multiply(np.frombuffer(payload, dtype="<i4"), 1 / 2147483648.0, dtype=np.float32)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 24:
+        samples = _decode_int24(payload)
+    elif format_code == _WAVE_FORMAT_PCM and bits == 8:
+        samples = np.multiply(np.frombuffer(payload, dtype=np.uint8), 1 / 128.0, dtype=np.float32) - 1.0
+    else:
+        raise ValueError(f"Unsupported WAV format {format_code} with {bits} bits")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return samples, sample_rate
+
+def decode_audio(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decode an audio file into float32 samples, shaped (frames,) or (frames, channels)
+    WAV is parsed in place; other containers (FLAC, OGG, ...) go through soundfile
+    """
+    if bytes(data[:4]) == b"RIFF":
+        return _decode_wav(data)
+    import soundfile as sf
+    with io.BytesIO(bytes(data)) as audio_buffer:
+        samples, sample_rate = sf.read(audio_buffer, dtype="float32")
+    return samples, sample_rate
+
+def downmix(audio: np.ndarray) -> np.ndarray:
+    if audio.ndim > 1:
+        return audio.mean(axis=1, dtype=np.float32)
+    return audio
+
+@lru_cache(maxsize=32)
+def _polyphase_filter(up: int, down: int, zero_crossings: int = 10, beta: float = 5.0) -> Tuple[np.ndarray, int]:
+    """
+    Kaiser-windowed sinc low-pass at the upsampled rate, split into `up` phases
+    Returns (taps of shape (up, taps_per_phase), half filter length)
+    """
+    max_rate = max(up, down)
+    half = zero_crossings * max_rate
+    n = np.arange(-half, half + 1)
+    cutoff = 1.0 / max_rate
+    h = cutoff * np.sinc(cutoff * n) * np.kaiser(2 * half + 1, beta) * up
+    taps_per_phase = -(-len(h) // up)
+    h = np.concatenate([h, np.zeros(taps_per_phase * up - len(h))])
+    taps = h.reshape(taps_per_phase, up).T.astype(np.float32)
+    taps.setflags(write=False)
+    return taps, half
+
+# Outputs computed per gather; bounds the (outputs x taps) working set to a few MB
+_BLOCK = 8192
+# Above this many (phase, tap) steps per call the strided loop is Python-bound
+_MAX_STRIDED_STEPS = 512
+
+def _polyphase(
+    x: np.ndarray,
+    x_start: int,
+    n_start: int,
+    n_end: int,
+    up: int,
+    down: int
+) -> np.ndarray:
+    """
+    Output samples [n_start, n_end) of x resampled by up/down
+    x[i] is input sample x_start + i; inputs outside x count as zeros
+    Few phases (e.g. 48 kHz, 8 kHz): outputs sharing a phase are computed as
+    strided slices, one vectorized multiply-add per (phase, tap). Many phases
+    (44.1 kHz, 22.05 kHz) would make that hundreds of tiny Python-level steps
+    per chunk, so blocks of outputs instead gather their input windows into an
+    (outputs x taps) matrix and take one row-wise dot product with their taps
+    """
+    taps, half = _polyphase_filter(up, down)
+    n_taps = taps.shape[1]
+    y = np.zeros(max(n_end - n_start, 0), dtype=np.float32)
+    if len(y) == 0:
+        return y
+
+    # Input span touched by these outputs
+    lo = (n_start * down + half) // up - n_taps + 1
+    hi = ((n_end - 1) * down + half) // up + 1
+    if lo >= x_start and hi <= x_start + len(x):
+        buf = x[lo - x_start:hi - x_start]
+    else:
+        buf = np.zeros(hi - lo, dtype=np.float32)
+        src_lo, src_hi = max(lo, x_start), min(hi, x_start + len(x))
+        if src_hi > src_lo:
+            buf[src_lo - lo:src_hi - lo] = x[src_lo - x_start:src_hi - x_start]
+
+    if up * n_taps <= _MAX_STRIDED_STEPS:
+        for j in range(min(up, len(y))):
+            t = (n_start + j) * down + half
+            phase, q = t % up, t // up - lo
+            out = y[j::up]
+            for k in range(n_taps):
+                # Every `up` outputs later the same phase recurs `down` inputs further on
+                start = q - k
+                out += taps[phase, k] * buf[start:start + (len(out) - 1) * down + 1:down]
+        return y
+
+    # Taps reversed so each output's window reads forwards through buf
+    reversed_taps = taps[:, ::-1]
+    window = np.arange(n_taps, dtype=np.int64) - (n_taps - 1)
+    for block in range(0, len(y), _BLOCK):
+        t = np.arange(n_start + block, n_start + min(block + _BLOCK, len(y)), dtype=np.int64) * down + half
+        newest = t // up - lo
+        y[block:block + len(t)] = np.einsum(
+            "ij,ij->i", buf[newest[:, None] + window], reversed_taps[t % up], dtype=np.float32
+        )
+    return y
+
+def _ratio(orig_sr: int, target_sr: int) -> Tuple[int, int]:
+    g = gcd(int(orig_sr), int(target_sr))
+    return int(target_sr) // g, int(orig_sr) // g
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Band-limited polyphase resampling of mono audio; returns the input itself when rates match"""
+    up, down = _ratio(orig_sr, target_sr)
+    if up == down:
+        return audio
+    n_out = -(-len(audio) * up // down)
+    return _polyphase(audio, 0, 0, n_out, up, down)
+
+class StreamResampler:
+    """
+    Polyphase resampling of audio arriving in chunks
+    Keeps just enough input history that chunk boundaries are seamless;
+    output lags the input by half the filter length
+    """
+    def __init__(self, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE):
+        self.up, self.down = _ratio(orig_sr, target_sr)
+        self._history = np.zeros(0, dtype=np.float32)
+        self._history_start = 0
+        self._received = 0
+        self._produced = 0
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        if self.up == self.down:
+            return chunk
+        taps, half = _polyphase_filter(self.up, self.down)
+        x = np.concatenate([self._history, chunk]) if len(self._history) else chunk
+        self._received += len(chunk)
+        # Outputs whose filter window has fully arrived
+        n_end = max(self._produced, -(-(self._received * self.up - half) // self.down))
+        y = _polyphase(x, self._history_start, self._produced, n_end, self.up, self.down)
+        self._produced = n_end
+
+        keep_from = max((n_end * self.down + half) // self.up - taps.shape[1] + 1, self._history_start)
+        self._history = np.array(x[keep_from - self._history_start:], dtype=np.float32)
+        self._history_start = keep_from
+        return y
+
+    def flush(self) -> np.ndarray:
+        """Emit the tail held back for the filter's lookahead"""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.float32)
+        n_end = -(-self._received * self.up // self.down)
+        y = _polyphase(self._history, self._history_start, self._produced, n_end, self.up, self.down)
+        self._produced = max(self._produced, n_end)
+        return y
+
+def normalize(audio: np.ndarray, in_place: bool = False) -> np.ndarray:
+    """
+    Scale to unit peak
+    Returns a new array unless in_place is set, which only the owner of a
+    writable float32 buffer should do; callers' arrays are never modified
+    """
+    peak = float(np.max(np.abs(audio))) if audio.size else 0.0
+    if peak == 0.0 or peak == 1.0:
+        return audio
+    if in_place and audio.flags.writeable and audio.dtype == np.float32:
+        audio *= 1.0 / peak
+        return audio
+    return np.multiply(audio, 1.0 / peak, dtype=np.float32)
+
+def prepare_audio(audio: np.ndarray, sample_rate: int, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """
+    Downmix, resample and peak-normalize exactly once
+    The result is the mono float32 buffer every pipeline stage works on; the
+    input is left untouched, and scaling happens in place only on buffers
+    created along the way
+    """
+    original = audio
+    audio = downmix(audio)
+    if audio.dtype != np.float32:
+        audio = audio.astype(np.float32)
+    audio = resample(audio, sample_rate, target_sr)
+    return normalize(audio, in_place=audio is not original)
+
+def load_audio(data: bytes, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Decode an uploaded audio file straight into the pipeline's 16 kHz mono buffer"""
+    samples, sample_rate = decode_audio(data)
+    return prepare_audio(samples, sample_rate, target_sr)
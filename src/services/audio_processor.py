@@ -1,50 +1,24 @@
 import numpy as np
 import soundfile as sf
 import io
-import base64
-import wave
+import logging
+from src.services.audio_ingest import TARGET_SAMPLE_RATE, load_audio
+
+logger = logging.getLogger(__name__)
 
 class AudioProcessor:
     @staticmethod
     def bytes_to_audio(audio_bytes: bytes) -> tuple[np.ndarray, int]:
-        """Convert audio bytes to numpy array and sample rate."""
+        """
+        Convert audio bytes to the pipeline's mono 16 kHz float32 buffer and its sample rate
+        Decoding, downmixing, resampling and normalization each happen once here
+        """
         try:
-            # Create an in-memory buffer
-            with io.BytesIO(audio_bytes) as audio_buffer:
-                # Read the WAV file directly from the buffer
-                with wave.open(audio_buffer, 'rb') as wav_file:
-                    # Get audio parameters
-                    channels = wav_file.getnchannels()
-                    sample_width = wav_file.getsampwidth()
-                    sample_rate = wav_file.getframerate()
-                    n_frames = wav_file.getnframes()
-                    
-                    # Read raw audio data
-                    raw_data = wav_file.readframes(n_frames)
-                    
-                    # Convert to numpy array
-                    if sample_width == 2:  # 16-bit audio
-                        dtype = np.int16
-                    else:  # Assume 32-bit float
-                        dtype = np.float32
-                    
-                    audio_data = np.frombuffer(raw_data, dtype=dtype)
-                    
-                    # Reshape if stereo
-                    if channels == 2:
-                        audio_data = audio_data.reshape(-1, 2).mean(axis=1)
-                    
-                    # Convert to float32 and normalize
-                    audio_data = audio_data.astype(np.float32)
-                    if audio_data.size > 0:
-                        audio_data = audio_data / np.max(np.abs(audio_data))
-                    
-                    return audio_data, sample_rate
-                    
+            return load_audio(audio_bytes), TARGET_SAMPLE_RATE
         except Exception as e:
-            print(f"Error processing audio: {e}")
+            logger.error("Error processing audio: %s", e)
             # Return empty audio data with default sample rate
-            return np.array([], dtype=np.float32), 16000
+            return np.array([], dtype=np.float32), TARGET_SAMPLE_RATE
 
     @staticmethod
     def audio_to_bytes(audio_data: np.ndarray, sample_rate: int = 16000) -> bytes:
@@ -59,5 +33,5 @@ class AudioProcessor:
                 sf.write(audio_buffer, audio_data, sample_rate, format='WAV')
                 return audio_buffer.getvalue()
         except Exception as e:
-            print(f"Error converting audio to bytes: {e}")
+            logger.error("Error converting audio to bytes: %s", e)
             return bytes()
\ No newline at end of file
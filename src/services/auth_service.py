@@ -1,15 +1,206 @@
-from fastapi import HTTPException, Depends
+from fastapi import HTTPException, Depends, WebSocket
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from supabase import Client
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import httpx
 import jwt
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from src.services.telemetry import timed
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+class JWKSCache:
+    """
+    Signing keys from a JWKS endpoint, by kid
+    Keys are refetched after ttl, or early when a token names a kid we don't
+    have (the issuer rotated keys), at most once per min_refresh_interval so
+    garbage kids can't hammer the endpoint
+    """
+    def __init__(self, url: str, ttl: float = 600.0, min_refresh_interval: float = 30.0, timeout: float = 5.0):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys: Dict[Optional[str], dict] = {}
+        self._parsed: Dict[Tuple[Optional[str], str], jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._forced_at = 0.0
+        self._lock = asyncio.Lock()
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    async def get(self, kid: Optional[str], algorithm: str) -> Optional[jwt.PyJWK]:
+        key = self._lookup(kid, algorithm)
+        stale = time.monotonic() - self._fetched_at > self.ttl
+        if key is not None and not stale:
+            return key
+        if key is None and not stale:
+            # Unknown kid: refresh early, but only so often
+            if time.monotonic() - self._forced_at < self.min_refresh_interval:
+                return None
+            self._forced_at = time.monotonic()
+        async with self._lock:
+            # Another request may have refreshed while we waited
+            if self._lookup(kid, algorithm) is None or time.monotonic() - self._fetched_at > self.ttl:
+                await self._refresh()
+        return self._lookup(kid, algorithm)
+
+    def _lookup(self, kid: Optional[str], algorithm: str) -> Optional[jwt.PyJWK]:
+        if kid is None and len(self._keys) == 1:
+            kid = next(iter(self._keys))
+        data = self._keys.get(kid)
+        if data is None:
+            return None
+        # The token header can't choose how a published key is used, e.g. an RSA key as an HMAC secret
+        if data.get("alg", algorithm) != algorithm:
+            raise jwt.InvalidAlgorithmError(f"Key {kid} is not for {algorithm}")
+        key = self._parsed.get((kid, algorithm))
+        if key is None:
+            key = self._parsed[(kid, algorithm)] = jwt.PyJWK(data, algorithm)
+        return key
+
+    async def _refresh(self):
+        self._fetched_at = time.monotonic()
+        try:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.get(self.url)
+                response.raise_for_status()
+            self._keys = {data.get("kid"): data for data in response.json().get("keys", [])}
+            self._parsed = {}
+            self.refreshes += 1
+        except Exception as e:
+            # Keep serving the keys we have until the endpoint comes back
+            self.refresh_errors += 1
+            logger.error("Error refreshing JWKS from %s: %s", self.url, e)
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._keys),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "age_seconds": time.monotonic() - self._fetched_at if self._fetched_at else None,
+        }
+
+class TokenCache:
+    """Bounded LRU of validated token claims, each kept until the token expires"""
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(token: str) -> str:
+        # Hashed, so the cache never holds usable credentials
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key: str, claims: dict, expires_at: float):
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
 class AuthService:
-    def __init__(self, supabase_client: Client):
+    """
+    Verifies Supabase access tokens
+    Asymmetric tokens are checked against the project's JWKS; HS256 tokens
+    against SUPABASE_JWT_SECRET. Validated tokens are memoized until they
+    expire, so a client's repeat requests skip the signature check
+    """
+    def __init__(
+        self,
+        supabase_client: Client,
+        jwks_url: Optional[str] = None,
+        jwt_secret: Optional[str] = None,
+        audience: Optional[str] = None,
+        verify: Optional[bool] = None,
+        token_cache: Optional[TokenCache] = None
+    ):
         self.supabase = supabase_client
-    
+        supabase_url = os.getenv("SUPABASE_URL", "")
+        self.jwks = JWKSCache(
+            jwks_url or os.getenv("AUTH_JWKS_URL", f"{supabase_url}/auth/v1/.well-known/jwks.json"),
+            ttl=float(os.getenv("AUTH_JWKS_TTL", "600"))
+        )
+        self.jwt_secret = jwt_secret or os.getenv("SUPABASE_JWT_SECRET")
+        self.audience = audience or os.getenv("AUTH_AUDIENCE", "authenticated")
+        self.verify_signatures = verify if verify is not None else os.getenv("AUTH_VERIFY", "1") == "1"
+        self.tokens = token_cache or TokenCache(int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000")))
+        self.failures = 0
+
+    @timed("auth_verify")
+    async def verify(self, token: str) -> dict:
+        """Claims of a valid token; raises jwt.PyJWTError otherwise"""
+        key = self.tokens.make_key(token)
+        claims = self.tokens.get(key)
+        if claims is not None:
+            return claims
+
+        if not self.verify_signatures:
+            claims = jwt.decode(token, options={"verify_signature": False})
+        else:
+            header = jwt.get_unverified_header(token)
+            algorithm = header.get("alg")
+            if algorithm == "HS256" and self.jwt_secret:
+                signing_key = self.jwt_secret
+            elif algorithm in ("RS256", "ES256", "EdDSA", "HS256"):
+                jwk = await self.jwks.get(header.get("kid"), algorithm)
+                if jwk is None:
+                    raise jwt.InvalidKeyError(f"No signing key for kid {header.get('kid')}")
+                signing_key = jwk.key
+            else:
+                raise jwt.InvalidAlgorithmError(f"Unsupported algorithm {algorithm}")
+            claims = jwt.decode(
+                token,
+                signing_key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                options={"require": ["exp", "sub"]}
+            )
+
+        # Tokens without exp are only trusted for as long as they would be re-checked anyway
+        self.tokens.set(key, claims, claims.get("exp", time.time() + 60))
+        return claims
+
     async def get_current_user(
         self,
         credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -18,15 +209,36 @@ class AuthService:
         Validate JWT token and return user_id
         """
         try:
-            token = credentials.credentials
-            # Verify JWT token using Supabase public key
-            payload = jwt.decode(
-                token,
-                options={"verify_signature": False}  # In production, verify the signature
-            )
-            return payload.get("sub")
+            return (await self.verify(credentials.credentials)).get("sub")
         except Exception as e:
+            self.failures += 1
             raise HTTPException(
                 status_code=401,
                 detail="Invalid authentication credentials"
-            )
\ No newline at end of file
+            )
+
+    async def authenticate_websocket(self, websocket: WebSocket) -> Optional[str]:
+        """
+        user_id from the token a WebSocket presents at the handshake, or None if it sent none
+        The token comes from ?token=... (browsers can't set headers on WebSockets)
+        or an Authorization: Bearer header; raises jwt.PyJWTError if it is invalid
+        """
+        token = websocket.query_params.get("token")
+        authorization = websocket.headers.get("authorization", "")
+        if not token and authorization.lower().startswith("bearer "):
+            token = authorization[7:]
+        if not token:
+            return None
+        try:
+            return (await self.verify(token)).get("sub")
+        except Exception:
+            self.failures += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "verify_signatures": self.verify_signatures,
+            "failures": self.failures,
+            "tokens": self.tokens.stats(),
+            "jwks": self.jwks.stats(),
+        }
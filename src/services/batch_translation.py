@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+from src.models.translation import TranslationRequest, TranslationResponse
+from src.services.rate_limiter import RateLimitExceeded
+from src.services.translation import TranslationFailed
+
+logger = logging.getLogger(__name__)
+
+class BatchTranslator:
+    """
+    Translate many segments at once
+    Identical strings are translated once, language pairs run concurrently,
+    and each pair is packed into as few upstream calls as the translator allows
+    """
+    def __init__(self, translator, max_items: int = 100):
+        self.translator = translator
+        self.max_items = max_items
+
+    async def translate(self, requests: List[TranslationRequest]) -> List[TranslationResponse]:
+        """
+        Returns one TranslationResponse per request, in input order
+        Failures are reported per item in the error field
+        """
+        if len(requests) > self.max_items:
+            raise ValueError(f"Batch too large: {len(requests)} items (max {self.max_items})")
+
+        # Group distinct texts by language pair, remembering every position they came from
+        groups: Dict[Tuple[str, str], Dict[str, List[int]]] = {}
+        for i, request in enumerate(requests):
+            if not request.text.strip():
+                continue
+            pair = (request.source_lang, request.target_lang)
+            groups.setdefault(pair, {}).setdefault(request.text, []).append(i)
+
+        responses = [
+            TranslationResponse(
+                original_text=request.text,
+                translated_text="",
+                speaker_id=request.speaker_id,
+                error="Please enter text to translate" if not request.text.strip() else None
+            )
+            for request in requests
+        ]
+
+        async def run_group(pair: Tuple[str, str], positions: Dict[str, List[int]]):
+            source_lang, target_lang = pair
+            texts = list(positions)
+            try:
+                translated = await self.translator.translate_batch_async(texts, source_lang, target_lang)
+            except Exception as e:
+                logger.error("Batch translation error: %s", e)
+                translated = [e] * len(texts)
+
+            # Failures come back per segment, as the exception their upstream call raised
+            for text, translated_text in zip(texts, translated):
+                for i in positions[text]:
+                    if isinstance(translated_text, RateLimitExceeded):
+                        responses[i].error = "Translation service is rate limited. Please try again in a few seconds."
+                    elif isinstance(translated_text, TranslationFailed):
+                        responses[i].error = "Translation failed"
+                    elif isinstance(translated_text, Exception):
+                        responses[i].error = str(translated_text)
+                    else:
+                        responses[i].translated_text = translated_text
+
+        await asyncio.gather(*(run_group(pair, positions) for pair, positions in groups.items()))
+        return responses
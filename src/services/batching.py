@@ -0,0 +1,165 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from src.services.model_workers import run_model
+
+logger = logging.getLogger(__name__)
+
+# (item, caller's future, session the item belongs to)
+_Pending = Tuple[Any, asyncio.Future, Optional[str]]
+
+class DynamicBatcher:
+    """
+    Collects single requests into batches for one batched call
+    A batch is flushed when it reaches max_batch_size or when its oldest item
+    has waited max_wait_ms; items with different bucket keys never share a batch.
+    Items carry their session: batch_fn gets the session when every item in
+    the batch shares it, and cancel_session() withdraws a session's items
+    """
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any], Optional[str]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "batcher"
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._pending: Dict[Hashable, List[_Pending]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        # Running batch calls and their callers' futures; referenced here so they aren't garbage-collected
+        self._running: Dict[asyncio.Task, List[asyncio.Future]] = {}
+        self._sessions: Dict[str, Set[asyncio.Future]] = {}
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.cancelled = 0
+
+    async def submit(self, item: Any, bucket: Hashable = None, session_id: Optional[str] = None) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        if session_id is not None:
+            self._sessions.setdefault(session_id, set()).add(future)
+            future.add_done_callback(lambda f: self._forget(session_id, f))
+        pending = self._pending.setdefault(bucket, [])
+        pending.append((item, future, session_id))
+        if len(pending) >= self.max_batch_size or self.max_wait <= 0:
+            self._flush(bucket)
+        elif bucket not in self._timers:
+            self._timers[bucket] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, bucket)
+        return await future
+
+    def _forget(self, session_id: str, future: asyncio.Future):
+        futures = self._sessions.get(session_id)
+        if futures is not None:
+            futures.discard(future)
+            if not futures:
+                del self._sessions[session_id]
+
+    def _flush(self, bucket: Hashable):
+        timer = self._timers.pop(bucket, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(bucket, [])
+        # Callers that gave up while waiting are dropped from the batch
+        pending = [entry for entry in pending if not entry[1].done()]
+        if pending:
+            task = asyncio.ensure_future(self._run(pending))
+            self._running[task] = [future for _, future, _ in pending]
+            task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._running.pop(task, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Batch %s failed: %s", self.name, task.exception())
+
+    async def _run(self, pending: List[_Pending]):
+        self.batches += 1
+        self.items += len(pending)
+        self.batch_sizes[len(pending)] = self.batch_sizes.get(len(pending), 0) + 1
+        sessions = {session_id for _, _, session_id in pending}
+        try:
+            results = await self.batch_fn([item for item, _, _ in pending], sessions.pop() if len(sessions) == 1 else None)
+            if len(results) != len(pending):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(pending)} items")
+            for (_, future, _), result in zip(pending, results):
+                if not future.done():
+                    future.set_result(result)
+        except asyncio.CancelledError:
+            for _, future, _ in pending:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+    def cancel_session(self, session_id: str) -> int:
+        """
+        Cancel a session's queued and in-flight items
+        A running batch call is cancelled too once none of its items are still wanted;
+        otherwise it completes for the other sessions and this session's results are dropped
+        """
+        futures = list(self._sessions.pop(session_id, ()))
+        for future in futures:
+            future.cancel()
+        for task, batch in list(self._running.items()):
+            if all(future.done() for future in batch):
+                task.cancel()
+        self.cancelled += len(futures)
+        return len(futures)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "pending": sum(len(p) for p in self._pending.values()),
+            "running": len(self._running),
+            "cancelled": self.cancelled,
+        }
+
+class BatchedModel:
+    """
+    Model handle that routes single-item calls of one method through a DynamicBatcher
+    e.g. transcribe(audio, sr) calls are grouped into transcribe_batch([audio, ...], sr)
+    Other methods pass straight through to the wrapped service or pool proxy
+    """
+    def __init__(
+        self,
+        target,
+        method: str,
+        batch_method: str,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        length_bucket: Optional[Callable[[Any], Hashable]] = None
+    ):
+        self.target = target
+        self.method = method
+        self.batch_method = batch_method
+        self.length_bucket = length_bucket
+        self.batcher = DynamicBatcher(self._run_batch, max_batch_size, max_wait_ms, name=method)
+
+    async def _run_batch(self, items: List[Tuple[tuple, dict]], session_id: Optional[str]) -> List[Any]:
+        # Items in one bucket share every argument except the first
+        args, kwargs = items[0]
+        return await run_model(
+            self.target, self.batch_method, [item_args[0] for item_args, _ in items], *args[1:],
+            session_id=session_id, **kwargs
+        )
+
+    async def call(self, method: str, *args, session_id: Optional[str] = None, **kwargs):
+        if method != self.method:
+            return await run_model(self.target, method, *args, session_id=session_id, **kwargs)
+        bucket = (args[1:], tuple(sorted(kwargs.items())))
+        if self.length_bucket is not None:
+            bucket += (self.length_bucket(args[0]),)
+        return await self.batcher.submit((args, kwargs), bucket, session_id)
+
+    def cancel_session(self, session_id: str) -> int:
+        return self.batcher.cancel_session(session_id)
+
+    def stats(self) -> dict:
+        return self.batcher.stats()
@@ -0,0 +1,245 @@
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Pass as source_lang to have the language detected
+AUTO = "auto"
+
+# A few hundred characters of everyday text per language; enough for character
+# trigram profiles that tell these languages apart on a sentence or two
+_SAMPLES = {
+    "en": (
+        "the quick brown fox jumps over the lazy dog. i would like to know where the station is and "
+        "what time the next train leaves. we have been waiting for you since this morning, could you "
+        "please tell me how much it costs? thank you very much for your help, it was nice to meet you. "
+        "they said that they would come back tomorrow with their friends and the children. "
+        "good morning, how are you today? i need a doctor, where is the hospital? this is not what we ordered, "
+        "can we have the bill please? my name is anna and i am from london."
+    ),
+    "es": (
+        "el rápido zorro marrón salta sobre el perro perezoso. me gustaría saber dónde está la estación "
+        "y a qué hora sale el próximo tren. te estamos esperando desde esta mañana, ¿podrías decirme "
+        "cuánto cuesta? muchas gracias por tu ayuda, ha sido un placer conocerte. dijeron que volverían "
+        "mañana con sus amigos y los niños, porque también quieren ver la ciudad. "
+        "buenos días, ¿cómo estás hoy? necesito un médico urgentemente, ¿dónde está el hospital? esto no es lo que "
+        "pedimos, ¿nos trae la cuenta, por favor? me llamo ana y soy de madrid."
+    ),
+    "fr": (
+        "le renard brun rapide saute par-dessus le chien paresseux. je voudrais savoir où est la gare et "
+        "à quelle heure part le prochain train. nous vous attendons depuis ce matin, pourriez-vous me dire "
+        "combien ça coûte ? merci beaucoup pour votre aide, c'était un plaisir de vous rencontrer. ils ont "
+        "dit qu'ils reviendraient demain avec leurs amis et les enfants. "
+        "bonjour, comment allez-vous aujourd'hui ? j'ai besoin d'un médecin, où est l'hôpital ? ce n'est pas ce que "
+        "nous avons commandé, l'addition s'il vous plaît. je m'appelle anne et je suis de paris."
+    ),
+    "de": (
+        "der schnelle braune fuchs springt über den faulen hund. ich möchte wissen, wo der bahnhof ist und "
+        "wann der nächste zug abfährt. wir warten seit heute morgen auf dich, kannst du mir bitte sagen, "
+        "wie viel das kostet? vielen dank für deine hilfe, es war schön, dich kennenzulernen. sie haben "
+        "gesagt, dass sie morgen mit ihren freunden und den kindern zurückkommen. "
+        "guten morgen, wie geht es dir heute? ich brauche einen arzt, wo ist das krankenhaus? das ist nicht, was wir "
+        "bestellt haben, die rechnung bitte. ich heiße anna und komme aus berlin."
+    ),
+    "it": (
+        "la veloce volpe marrone salta sopra il cane pigro. vorrei sapere dove si trova la stazione e a che "
+        "ora parte il prossimo treno. ti stiamo aspettando da questa mattina, potresti dirmi quanto costa? "
+        "grazie mille per il tuo aiuto, è stato un piacere conoscerti. hanno detto che sarebbero tornati "
+        "domani con i loro amici e i bambini, perché anche loro vogliono vedere la città. "
+        "buongiorno, come stai oggi? ho bisogno di un medico, dov'è l'ospedale? questo non è quello che abbiamo "
+        "ordinato, ci porta il conto per favore? mi chiamo anna e vengo da roma."
+    ),
+    "pt": (
+        "a rápida raposa marrom pula sobre o cão preguiçoso. eu gostaria de saber onde fica a estação e a "
+        "que horas sai o próximo trem. estamos esperando por você desde esta manhã, você poderia me dizer "
+        "quanto custa? muito obrigado pela sua ajuda, foi um prazer conhecer você. eles disseram que "
+        "voltariam amanhã com os seus amigos e as crianças, porque também querem ver a cidade. "
+        "bom dia, como você está hoje? preciso de um médico, onde fica o hospital? isso não é o que nós pedimos, "
+        "pode trazer a conta, por favor? meu nome é ana e eu sou de lisboa."
+    ),
+    "nl": (
+        "de snelle bruine vos springt over de luie hond. ik wil graag weten waar het station is en hoe laat "
+        "de volgende trein vertrekt. we wachten al sinds vanochtend op je, kun je me vertellen hoeveel het "
+        "kost? heel erg bedankt voor je hulp, het was leuk je te ontmoeten. ze zeiden dat ze morgen terug "
+        "zouden komen met hun vrienden en de kinderen. "
+        "goedemorgen, hoe gaat het vandaag? ik heb een dokter nodig, waar is het ziekenhuis? dit is niet wat we "
+        "besteld hebben, mag ik de rekening alstublieft? mijn naam is anna en ik kom uit amsterdam."
+    ),
+}
+
+# Non-Latin scripts, each read as the language most texts in it are written in.
+# Han alone reads as Chinese; with any kana it is Japanese. Cyrillic reads as
+# Russian unless it has letters only Ukrainian uses
+_SCRIPTS = (
+    ("kana", ((0x3040, 0x30FF), (0x31F0, 0x31FF))),
+    ("ko", ((0xAC00, 0xD7AF), (0x1100, 0x11FF), (0x3130, 0x318F))),
+    ("han", ((0x4E00, 0x9FFF), (0x3400, 0x4DBF))),
+    ("cyrillic", ((0x0400, 0x04FF),)),
+    ("el", ((0x0370, 0x03FF),)),
+    ("ar", ((0x0600, 0x06FF),)),
+    ("he", ((0x0590, 0x05FF),)),
+    ("hi", ((0x0900, 0x097F),)),
+    ("th", ((0x0E00, 0x0E7F),)),
+)
+_UKRAINIAN_LETTERS = set("іїєґІЇЄҐ")
+
+def _script(char: str) -> Optional[str]:
+    code = ord(char)
+    for name, ranges in _SCRIPTS:
+        if any(lo <= code <= hi for lo, hi in ranges):
+            return name
+    return None
+
+def _script_languages(text: str) -> Tuple[Counter, int]:
+    """Letters per non-Latin language, and the number of letters in the text"""
+    scripts: Counter = Counter()
+    letters = 0
+    for char in text:
+        if char.isalpha():
+            letters += 1
+            name = _script(char)
+            if name is not None:
+                scripts[name] += 1
+    languages: Counter = Counter()
+    for name, count in scripts.items():
+        if name in ("kana", "han"):
+            languages["ja" if scripts["kana"] else "zh"] += count
+        elif name == "cyrillic":
+            languages["uk" if _UKRAINIAN_LETTERS & set(text) else "ru"] += count
+        else:
+            languages[name] += count
+    return languages, letters
+
+def _trigrams(text: str) -> Counter:
+    counts: Counter = Counter()
+    for word in re.findall(r"[^\W\d_]+", text.lower()):
+        padded = f" {word} "
+        counts.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return counts
+
+class TextLanguageDetector:
+    """
+    Language identification for short texts
+    Latin-script text is scored against character trigram profiles of en, es,
+    fr, de, it, pt and nl: a naive Bayes score per language, tempered by text
+    length so a few words never come out as certain. Any other Latin-script
+    language comes out as a low-confidence guess among those seven. Text in
+    other scripts is identified by its script (ja, zh, ko, ru, uk, el, ar, he,
+    hi, th), with the script's share of the letters as its probability
+    """
+    def __init__(self, samples: Optional[Dict[str, str]] = None, smoothing: float = 0.5):
+        self._log_probs: Dict[str, Dict[str, float]] = {}
+        self._unseen: Dict[str, float] = {}
+        profiles = {lang: _trigrams(text) for lang, text in (samples or _SAMPLES).items()}
+        vocabulary = len(set().union(*profiles.values()))
+        for lang, counts in profiles.items():
+            total = sum(counts.values()) + smoothing * vocabulary
+            self._log_probs[lang] = {gram: math.log((count + smoothing) / total) for gram, count in counts.items()}
+            self._unseen[lang] = math.log(smoothing / total)
+
+    @property
+    def languages(self):
+        return list(self._log_probs)
+
+    def probabilities(self, text: str) -> Dict[str, float]:
+        """Probability per known language; empty when the text has no letters"""
+        scripts, letters = _script_languages(text)
+        if letters == 0:
+            return {}
+        other = sum(scripts.values())
+        probabilities = {lang: count / letters for lang, count in scripts.items()}
+        if other == letters:
+            return probabilities
+        # What's left is Latin script, shared out by the trigram model
+        latin_share = 1 - other / letters
+        probabilities.update({
+            lang: p * latin_share for lang, p in self._latin_probabilities(text).items()
+        })
+        return probabilities
+
+    def _latin_probabilities(self, text: str) -> Dict[str, float]:
+        grams = _trigrams(text)
+        n = sum(grams.values())
+        if n == 0:
+            return {}
+        scores = {
+            lang: sum(count * log_probs.get(gram, self._unseen[lang]) for gram, count in grams.items())
+            for lang, log_probs in self._log_probs.items()
+        }
+        # Per-trigram evidence is far from independent; scaling by sqrt(n) keeps
+        # long texts decisive without making two words look certain
+        scale = 1 / math.sqrt(n)
+        best = max(scores.values())
+        weights = {lang: math.exp((score - best) * scale) for lang, score in scores.items()}
+        total = sum(weights.values())
+        return {lang: weight / total for lang, weight in weights.items()}
+
+    def detect(self, text: str) -> Tuple[Optional[str], float]:
+        """Most likely language and its probability; (None, 0.0) when there is nothing to go on"""
+        probabilities = self.probabilities(text)
+        if not probabilities:
+            return None, 0.0
+        lang = max(probabilities, key=probabilities.get)
+        return lang, probabilities[lang]
+
+class SessionLanguages:
+    """
+    Detected source language per session, least recently used dropped past max_sessions
+    Detections are averaged as they come in; once the leading language's mean
+    probability reaches min_confidence, or after max_checks detections, the
+    session's language is settled and no further detection is needed
+    """
+    def __init__(self, min_confidence: float = 0.8, max_checks: int = 5, max_sessions: int = 1000):
+        self.min_confidence = min_confidence
+        self.max_checks = max_checks
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Tuple[Counter, int]]" = OrderedDict()
+        self.detections = 0
+        self.cache_hits = 0
+
+    @staticmethod
+    def _estimate(totals: Counter, checks: int) -> Tuple[str, float]:
+        lang, total = max(totals.items(), key=lambda item: item[1])
+        return lang, total / checks
+
+    def get(self, session_id: Optional[str]) -> Optional[Tuple[str, float]]:
+        """The session's language and confidence so far, or None before its first detection"""
+        entry = self._sessions.get(session_id) if session_id is not None else None
+        if entry is None:
+            return None
+        self._sessions.move_to_end(session_id)
+        return self._estimate(*entry)
+
+    def needs_check(self, session_id: Optional[str]) -> bool:
+        """Whether the next voiced audio should go through detection; counts a cache hit when not"""
+        entry = self._sessions.get(session_id) if session_id is not None else None
+        if entry is None:
+            return True
+        totals, checks = entry
+        if checks >= self.max_checks or self._estimate(totals, checks)[1] >= self.min_confidence:
+            self.cache_hits += 1
+            return False
+        return True
+
+    def observe(self, session_id: Optional[str], probabilities: Dict[str, float]) -> Tuple[str, float]:
+        """Fold in one detection and return the session's updated language and confidence"""
+        self.detections += 1
+        if session_id is None:
+            return self._estimate(Counter(probabilities), 1)
+        totals, checks = self._sessions.get(session_id) or (Counter(), 0)
+        totals.update(probabilities)
+        self._sessions[session_id] = (totals, checks + 1)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return self._estimate(totals, checks + 1)
+
+    def end(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "detections": self.detections,
+            "cache_hits": self.cache_hits,
+        }
@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+def _estimate_mb(model: Any) -> Optional[float]:
+    """Parameter memory of a torch module, or of a tuple of them"""
+    if isinstance(model, (tuple, list)):
+        sizes = [_estimate_mb(part) for part in model]
+        sizes = [size for size in sizes if size is not None]
+        return sum(sizes) if sizes else None
+    parameters = getattr(model, "parameters", None)
+    if parameters is None:
+        return None
+    try:
+        return sum(p.numel() * p.element_size() for p in parameters()) / (1024 * 1024)
+    except Exception:
+        return None
+
+class _Entry:
+    def __init__(self, loader: Callable[[], Any], size_mb: float):
+        self.loader = loader
+        self.size_mb = size_mb
+        self.model: Any = None
+        self.loaded = False
+        self.failed: Optional[str] = None
+        self.refs = 0
+        self.last_used = 0.0
+        self.load_seconds: Optional[float] = None
+        self.loads = 0
+        self.lock = threading.Lock()
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps them warm
+    Models in use are reference counted; idle ones are unloaded, least recently
+    used first, when the registry is over its memory budget or idle_seconds
+    """
+    def __init__(self, memory_budget_mb: Optional[float] = None, idle_seconds: Optional[float] = None):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_seconds = idle_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], size_mb: float = 0.0):
+        """Register a loader; registering an existing name again is a no-op"""
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(loader, size_mb)
+
+    def _load(self, name: str, entry: _Entry):
+        with entry.lock:
+            if entry.loaded or entry.failed:
+                return
+            start = time.perf_counter()
+            try:
+                entry.model = entry.loader()
+                entry.loaded = True
+                entry.size_mb = _estimate_mb(entry.model) or entry.size_mb
+                logger.info("Loaded model %s in %.1fs", name, time.perf_counter() - start)
+            except Exception as e:
+                # Remember the failure so every request doesn't retry a broken download
+                entry.failed = str(e)
+                logger.error("Error loading model %s: %s", name, e)
+            entry.load_seconds = time.perf_counter() - start
+            entry.loads += 1
+        self._enforce_budget(keep=name)
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it if needed; None if it failed to load"""
+        entry = self._entries[name]
+        if not entry.loaded:
+            self._load(name, entry)
+        entry.last_used = time.time()
+        return entry.model
+
+    @contextmanager
+    def use(self, name: str):
+        """Hold a reference for the duration of an inference so the model can't be unloaded"""
+        entry = self._entries[name]
+        with self._lock:
+            entry.refs += 1
+        try:
+            yield self.get(name)
+        finally:
+            with self._lock:
+                entry.refs -= 1
+                entry.last_used = time.time()
+            # Models held past the budget can go once nobody is using them
+            if entry.refs == 0:
+                self._enforce_budget(keep=name)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None):
+        """Load models ahead of the first request"""
+        for name in list(names if names is not None else self._entries):
+            self.get(name)
+
+    def unload(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        with self._lock:
+            if entry.refs > 0 or not entry.loaded:
+                return False
+            entry.model = None
+            entry.loaded = False
+        logger.info("Unloaded model %s", name)
+        return True
+
+    def loaded_mb(self) -> float:
+        return sum(entry.size_mb for entry in self._entries.values() if entry.loaded)
+
+    def _enforce_budget(self, keep: Optional[str] = None):
+        if self.memory_budget_mb is None:
+            return
+        idle = sorted(
+            (
+                (entry.last_used, name) for name, entry in self._entries.items()
+                if entry.loaded and entry.refs == 0 and name != keep
+            )
+        )
+        for _, name in idle:
+            if self.loaded_mb() <= self.memory_budget_mb:
+                break
+            self.unload(name)
+
+    def evict_idle(self):
+        """Unload models unused for idle_seconds, then anything needed to fit the budget"""
+        if self.idle_seconds is not None:
+            cutoff = time.time() - self.idle_seconds
+            for name, entry in list(self._entries.items()):
+                if entry.loaded and entry.refs == 0 and entry.last_used < cutoff:
+                    self.unload(name)
+        self._enforce_budget()
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "loaded": entry.loaded,
+                "failed": entry.failed,
+                "refs": entry.refs,
+                "size_mb": round(entry.size_mb, 1),
+                "load_seconds": entry.load_seconds,
+                "loads": entry.loads,
+            }
+            for name, entry in self._entries.items()
+        }
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+# Process-wide registry; each model worker process has its own
+registry = ModelRegistry(
+    memory_budget_mb=_env_float("MODEL_MEMORY_BUDGET_MB"),
+    idle_seconds=_env_float("MODEL_IDLE_SECONDS")
+)
@@ -0,0 +1,250 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Optional, Set
+from src.services.model_registry import registry
+from src.services.telemetry import configure_logging, instrument
+
+logger = logging.getLogger(__name__)
+
+# Model name -> "module:Class" of the service wrapping it; instantiated inside workers only
+DEFAULT_MODELS = {
+    "stt": "src.services.speech_to_text:WhisperSTTService",
+    "tts": "src.services.text_to_speech:VITSService",
+    "diarization": "src.services.speaker_recognition:SpeechBrainDiarization",
+}
+
+# Per-process state of a worker
+_worker_models: Dict[str, object] = {}
+_worker_factories: Dict[str, str] = {}
+
+def _init_worker(factories: Dict[str, str], preload: Iterable[str], torch_threads: int, reports=None):
+    """Runs once in each worker process: pin thread counts and warm the preloaded models"""
+    configure_logging()
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+        torch.set_num_interop_threads(1)
+    except Exception as e:
+        logger.warning("Could not tune torch threads in model worker: %s", e)
+    _worker_factories.update(factories)
+    for name in preload:
+        _get_worker_model(name).warm_up()
+    if reports is not None:
+        # Every worker reports its preload, whether or not it ever gets a call
+        reports.put((os.getpid(), registry.stats()))
+
+def _get_worker_model(name: str):
+    model = _worker_models.get(name)
+    if model is None:
+        module_name, class_name = _worker_factories[name].split(":")
+        model = getattr(importlib.import_module(module_name), class_name)()
+        _worker_models[name] = model
+    return model
+
+def _run(name: str, method: str, args: tuple, kwargs: dict):
+    try:
+        result = getattr(_get_worker_model(name), method)(*args, **kwargs)
+    finally:
+        # Give back memory held by models this worker hasn't needed lately
+        registry.evict_idle()
+    # The worker's registry rides back with every result, so the pool can report it
+    return result, os.getpid(), registry.stats()
+
+def _ping() -> int:
+    return os.getpid()
+
+class WorkerPoolBusy(Exception):
+    pass
+
+class ModelProxy:
+    """Stand-in for a service object whose methods execute in the worker pool"""
+    def __init__(self, pool: "ModelWorkerPool", model: str, session_id: Optional[str] = None):
+        self.pool = pool
+        self.model = model
+        self.session_id = session_id
+
+    async def call(self, method: str, *args, session_id: Optional[str] = None, **kwargs):
+        return await self.pool.submit(
+            self.model,
+            method,
+            *args,
+            session_id=session_id or self.session_id,
+            **kwargs
+        )
+
+async def run_model(service, method: str, *args, session_id: Optional[str] = None, **kwargs):
+    """
+    Call a model method without blocking the event loop
+    Model handles (pool proxies, batchers) expose an async call(); plain services run in a thread
+    """
+    call = getattr(service, "call", None)
+    if call is not None:
+        return await call(method, *args, session_id=session_id, **kwargs)
+    return await asyncio.to_thread(getattr(service, method), *args, **kwargs)
+
+class ModelWorkerPool:
+    """
+    Process pool for the CPU-heavy speech models
+    Each worker loads its models once; submissions are admitted through a
+    bounded queue, limited per model, and can be cancelled per session
+    """
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 64,
+        model_limits: Optional[Dict[str, int]] = None,
+        torch_threads: Optional[int] = None,
+        preload: Iterable[str] = (),
+        models: Optional[Dict[str, str]] = None,
+        admission_timeout: float = 0.0
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.models = dict(models or DEFAULT_MODELS)
+        self.model_limits = model_limits or {name: workers for name in self.models}
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.preload = tuple(preload)
+        self.admission_timeout = admission_timeout
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._admission = asyncio.Semaphore(max_queue)
+        self._model_slots = {name: asyncio.Semaphore(limit) for name, limit in self.model_limits.items()}
+        self._sessions: Dict[str, Set[asyncio.Task]] = {}
+        self._worker_models: Dict[int, dict] = {}  # Worker pid -> its registry's latest stats()
+        self._reports = None
+        self.queued = 0
+        self.running: Dict[str, int] = {name: 0 for name in self.models}
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    @classmethod
+    def from_env(cls, preload: Iterable[str] = ()) -> "ModelWorkerPool":
+        return cls(
+            workers=int(os.getenv("MODEL_WORKERS", "2")),
+            max_queue=int(os.getenv("MODEL_QUEUE_SIZE", "64")),
+            torch_threads=int(os.getenv("TORCH_THREADS", "0")) or None,
+            preload=preload
+        )
+
+    def start(self):
+        """Spawn the workers; models listed in preload are loaded as each worker starts"""
+        if self._executor is None:
+            context = multiprocessing.get_context("spawn")
+            self._reports = context.SimpleQueue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.models, self.preload, self.torch_threads, self._reports)
+            )
+            for _ in range(self.workers):
+                self._executor.submit(_ping)
+        return self
+
+    def proxy(self, model: str, session_id: Optional[str] = None) -> ModelProxy:
+        return ModelProxy(self, model, session_id)
+
+    async def _admit(self):
+        """Take a queue slot or fail fast (or after admission_timeout) when the queue is full"""
+        try:
+            if self.admission_timeout > 0:
+                await asyncio.wait_for(self._admission.acquire(), self.admission_timeout)
+            elif self._admission.locked():
+                raise WorkerPoolBusy(f"Model queue full ({self.max_queue} pending)")
+            else:
+                await self._admission.acquire()
+        except (asyncio.TimeoutError, WorkerPoolBusy):
+            self.rejected += 1
+            raise WorkerPoolBusy(f"Model queue full ({self.max_queue} pending)")
+
+    async def _execute(self, model: str, method: str, args: tuple, kwargs: dict):
+        await self._admit()
+        self.queued += 1
+        waiting = True
+        try:
+            async with self._model_slots[model]:
+                self.queued -= 1
+                waiting = False
+                self.running[model] += 1
+                try:
+                    loop = asyncio.get_running_loop()
+                    # Cancelling this await also cancels the work if it has not started yet
+                    with instrument(f"{model}.{method}"):
+                        result, pid, models = await loop.run_in_executor(
+                            self.start()._executor, _run, model, method, args, kwargs
+                        )
+                    self._worker_models[pid] = models
+                    self.completed += 1
+                    return result
+                finally:
+                    self.running[model] -= 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            if waiting:
+                self.queued -= 1
+            self._admission.release()
+
+    async def submit(self, model: str, method: str, *args, session_id: Optional[str] = None, **kwargs):
+        """
+        Run `method` of `model` in a worker and await the result
+        Raises WorkerPoolBusy when the queue is full
+        """
+        if model not in self.models:
+            raise ValueError(f"Unknown model: {model}")
+        task = asyncio.ensure_future(self._execute(model, method, args, kwargs))
+        if session_id is not None:
+            tasks = self._sessions.setdefault(session_id, set())
+            tasks.add(task)
+            task.add_done_callback(lambda t: self._forget(session_id, t))
+        return await task
+
+    def _forget(self, session_id: str, task: asyncio.Task):
+        tasks = self._sessions.get(session_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._sessions[session_id]
+
+    def cancel_session(self, session_id: str) -> int:
+        """
+        Cancel everything a session still has queued or running
+        Work already executing in a worker runs to completion but its result is dropped
+        """
+        tasks = list(self._sessions.get(session_id, ()))
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def model_stats(self) -> Dict[int, dict]:
+        """Each worker's model registry stats(), as of its last finished call or its startup"""
+        while self._reports is not None and not self._reports.empty():
+            pid, models = self._reports.get()
+            # Startup reports are older than anything a call has brought back
+            self._worker_models.setdefault(pid, models)
+        return dict(self._worker_models)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads,
+            "queued": self.queued,
+            "running": dict(self.running),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "capacity": self.max_queue,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
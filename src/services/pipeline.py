@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional
+import numpy as np
+
+class Stage(NamedTuple):
+    """One step of a StagedPipeline: fn(item) -> item, or None to drop the item"""
+    name: str
+    fn: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+
+class StageStats:
+    """Timings and queue depth of one stage, accumulated over every run"""
+    def __init__(self, name: str, concurrency: int, window: int = 1000):
+        self.name = name
+        self.concurrency = concurrency
+        self.items = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_queue_depth = 0
+        self._queue_depth_total = 0
+        self._durations = deque(maxlen=window)
+
+    def record_queued(self, depth: int):
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._queue_depth_total += depth
+
+    def record(self, waited: float, duration: float):
+        self.items += 1
+        self.wait_seconds += waited
+        self.busy_seconds += duration
+        self._durations.append(duration)
+
+    def stats(self) -> dict:
+        durations = np.array(self._durations) * 1000 if self._durations else None
+        return {
+            "concurrency": self.concurrency,
+            "items": self.items,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "mean_ms": float(durations.mean()) if durations is not None else None,
+            "p50_ms": float(np.percentile(durations, 50)) if durations is not None else None,
+            "p95_ms": float(np.percentile(durations, 95)) if durations is not None else None,
+            "p99_ms": float(np.percentile(durations, 99)) if durations is not None else None,
+            "mean_wait_ms": self.wait_seconds / self.items * 1000 if self.items else None,
+            # Busy time per worker slot; the stage with the most is the bottleneck
+            "busy_seconds_per_worker": self.busy_seconds / self.concurrency,
+            "mean_queue_depth": self._queue_depth_total / self.items if self.items else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+class _End:
+    pass
+
+class StagedPipeline:
+    """
+    Runs items through async stages connected by bounded queues
+    Each stage has its own workers, so item N+1 can be in STT while item N is
+    in translation; a full queue makes the stage before it wait. Results come
+    out in input order; items a stage drops (returns None) are skipped
+    """
+    def __init__(self, stages: List[Stage], queue_size: int = 4):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stage_stats: Dict[str, StageStats] = {
+            stage.name: StageStats(stage.name, stage.concurrency) for stage in stages
+        }
+        self.runs = 0
+
+    async def run(self, items: AsyncIterable[Any]) -> AsyncIterator[Any]:
+        self.runs += 1
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        done: asyncio.Queue = asyncio.Queue()
+
+        async def feed():
+            index = 0
+            try:
+                async for item in items:
+                    await self._put(queues[0], 0, (index, time.perf_counter(), item))
+                    index += 1
+            except Exception as e:
+                await done.put((index, e))
+                index += 1
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(_End)
+            await done.put((index, _End))  # Total number of items
+
+        finished = [0] * len(self.stages)
+
+        async def work(position: int):
+            stage = self.stages[position]
+            stats = self.stage_stats[stage.name]
+            last = position == len(self.stages) - 1
+            while True:
+                entry = await queues[position].get()
+                if entry is _End:
+                    break
+                index, queued_at, item = entry
+                started = time.perf_counter()
+                try:
+                    result = await stage.fn(item)
+                except Exception as e:
+                    stats.errors += 1
+                    await done.put((index, e))
+                    continue
+                stats.record(started - queued_at, time.perf_counter() - started)
+                if result is None:
+                    stats.dropped += 1
+                    await done.put((index, None))
+                elif last:
+                    await done.put((index, result))
+                else:
+                    await self._put(queues[position + 1], position + 1, (index, time.perf_counter(), result))
+            finished[position] += 1
+            if not last and finished[position] == stage.concurrency:
+                for _ in range(self.stages[position + 1].concurrency):
+                    await queues[position + 1].put(_End)
+
+        tasks = [asyncio.create_task(feed())]
+        for position, stage in enumerate(self.stages):
+            tasks.extend(asyncio.create_task(work(position)) for _ in range(stage.concurrency))
+
+        try:
+            pending: Dict[int, Any] = {}
+            next_index, total = 0, None
+            while total is None or next_index < total:
+                index, result = await done.get()
+                if result is _End:
+                    total = index
+                    continue
+                pending[index] = result
+                # Release everything that is now in order
+                while next_index in pending:
+                    result = pending.pop(next_index)
+                    next_index += 1
+                    if isinstance(result, Exception):
+                        raise result
+                    if result is not None:
+                        yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _put(self, queue: asyncio.Queue, position: int, entry):
+        await queue.put(entry)
+        self.stage_stats[self.stages[position].name].record_queued(queue.qsize())
+
+    def stats(self) -> dict:
+        stages = {name: stats.stats() for name, stats in self.stage_stats.items()}
+        busiest = max(stages, key=lambda name: stages[name]["busy_seconds_per_worker"], default=None)
+        return {
+            "runs": self.runs,
+            "queue_size": self.queue_size,
+            "bottleneck": busiest if self.runs else None,
+            "stages": stages,
+        }
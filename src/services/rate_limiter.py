@@ -0,0 +1,275 @@
+import asyncio
+import glob
+import logging
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets fall back to per-process state
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class RateLimitExceeded(Exception):
+    def __init__(self, bucket: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {bucket}, retry in {retry_after:.1f}s")
+        self.bucket = bucket
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens/second up to `capacity`
+    With a state_dir the bucket lives in a file guarded by flock, so every
+    worker process on the host draws from the same budget
+    """
+    _STATE = struct.Struct("dd")  # tokens, last refill timestamp
+
+    def __init__(self, name: str, rate: float, capacity: float, state_dir: Optional[str] = None):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated = time.time()
+        self._path = None
+        if state_dir and fcntl is not None:
+            os.makedirs(state_dir, exist_ok=True)
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+            self._path = os.path.join(state_dir, f"{safe_name}.bucket")
+
+    def _refill(self, tokens: float, updated: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+    def _take(self, tokens: float, updated: float, amount: float, now: float) -> Tuple[float, float]:
+        """Return (new token count, seconds to wait); tokens are consumed only when wait is 0"""
+        tokens = self._refill(tokens, updated, now)
+        if tokens >= amount:
+            return tokens - amount, 0.0
+        return tokens, (amount - tokens) / self.rate
+
+    def try_acquire(self, amount: float = 1.0) -> float:
+        """
+        Consume tokens if available
+        Returns 0 on success, otherwise the seconds until enough tokens accrue
+        """
+        with self._lock:
+            now = time.time()
+            if self._path is None:
+                self._tokens, wait = self._take(self._tokens, self._updated, amount, now)
+                self._updated = now
+                return wait
+
+            while True:
+                fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                    if not _is_current(fd, self._path):
+                        # Expired and removed while we waited for the lock; start over on a fresh file
+                        continue
+                    raw = os.pread(fd, self._STATE.size, 0)
+                    if len(raw) == self._STATE.size:
+                        tokens, updated = self._STATE.unpack(raw)
+                    else:
+                        tokens, updated = self.capacity, now
+                    tokens, wait = self._take(tokens, updated, amount, now)
+                    os.pwrite(fd, self._STATE.pack(tokens, now), 0)
+                    return wait
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+
+    async def try_acquire_async(self, amount: float = 1.0) -> float:
+        """try_acquire without blocking the event loop on the file lock"""
+        if self._path is None:
+            return self.try_acquire(amount)
+        return await asyncio.to_thread(self.try_acquire, amount)
+
+def _is_current(fd: int, path: str) -> bool:
+    """Whether fd is still the file at path, rather than one unlinked after it was opened"""
+    try:
+        return os.stat(path).st_ino == os.fstat(fd).st_ino
+    except FileNotFoundError:
+        return False
+
+class RateLimiter:
+    """
+    Named per-upstream buckets plus lazily created per-user buckets
+    Callers queue FIFO behind a bucket until their deadline, then get RateLimitExceeded
+    Once start()ed, user bucket files left idle for idle_ttl seconds are removed;
+    by then they have refilled, so a removed bucket comes back exactly as it was
+    """
+    def __init__(
+        self,
+        upstream_rate: float = 1.0,
+        upstream_burst: float = 5.0,
+        user_rate: float = 2.0,
+        user_burst: float = 10.0,
+        max_wait: float = 5.0,
+        state_dir: Optional[str] = None,
+        max_tracked_users: int = 10000,
+        idle_ttl: float = 3600.0,
+        sweep_interval: float = 300.0
+    ):
+        self.upstream_rate = upstream_rate
+        self.upstream_burst = upstream_burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_wait = max_wait
+        self.state_dir = state_dir
+        self.max_tracked_users = max_tracked_users
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._upstreams: Dict[str, TokenBucket] = {}
+        self._users: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._queues: Dict[str, asyncio.Lock] = {}
+        self._waiting: Dict[str, int] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        return cls(
+            upstream_rate=float(os.getenv("TRANSLATOR_RATE", "1.0")),
+            upstream_burst=float(os.getenv("TRANSLATOR_BURST", "5")),
+            user_rate=float(os.getenv("USER_RATE", "2.0")),
+            user_burst=float(os.getenv("USER_BURST", "10")),
+            max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", "5.0")),
+            idle_ttl=float(os.getenv("RATE_LIMIT_IDLE_SECONDS", "3600")),
+            state_dir=os.getenv(
+                "RATE_LIMIT_DIR",
+                os.path.join(tempfile.gettempdir(), "ai-translator-ratelimit")
+            )
+        )
+
+    def start(self):
+        if self._sweeper is None and self.state_dir and fcntl is not None:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def _sweep_periodically(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.warning("Error expiring rate limit buckets: %s", e)
+
+    def sweep(self) -> int:
+        """Remove user bucket files idle past idle_ttl; blocking, returns how many went"""
+        if not self.state_dir or fcntl is None:
+            return 0
+        # A bucket idle for capacity / rate has refilled; removing it sooner would hand out a fresh burst
+        idle_after = max(self.idle_ttl, self.user_burst / self.user_rate)
+        now = time.time()
+        removed = 0
+        for path in glob.glob(os.path.join(self.state_dir, "user-*.bucket")):
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue
+            try:
+                # A bucket someone holds is in use, not idle
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                if not _is_current(fd, path):
+                    continue
+                raw = os.pread(fd, TokenBucket._STATE.size, 0)
+                updated = TokenBucket._STATE.unpack(raw)[1] if len(raw) == TokenBucket._STATE.size else 0.0
+                if now - updated >= idle_after:
+                    # Unlinked under the lock; anyone already waiting on it sees that and reopens
+                    os.unlink(path)
+                    removed += 1
+            except BlockingIOError:
+                continue
+            finally:
+                os.close(fd)
+        self.expired += removed
+        return removed
+
+    def upstream(self, name: str) -> TokenBucket:
+        bucket = self._upstreams.get(name)
+        if bucket is None:
+            bucket = TokenBucket(f"upstream-{name}", self.upstream_rate, self.upstream_burst, self.state_dir)
+            self._upstreams[name] = bucket
+        return bucket
+
+    def user(self, user_id: str) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(f"user-{user_id}", self.user_rate, self.user_burst, self.state_dir)
+            self._users[user_id] = bucket
+            while len(self._users) > self.max_tracked_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return bucket
+
+    async def check_user(self, user_id: str):
+        """Fast path for API edges: consume one user token or raise immediately"""
+        bucket = self.user(user_id)
+        wait = await bucket.try_acquire_async()
+        if wait > 0:
+            self.rejected += 1
+            raise RateLimitExceeded(bucket.name, wait)
+
+    async def acquire(self, upstream: str, max_wait: Optional[float] = None):
+        """
+        Wait in FIFO order for an upstream token
+        Raises RateLimitExceeded as soon as the deadline is known to be unreachable
+        """
+        bucket = self.upstream(upstream)
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+
+        # Everyone ahead of us needs at least one token's worth of refill
+        ahead = self._waiting.get(upstream, 0)
+        if ahead and ahead / bucket.rate > max_wait:
+            self.rejected += 1
+            raise RateLimitExceeded(bucket.name, ahead / bucket.rate)
+
+        queue = self._queues.setdefault(upstream, asyncio.Lock())
+        self._waiting[upstream] = ahead + 1
+        try:
+            async with queue:
+                while True:
+                    wait = await bucket.try_acquire_async()
+                    if wait == 0:
+                        self.admitted += 1
+                        return
+                    remaining = deadline - time.monotonic()
+                    if wait > remaining:
+                        self.rejected += 1
+                        raise RateLimitExceeded(bucket.name, wait)
+                    await asyncio.sleep(wait)
+        finally:
+            self._waiting[upstream] -= 1
+
+    def acquire_sync(self, upstream: str, max_wait: Optional[float] = None):
+        """Blocking variant for sync callers"""
+        bucket = self.upstream(upstream)
+        deadline = time.monotonic() + (self.max_wait if max_wait is None else max_wait)
+        while True:
+            wait = bucket.try_acquire()
+            if wait == 0:
+                self.admitted += 1
+                return
+            if wait > deadline - time.monotonic():
+                self.rejected += 1
+                raise RateLimitExceeded(bucket.name, wait)
+            time.sleep(wait)
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "waiting": dict(self._waiting),
+            "tracked_users": len(self._users),
+            "expired": self.expired,
+        }
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from src.models.translation import TranslationResponse
+from src.services.ws_protocol import WebSocketProtocol
+
+logger = logging.getLogger(__name__)
+
+class Listener:
+    """
+    One subscriber of a room, with its own bounded send queue and sender task
+    When the queue is full the oldest message is dropped, so a slow connection
+    falls behind on its own instead of holding up the room
+    """
+    def __init__(self, client_id: str, websocket, protocol: WebSocketProtocol, language: str, max_queue: int = 32):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.protocol = protocol
+        self.language = language
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.delivered = 0
+        self.dropped = 0
+        self.send_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def offer(self, data: Union[str, bytes]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(data)
+
+    async def _run(self):
+        try:
+            while True:
+                data = await self.queue.get()
+                start = time.perf_counter()
+                await self.protocol.send_encoded(self.websocket, data)
+                self.send_seconds += time.perf_counter() - start
+                self.delivered += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The socket is gone; the endpoint's receive loop notices and leaves the room
+            logger.warning("Stopped sending to listener %s: %s", self.client_id, e)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+class Room:
+    """A speaker's audio translated once per listener language and fanned out to every listener"""
+    def __init__(self, room_id: str, max_queue: int = 32):
+        self.room_id = room_id
+        self.max_queue = max_queue
+        self.listeners: Dict[str, Listener] = {}
+        self.broadcasts = 0
+        self.messages = 0
+        self.encodes = 0
+        self.dropped_total = 0
+
+    def languages(self) -> List[str]:
+        return sorted({listener.language for listener in self.listeners.values()})
+
+    def join(self, client_id: str, websocket, protocol: WebSocketProtocol, language: str) -> Listener:
+        self.leave(client_id)
+        listener = Listener(client_id, websocket, protocol, language, self.max_queue)
+        listener.start()
+        self.listeners[client_id] = listener
+        return listener
+
+    def leave(self, client_id: str):
+        listener = self.listeners.pop(client_id, None)
+        if listener is not None:
+            listener.stop()
+            self.dropped_total += listener.dropped
+
+    def broadcast(self, responses: Dict[str, TranslationResponse]):
+        """Queue each language's response to its listeners, encoding it once per wire format"""
+        self.broadcasts += 1
+        encoded: Dict[Tuple[str, str, str, str], Union[str, bytes]] = {}
+        for listener in list(self.listeners.values()):
+            response = responses.get(listener.language)
+            if response is None:
+                continue  # Joined after this turn's languages were chosen
+            protocol = listener.protocol
+            key = (listener.language, protocol.mode, protocol.header_codec, protocol.audio_format)
+            data = encoded.get(key)
+            if data is None:
+                data = encoded[key] = protocol.encode_response(response)
+                self.encodes += 1
+            listener.offer(data)
+            self.messages += 1
+
+    def stats(self) -> dict:
+        listeners = list(self.listeners.values())
+        return {
+            "listeners": len(listeners),
+            "languages": self.languages(),
+            "broadcasts": self.broadcasts,
+            "messages": self.messages,
+            "encodes": self.encodes,
+            "queued": sum(listener.queue.qsize() for listener in listeners),
+            "dropped": self.dropped_total + sum(listener.dropped for listener in listeners),
+        }
+
+class RoomManager:
+    """Rooms by id; a room exists while it has listeners or a speaker"""
+    def __init__(self, max_queue: int = 32):
+        self.max_queue = max_queue
+        self.rooms: Dict[str, Room] = {}
+        self._speakers: Dict[str, int] = {}
+
+    def get(self, room_id: str) -> Room:
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = Room(room_id, self.max_queue)
+        return room
+
+    def join(self, room_id: str, client_id: str, websocket, protocol: WebSocketProtocol, language: str) -> Listener:
+        return self.get(room_id).join(client_id, websocket, protocol, language)
+
+    def leave(self, room_id: str, client_id: str):
+        room = self.rooms.get(room_id)
+        if room is not None:
+            room.leave(client_id)
+            self._discard_if_empty(room_id)
+
+    def speaker_joined(self, room_id: str) -> Room:
+        self._speakers[room_id] = self._speakers.get(room_id, 0) + 1
+        return self.get(room_id)
+
+    def speaker_left(self, room_id: str):
+        self._speakers[room_id] = self._speakers.get(room_id, 1) - 1
+        if self._speakers[room_id] <= 0:
+            del self._speakers[room_id]
+        self._discard_if_empty(room_id)
+
+    def _discard_if_empty(self, room_id: str):
+        room = self.rooms.get(room_id)
+        if room is not None and not room.listeners and room_id not in self._speakers:
+            del self.rooms[room_id]
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "listeners": sum(len(room.listeners) for room in self.rooms.values()),
+            "by_room": {room_id: room.stats() for room_id, room in self.rooms.items()},
+        }
@@ -1,67 +1,279 @@
+import logging
 import os
 import numpy as np
-import torch
-from typing import List, Tuple
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple, Union
+from src.services.model_registry import ModelRegistry, registry as default_registry
+from src.services.audio_ingest import TARGET_SAMPLE_RATE, downmix, resample
+
+logger = logging.getLogger(__name__)
+
+class DiarizedSegment(NamedTuple):
+    speaker_id: str
+    start: float  # Seconds from the start of the audio passed in
+    end: float
+    audio: np.ndarray
+
+class SpeakerClusterIndex:
+    """
+    Online cosine clustering of speaker embeddings for one session
+    Each speaker is a running-mean centroid; an embedding joins the most similar
+    centroid above similarity_threshold or starts a new speaker, so IDs stay
+    stable across calls without revisiting earlier audio
+    """
+    def __init__(self, similarity_threshold: float = 0.5, max_speakers: int = 8):
+        self.similarity_threshold = similarity_threshold
+        self.max_speakers = max_speakers
+        self.centroids = np.zeros((0, 0), dtype=np.float32)  # Unit-norm rows
+        self.counts: List[int] = []
+
+    def assign(self, embedding: np.ndarray) -> int:
+        """Return the speaker index for one embedding and update its centroid"""
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return 0 if self.counts else self._add(np.ones_like(embedding))
+        embedding = (embedding / norm).astype(np.float32)
+        if not self.counts:
+            return self._add(embedding)
+
+        similarity = self.centroids @ embedding
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.similarity_threshold and len(self.counts) < self.max_speakers:
+            return self._add(embedding)
+
+        count = self.counts[best]
+        centroid = self.centroids[best] * count + embedding
+        self.centroids[best] = centroid / np.linalg.norm(centroid)
+        self.counts[best] = count + 1
+        return best
+
+    def _add(self, embedding: np.ndarray) -> int:
+        embedding = embedding / np.linalg.norm(embedding)
+        if self.centroids.size == 0:
+            self.centroids = embedding[None, :].astype(np.float32)
+        else:
+            self.centroids = np.vstack([self.centroids, embedding])
+        self.counts.append(1)
+        return len(self.counts) - 1
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+def window_bounds(n_samples: int, window: int, hop: int) -> np.ndarray:
+    """Start sample of each analysis window; audio shorter than a window is a single window"""
+    if n_samples <= window:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.arange(0, n_samples - window + 1, hop)
+    # Make sure the tail is covered by a final window
+    if starts[-1] + window < n_samples:
+        starts = np.append(starts, n_samples - window)
+    return starts
+
+def diarize_windows(
+    audio: np.ndarray,
+    starts: np.ndarray,
+    embeddings: np.ndarray,
+    index: SpeakerClusterIndex,
+    window: int,
+    sample_rate: int = 16000
+) -> List[DiarizedSegment]:
+    """
+    Label each window through the session's cluster index and merge runs of the
+    same speaker into timestamped segments; speaker changes are placed halfway
+    between the centres of the two windows that disagree
+    """
+    labels = [index.assign(embedding) for embedding in embeddings]
+    # A single window disagreeing with both neighbours is treated as noise
+    for i in range(1, len(labels) - 1):
+        if labels[i - 1] == labels[i + 1] != labels[i]:
+            labels[i] = labels[i - 1]
+
+    centres = starts + window // 2
+    segments: List[DiarizedSegment] = []
+    segment_start = 0
+    for i, label in enumerate(labels):
+        if i + 1 < len(labels) and labels[i + 1] == label:
+            continue
+        end = len(audio) if i + 1 == len(labels) else int((centres[i] + centres[i + 1]) // 2)
+        segments.append(DiarizedSegment(
+            f"speaker_{label + 1}",
+            segment_start / sample_rate,
+            end / sample_rate,
+            audio[segment_start:end]
+        ))
+        segment_start = end
+    return segments
+
+class SpeakerSessions:
+    """Cluster indices per session, least recently used dropped past max_sessions"""
+    def __init__(self, similarity_threshold: float = 0.5, max_speakers: int = 8, max_sessions: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.max_speakers = max_speakers
+        self.max_sessions = max_sessions
+        self._indices: "OrderedDict[str, SpeakerClusterIndex]" = OrderedDict()
+
+    def get(self, session_id: Optional[str] = None) -> SpeakerClusterIndex:
+        """The session's index; without a session id every call starts from scratch"""
+        if session_id is None:
+            return SpeakerClusterIndex(self.similarity_threshold, self.max_speakers)
+        index = self._indices.get(session_id)
+        if index is None:
+            index = SpeakerClusterIndex(self.similarity_threshold, self.max_speakers)
+            self._indices[session_id] = index
+            while len(self._indices) > self.max_sessions:
+                self._indices.popitem(last=False)
+        self._indices.move_to_end(session_id)
+        return index
+
+    def end(self, session_id: str):
+        self._indices.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+def _load_ecapa():
+    # Set environment variables to disable symlink warnings
+    os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
+    os.environ["HF_HUB_ENABLE_SYMLINKS"] = "0"
+
+    # Create models directory in current working directory
+    models_dir = os.path.join(os.getcwd(), 'models')
+    os.makedirs(models_dir, exist_ok=True)
+
+    from speechbrain.pretrained import SpeakerRecognition
+    model = SpeakerRecognition.from_hparams(
+        source="speechbrain/spkrec-ecapa-voxceleb",
+        savedir=os.path.join(models_dir, "spkrec-ecapa-voxceleb"),
+        run_opts={"device": "cpu"},
+        use_auth_token=None
+    )
+    logger.info("Speaker recognition model loaded successfully")
+    return model
 
 class SpeechBrainDiarization:
-    def __init__(self):
-        # Set environment variables to disable symlink warnings
-        os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-        os.environ["HF_HUB_ENABLE_SYMLINKS"] = "0"
-        
-        # Initialize with fallback mode
-        self.model = None
-        self.device = torch.device("cpu")
-        
+    """
+    Speaker diarization from windowed ECAPA embeddings
+    Windows are embedded in batches and clustered online per session; the
+    embedding step is separate so it can run in a model worker while the
+    session's clusters stay with the caller
+    """
+    def __init__(
+        self,
+        registry: Optional[ModelRegistry] = None,
+        window_seconds: float = 1.5,
+        hop_seconds: float = 0.75,
+        batch_size: int = 32,
+        similarity_threshold: float = 0.5
+    ):
+        # Falls back to single-speaker mode if the model can't be loaded
+        self.device = "cpu"
+        self.registry = registry or default_registry
+        self.registry_key = "ecapa-voxceleb"
+        # torch/speechbrain are imported and the weights loaded on first use
+        self.registry.register(self.registry_key, _load_ecapa)
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.batch_size = batch_size
+        self.sessions = SpeakerSessions(similarity_threshold)
+
+    @property
+    def model(self):
+        return self.registry.get(self.registry_key)
+
+    def warm_up(self):
+        self.registry.warm_up([self.registry_key])
+
+    def window_embeddings(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int = 16000
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+        """
+        Embed overlapping windows of the audio
+        Returns (window start samples, embeddings, window length in samples),
+        or None when the model is unavailable
+        """
+        if self.model is None or len(audio_data) == 0:
+            return None
+
+        # Embeddings are computed at 16 kHz; window starts are reported at the caller's rate
+        audio_16k = resample(downmix(audio_data), sample_rate, TARGET_SAMPLE_RATE)
+        window = int(self.window_seconds * TARGET_SAMPLE_RATE)
+        hop = int(self.hop_seconds * TARGET_SAMPLE_RATE)
+        starts = window_bounds(len(audio_16k), window, hop)
+        if len(audio_16k) <= window:
+            windows = audio_16k[None, :]
+        else:
+            windows = np.lib.stride_tricks.sliding_window_view(audio_16k, window)[starts]
+
+        embeddings = [
+            self.embed_batch(windows[i:i + self.batch_size])
+            for i in range(0, len(windows), self.batch_size)
+        ]
+        scale = sample_rate / TARGET_SAMPLE_RATE
+        return (starts * scale).astype(np.int64), np.concatenate(embeddings), int(window * scale)
+
+    def diarize(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int = 16000,
+        session_id: Optional[str] = None
+    ) -> List[DiarizedSegment]:
+        """
+        Split audio into speaker turns
+        Speaker ids are stable across calls sharing a session_id
+        """
         try:
-            # Create models directory in current working directory
-            models_dir = os.path.join(os.getcwd(), 'models')
-            os.makedirs(models_dir, exist_ok=True)
-            
-            from speechbrain.pretrained import SpeakerRecognition
-            self.model = SpeakerRecognition.from_hparams(
-                source="speechbrain/spkrec-ecapa-voxceleb",
-                savedir=os.path.join(models_dir, "spkrec-ecapa-voxceleb"),
-                run_opts={"device": "cpu"},
-                use_auth_token=None
-            )
-            print("Speaker recognition model loaded successfully")
+            windows = self.window_embeddings(audio_data, sample_rate)
         except Exception as e:
-            print(f"Warning: Using fallback speaker recognition mode: {e}")
-    
-    def process(self, audio_data: np.ndarray, sample_rate: int = 16000) -> List[Tuple[str, np.ndarray]]:
+            logger.warning("Speaker recognition error (using fallback): %s", e)
+            windows = None
+        if windows is None:
+            # Fallback mode - return single speaker
+            return [DiarizedSegment("default_speaker", 0.0, len(audio_data) / sample_rate, audio_data)]
+        starts, embeddings, window = windows
+        return diarize_windows(audio_data, starts, embeddings, self.sessions.get(session_id), window, sample_rate)
+
+    def process(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int = 16000,
+        session_id: Optional[str] = None
+    ) -> List[Tuple[str, np.ndarray]]:
         """
         Process audio and identify speakers
-        Returns list of (speaker_id, audio_segment) tuples
+        Returns list of (speaker_id, audio_segment) tuples in time order
         """
-        try:
-            if self.model is None:
-                # Fallback mode - return single speaker
-                return [("default_speaker", audio_data)]
-            
-            # Resample audio if needed
-            if sample_rate != 16000:
-                # Simple resampling - in production you'd want to use a proper resampling library
-                audio_data = audio_data[::int(sample_rate/16000)]
-            
-            # Convert to float32 and normalize
-            audio_data = audio_data.astype(np.float32)
-            if audio_data.size > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
-            
-            # Convert to tensor
-            waveform = torch.from_numpy(audio_data).float().to(self.device)
-            
-            # Get embeddings
-            with torch.no_grad():
-                embeddings = self.model.encode_batch(waveform)
-                
-            # For now, we'll use a simple approach - just detect if there's speech
-            if torch.norm(embeddings) > 0.1:
-                return [("speaker_detected", audio_data)]
-            else:
-                return [("no_speech_detected", audio_data)]
-            
-        except Exception as e:
-            print(f"Speaker recognition error (using fallback): {e}")
-            return [("default_speaker", audio_data)]
\ No newline at end of file
+        return [(segment.speaker_id, segment.audio) for segment in self.diarize(audio_data, sample_rate, session_id)]
+
+    def end_session(self, session_id: str):
+        self.sessions.end(session_id)
+
+    def embed_batch(self, audio_batch: Union[List[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        ECAPA embeddings for several 16 kHz clips (a list, or a 2-D array of equal-length clips) in one padded forward pass
+        Returns an array of shape (len(audio_batch), embedding_dim)
+        """
+        model = self.model
+        if model is None or len(audio_batch) == 0:
+            return np.zeros((len(audio_batch), 192), dtype=np.float32)
+
+        import torch
+
+        if isinstance(audio_batch, np.ndarray) and audio_batch.ndim == 2:
+            # Equal-length windows need no padding copy
+            padded = np.ascontiguousarray(audio_batch, dtype=np.float32)
+            lengths = np.full(len(padded), padded.shape[1])
+            max_len = max(padded.shape[1], 1)
+        else:
+            lengths = np.array([len(audio) for audio in audio_batch])
+            max_len = max(int(lengths.max()), 1)
+            padded = np.zeros((len(audio_batch), max_len), dtype=np.float32)
+            for i, audio in enumerate(audio_batch):
+                padded[i, :len(audio)] = audio
+
+        wavs = torch.from_numpy(padded).to(self.device)
+        wav_lens = torch.from_numpy(lengths / max_len).float().to(self.device)
+        with self.registry.use(self.registry_key), torch.no_grad():
+            embeddings = model.encode_batch(wavs, wav_lens)
+        return embeddings.squeeze(1).cpu().numpy()
@@ -1,42 +1,306 @@
-import whisper
+import logging
+import os
 import numpy as np
-from typing import Optional
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from src.services.model_registry import ModelRegistry, registry as default_registry
+from src.services.audio_ingest import TARGET_SAMPLE_RATE, prepare_audio
+from src.services.language_id import AUTO
+
+logger = logging.getLogger(__name__)
+
+class STTProfile:
+    """
+    How Whisper runs: the weights it uses, how it searches and how many threads it may take
+    Decoding starts at temperatures[0]; a segment is decoded again at the next
+    temperature only when its result looks unreliable (low average log
+    probability or a repetitive, highly compressible transcript)
+    """
+    def __init__(
+        self,
+        name: str,
+        quantize: bool = False,
+        temperatures: Tuple[float, ...] = (0.0,),
+        best_of: Optional[int] = None,
+        threads: int = 0,
+        condition_on_previous_text: bool = True,
+        logprob_threshold: float = -1.0,
+        compression_ratio_threshold: float = 2.4
+    ):
+        self.name = name
+        self.quantize = quantize
+        self.temperatures = temperatures
+        self.best_of = best_of
+        self.threads = threads
+        self.condition_on_previous_text = condition_on_previous_text
+        self.logprob_threshold = logprob_threshold
+        self.compression_ratio_threshold = compression_ratio_threshold
+
+    def needs_fallback(self, result) -> bool:
+        return (
+            result.compression_ratio > self.compression_ratio_threshold
+            or result.avg_logprob < self.logprob_threshold
+        )
+
+    def transcribe_options(self) -> dict:
+        """Keyword arguments for whisper's transcribe(), which applies the same fallback rule"""
+        return {
+            "temperature": self.temperatures,
+            "best_of": self.best_of,
+            "condition_on_previous_text": self.condition_on_previous_text,
+            "logprob_threshold": self.logprob_threshold,
+            "compression_ratio_threshold": self.compression_ratio_threshold,
+        }
+
+    def decoding_options(self, whisper, temperature: float, language: Optional[str] = "en"):
+        return whisper.DecodingOptions(
+            language=language,
+            task="transcribe",
+            fp16=False,
+            without_timestamps=True,
+            temperature=temperature,
+            # Sampling several candidates only makes sense above temperature 0
+            best_of=self.best_of if temperature > 0 else None
+        )
+
+PROFILES: Dict[str, STTProfile] = {
+    # Full-precision weights, fallback all the way to temperature 1.0 with 5 samples each
+    "accurate": STTProfile("accurate", temperatures=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0), best_of=5),
+    # int8 linear layers, greedy decoding, two single-sample retries, at most 4 threads
+    "fast": STTProfile(
+        "fast",
+        quantize=True,
+        temperatures=(0.0, 0.4, 0.8),
+        threads=4,
+        condition_on_previous_text=False
+    ),
+}
+
+# Model sizes a client may ask for; larger ones cost too much memory to load on demand
+DEFAULT_ALLOWED_MODELS = "tiny,base,small"
+
+def _load_whisper(model_name: str, quantize: bool = False):
+    import whisper
+    model = whisper.load_model(model_name, device="cpu")
+    if quantize:
+        import torch
+        # Whisper's Linear subclass only casts weights to the input dtype, a no-op
+        # in fp32 on CPU; as plain nn.Linear it is picked up by dynamic quantization
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                module.__class__ = torch.nn.Linear
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+def _whisper_language(language: Optional[str]) -> Optional[str]:
+    """Whisper's code for an app language code, e.g. "pt-BR" -> "pt"; None has Whisper detect it"""
+    if not language or language == AUTO:
+        return None
+    return language.split("-")[0].lower()
+
+@contextmanager
+def _thread_cap(threads: int):
+    """
+    Lower torch's intra-op threads for one inference
+    The setting is process-wide, which is fine in a model worker that runs one call at a time
+    """
+    if threads <= 0:
+        yield
+        return
+    import torch
+    previous = torch.get_num_threads()
+    torch.set_num_threads(min(threads, previous))
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+def stt_options(model: Optional[str] = None, profile: Optional[str] = None) -> dict:
+    """
+    Validated per-session or per-request STT settings, as keyword arguments for transcribe()
+    e.g. from ?stt_model=base&stt_profile=fast; raises ValueError for unknown values
+    """
+    options = {}
+    if model:
+        allowed = os.getenv("STT_ALLOWED_MODELS", DEFAULT_ALLOWED_MODELS).split(",")
+        if model not in allowed:
+            raise ValueError(f"Unknown STT model: {model} (choose from {', '.join(allowed)})")
+        options["model"] = model
+    if profile:
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown STT profile: {profile} (choose from {', '.join(PROFILES)})")
+        options["profile"] = profile
+    return options
 
 class WhisperSTTService:
-    def __init__(self, model_name: str = "small"):  # Using small model for better accuracy
-        try:
-            self.model = whisper.load_model(model_name)
-        except Exception as e:
-            print(f"Error loading Whisper model: {e}")
-            self.model = None
+    """
+    Whisper transcription with a default model size and inference profile
+    (STT_MODEL, STT_PROFILE), either of which a call can override
+    """
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        registry: Optional[ModelRegistry] = None,
+        profile: Optional[str] = None
+    ):
+        self.model_name = model_name or os.getenv("STT_MODEL", "small")
+        self.profile = PROFILES[profile or os.getenv("STT_PROFILE", "accurate")]
+        # Overrides every profile's thread cap when set
+        self.threads = int(os.getenv("STT_THREADS", "0"))
+        self.registry = registry or default_registry
+        self.registry_key = self._register(self.model_name, self.profile)
+
+    def _register(self, model_name: str, profile: STTProfile) -> str:
+        # Whisper and torch are imported and the weights loaded on first use
+        key = f"whisper-{model_name}-int8" if profile.quantize else f"whisper-{model_name}"
+        self.registry.register(key, partial(_load_whisper, model_name, profile.quantize))
+        return key
+
+    def _resolve(self, model: Optional[str], profile: Optional[str]) -> Tuple[str, STTProfile]:
+        resolved = PROFILES[profile] if profile else self.profile
+        return self._register(model or self.model_name, resolved), resolved
+
+    @property
+    def model(self):
+        return self.registry.get(self.registry_key)
+
+    def warm_up(self):
+        self.registry.warm_up([self.registry_key])
     
-    def transcribe(self, audio_data: np.ndarray, sample_rate: int = 16000) -> str:
+    def transcribe(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int = 16000,
+        model: Optional[str] = None,
+        profile: Optional[str] = None,
+        language: str = "en"
+    ) -> str:
         """
         Transcribe audio data to text using Whisper
+        language="auto" lets Whisper detect it from the first 30 s of this clip
         """
         try:
-            if self.model is None:
-                return ""
+            key, settings = self._resolve(model, profile)
+            with self.registry.use(key) as whisper_model:
+                if whisper_model is None:
+                    return ""
 
-            # Ensure audio is in the correct format for Whisper
-            if len(audio_data.shape) > 1:
-                audio_data = audio_data.mean(axis=1)  # Convert stereo to mono
-            
-            # Normalize audio data
-            if audio_data.size > 0:
-                audio_data = audio_data / np.max(np.abs(audio_data))
-            
-            # Transcribe audio with more options for better accuracy
-            result = self.model.transcribe(
-                audio_data,
-                fp16=False,  # Disable FP16 on CPU
-                language="en",  # Default to English but can be changed
-                task="transcribe",
-                best_of=5  # Increase beam search for better results
-            )
-            
-            return result["text"].strip()
+                # Whisper wants mono 16 kHz float32; pipeline buffers already are
+                if sample_rate != TARGET_SAMPLE_RATE or audio_data.ndim > 1:
+                    audio_data = prepare_audio(audio_data, sample_rate)
+
+                with _thread_cap(self.threads or settings.threads):
+                    result = whisper_model.transcribe(
+                        audio_data,
+                        fp16=False,  # Disable FP16 on CPU
+                        language=_whisper_language(language),
+                        task="transcribe",
+                        **settings.transcribe_options()
+                    )
+
+                return result["text"].strip()
             
         except Exception as e:
-            print(f"Transcription error: {e}")
-            return ""
\ No newline at end of file
+            logger.error("Transcription error: %s", e)
+            return ""
+
+    def transcribe_batch(
+        self,
+        audio_batch: List[np.ndarray],
+        sample_rate: int = 16000,
+        model: Optional[str] = None,
+        profile: Optional[str] = None,
+        language: str = "en"
+    ) -> List[str]:
+        """
+        Transcribe several clips with one batched decoder pass
+        Clips longer than Whisper's 30 s window go through transcribe() individually
+        """
+        try:
+            key, settings = self._resolve(model, profile)
+            with self.registry.use(key) as whisper_model:
+                if whisper_model is None:
+                    return [""] * len(audio_batch)
+
+                import torch
+                import whisper
+
+                results = [""] * len(audio_batch)
+                mels, batch_indices = [], []
+                for i, audio_data in enumerate(audio_batch):
+                    if sample_rate != TARGET_SAMPLE_RATE or audio_data.ndim > 1:
+                        audio_data = prepare_audio(audio_data, sample_rate)
+                    if not np.any(audio_data):
+                        continue
+                    if len(audio_data) > whisper.audio.N_SAMPLES:
+                        results[i] = self.transcribe(audio_data, TARGET_SAMPLE_RATE, model, profile, language)
+                        continue
+                    mels.append(whisper.log_mel_spectrogram(
+                        whisper.pad_or_trim(audio_data),
+                        n_mels=whisper_model.dims.n_mels
+                    ))
+                    batch_indices.append(i)
+
+                if mels:
+                    with _thread_cap(self.threads or settings.threads):
+                        decoded = self._decode(
+                            whisper,
+                            whisper_model,
+                            torch.stack(mels).to(whisper_model.device),
+                            settings,
+                            _whisper_language(language)
+                        )
+                    for i, result in zip(batch_indices, decoded):
+                        results[i] = result.text.strip()
+                return results
+
+        except Exception as e:
+            logger.error("Batch transcription error: %s", e)
+            return [self.transcribe(audio_data, sample_rate, model, profile, language) for audio_data in audio_batch]
+
+    def _decode(self, whisper, whisper_model, mels, settings: STTProfile, language: Optional[str]) -> list:
+        """Decode the batch at the first temperature; retry only the clips that came out unreliable"""
+        results = whisper.decode(whisper_model, mels, settings.decoding_options(whisper, settings.temperatures[0], language))
+        for temperature in settings.temperatures[1:]:
+            retry = [i for i, result in enumerate(results) if settings.needs_fallback(result)]
+            if not retry:
+                break
+            retried = whisper.decode(whisper_model, mels[retry], settings.decoding_options(whisper, temperature, language))
+            for i, result in zip(retry, retried):
+                results[i] = result
+        return results
+
+    def detect_language(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int = 16000,
+        model: Optional[str] = None,
+        profile: Optional[str] = None,
+        top: int = 5
+    ) -> Dict[str, float]:
+        """
+        Probabilities of the most likely spoken languages, from one encoder pass over
+        the first 30 s; empty if detection failed
+        """
+        try:
+            key, settings = self._resolve(model, profile)
+            with self.registry.use(key) as whisper_model:
+                if whisper_model is None:
+                    return {}
+                if not whisper_model.is_multilingual:
+                    return {"en": 1.0}
+
+                import whisper
+
+                if sample_rate != TARGET_SAMPLE_RATE or audio_data.ndim > 1:
+                    audio_data = prepare_audio(audio_data, sample_rate)
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio_data), n_mels=whisper_model.dims.n_mels)
+                with _thread_cap(self.threads or settings.threads):
+                    _, probabilities = whisper_model.detect_language(mel.to(whisper_model.device))
+                ranked = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)[:top]
+                return {lang: float(p) for lang, p in ranked}
+
+        except Exception as e:
+            logger.error("Language detection error: %s", e)
+            return {}
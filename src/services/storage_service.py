@@ -1,33 +1,266 @@
 import os
 from supabase import Client
-from typing import Optional
-import uuid
+from storage3.utils import StorageException
+from typing import Callable, Dict, Optional
+import asyncio
+import base64
+import hashlib
+import time
+import logging
+from collections import OrderedDict
+import httpx
+from src.services.audio_ingest import decode_audio, resample
+from src.services.ws_protocol import encode_samples
+from src.services.telemetry import timed
+
+logger = logging.getLogger(__name__)
+
+# Object extension and content type per upload format
+UPLOAD_FORMATS = {
+    "opus": ("ogg", "audio/ogg"),
+    "flac": ("flac", "audio/flac"),
+    "wav": ("wav", "audio/wav"),
+}
+
+def _is_duplicate(error: Exception) -> bool:
+    """Storage reports an existing object as a 409, sometimes wrapped in a 400"""
+    details = error.args[0] if error.args and isinstance(error.args[0], dict) else {}
+    return (
+        str(details.get("statusCode")) == "409"
+        or details.get("error") == "Duplicate"
+        or "already exists" in str(details.get("message", ""))
+    )
 
 class StorageService:
-    def __init__(self, supabase_client: Client):
+    """
+    Uploads synthesized audio to Supabase Storage
+    Clips are compressed (Opus by default) and stored under the hash of their
+    content, so identical clips are uploaded once and share a URL. Recordings
+    over resumable_threshold go up in chunks over the TUS protocol and pick up
+    where they left off after a failure. submit_upload() queues work for a
+    bounded pool of background uploads
+    """
+    def __init__(
+        self,
+        supabase_client: Client,
+        audio_format: Optional[str] = None,
+        max_concurrent: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        resumable_threshold: Optional[int] = None,
+        chunk_size: int = 6 * 1024 * 1024,
+        max_attempts: int = 3,
+        known_urls: int = 10000
+    ):
         self.supabase = supabase_client
         self.bucket_name = "translations-audio"
-    
-    async def upload_audio(self, audio_data: bytes, user_id: str) -> Optional[str]:
+        self.audio_format = audio_format or os.getenv("STORAGE_AUDIO_FORMAT", "opus")
+        self.max_concurrent = max_concurrent or int(os.getenv("STORAGE_MAX_CONCURRENT", "4"))
+        self.max_pending = max_pending or int(os.getenv("STORAGE_MAX_PENDING", "256"))
+        self.resumable_threshold = resumable_threshold or int(
+            os.getenv("STORAGE_RESUMABLE_THRESHOLD", str(6 * 1024 * 1024))
+        )
+        self.chunk_size = chunk_size  # Supabase expects 6 MB TUS chunks
+        self.max_attempts = max_attempts
+        self.known_urls = known_urls
+
+        self._urls: "OrderedDict[str, str]" = OrderedDict()  # content hash -> public URL
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+
+        self.uploads = 0
+        self.resumable_uploads = 0
+        self.dedupe_hits = 0
+        self.rejected = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_uploaded = 0
+        self.upload_seconds = 0.0
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.max_concurrent)]
+
+    def submit_upload(self, audio_data: bytes, on_uploaded: Callable[[str], None]) -> bool:
+        """
+        Queue an upload; on_uploaded(url) runs once it is stored
+        Returns False, dropping the clip, when the queue is full or not started
+        """
+        if self._queue is None or self._queue.full():
+            self.rejected += 1
+            return False
+        self._queue.put_nowait((audio_data, on_uploaded))
+        return True
+
+    async def _work(self):
+        while True:
+            audio_data, on_uploaded = await self._queue.get()
+            try:
+                url = await self.upload_audio(audio_data)
+                if url is not None:
+                    on_uploaded(url)
+            except Exception as e:
+                logger.error("Error in upload callback: %s", e)
+            finally:
+                self._queue.task_done()
+
+    @timed("upload_audio")
+    async def upload_audio(self, audio_data: bytes) -> Optional[str]:
         """
         Upload audio file to Supabase Storage and return the URL
+        Objects are shared by every user whose clip has the same content; who
+        owns a clip is recorded on the translation row that links to it
         """
+        digest = hashlib.sha256(audio_data).hexdigest()
+        url = self._urls.get(digest)
+        if url is not None:
+            self._urls.move_to_end(digest)
+            self.dedupe_hits += 1
+            return url
+        # The same clip submitted twice at once is uploaded once
+        inflight = self._inflight.get(digest)
+        if inflight is not None:
+            self.dedupe_hits += 1
+        else:
+            # Runs as its own task, so a caller that goes away doesn't take the upload from the others
+            inflight = asyncio.create_task(self._upload_shared(digest, audio_data))
+            self._inflight[digest] = inflight
+        return await asyncio.shield(inflight)
+
+    async def _upload_shared(self, digest: str, audio_data: bytes) -> Optional[str]:
         try:
-            file_name = f"{user_id}/{uuid.uuid4()}.wav"
-            
-            # Upload file to Supabase Storage
-            result = await self.supabase.storage \
-                .from_(self.bucket_name) \
-                .upload(file_name, audio_data)
-            
-            if result.get("Key"):
-                # Get public URL
-                url = self.supabase.storage \
-                    .from_(self.bucket_name) \
-                    .get_public_url(file_name)
-                return url
-            
-            return None
+            url = await asyncio.to_thread(self._store, digest, audio_data)
+            if url is not None:
+                self._urls[digest] = url
+                while len(self._urls) > self.known_urls:
+                    self._urls.popitem(last=False)
+            return url
         except Exception as e:
-            print(f"Error uploading audio: {e}")
-            return None
\ No newline at end of file
+            logger.error("Error uploading audio: %s", e)
+            return None
+        finally:
+            del self._inflight[digest]
+
+    def _store(self, digest: str, audio_data: bytes) -> Optional[str]:
+        """Compress and upload one clip; blocking, run in a thread"""
+        extension, content_type = UPLOAD_FORMATS.get(self.audio_format, UPLOAD_FORMATS["wav"])
+        if self.audio_format in ("opus", "flac"):
+            samples, sample_rate = decode_audio(audio_data)
+            # Opus only runs at 8/12/16/24/48 kHz
+            if self.audio_format == "opus" and sample_rate not in (8000, 12000, 16000, 24000, 48000):
+                samples, sample_rate = resample(samples, sample_rate, 48000), 48000
+            data, _ = encode_samples(samples, sample_rate, self.audio_format)
+        else:
+            data = audio_data
+        # Content-addressed; the format is part of the hash so switching formats doesn't collide
+        file_name = f"{digest[:2]}/{digest}-{self.audio_format}.{extension}"
+
+        start = time.perf_counter()
+        for attempt in range(self.max_attempts):
+            try:
+                if len(data) > self.resumable_threshold:
+                    self._upload_resumable(file_name, data, content_type)
+                    self.resumable_uploads += 1
+                else:
+                    self._upload(file_name, data, content_type)
+                break
+            except Exception as e:
+                if _is_duplicate(e):
+                    # Stored earlier, maybe by another process
+                    self.dedupe_hits += 1
+                    return self._public_url(file_name)
+                if attempt + 1 == self.max_attempts:
+                    self.failures += 1
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
+        self.uploads += 1
+        self.bytes_in += len(audio_data)
+        self.bytes_uploaded += len(data)
+        self.upload_seconds += time.perf_counter() - start
+        return self._public_url(file_name)
+
+    def _upload(self, file_name: str, data: bytes, content_type: str):
+        self.supabase.storage.from_(self.bucket_name).upload(
+            file_name,
+            data,
+            {"content-type": content_type, "cache-control": "31536000", "x-upsert": "false"}
+        )
+
+    def _upload_resumable(self, file_name: str, data: bytes, content_type: str):
+        """TUS upload in chunk_size pieces; a failed chunk resumes from the server's offset"""
+        key = self.supabase.supabase_key
+        headers = {"authorization": f"Bearer {key}", "apikey": key, "tus-resumable": "1.0.0", "x-upsert": "false"}
+        metadata = {
+            "bucketName": self.bucket_name,
+            "objectName": file_name,
+            "contentType": content_type,
+            "cacheControl": "31536000",
+        }
+        with httpx.Client(timeout=60.0) as client:
+            response = client.post(
+                f"{self.supabase.supabase_url}/storage/v1/upload/resumable",
+                headers={
+                    **headers,
+                    "upload-length": str(len(data)),
+                    "upload-metadata": ",".join(
+                        f"{name} {base64.b64encode(value.encode()).decode()}" for name, value in metadata.items()
+                    ),
+                }
+            )
+            if response.status_code == 409:
+                raise StorageException({"statusCode": 409, "error": "Duplicate"})
+            response.raise_for_status()
+            location = response.headers["location"]
+
+            offset, failures = 0, 0
+            while offset < len(data):
+                try:
+                    response = client.patch(
+                        location,
+                        headers={
+                            **headers,
+                            "upload-offset": str(offset),
+                            "content-type": "application/offset+octet-stream",
+                        },
+                        content=data[offset:offset + self.chunk_size]
+                    )
+                    response.raise_for_status()
+                    offset = int(response.headers["upload-offset"])
+                except httpx.HTTPError:
+                    failures += 1
+                    if failures >= self.max_attempts:
+                        raise
+                    time.sleep(0.5 * 2 ** (failures - 1))
+                    # Ask how much arrived before resending
+                    response = client.head(location, headers=headers)
+                    response.raise_for_status()
+                    offset = int(response.headers["upload-offset"])
+
+    def _public_url(self, file_name: str) -> str:
+        return self.supabase.storage.from_(self.bucket_name).get_public_url(file_name)
+
+    async def drain(self, timeout: float = 30.0):
+        """Finish queued uploads, then stop the workers"""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Abandoning %s queued audio uploads", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        self._queue, self._workers = None, []
+
+    def stats(self) -> dict:
+        return {
+            "format": self.audio_format,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "uploads": self.uploads,
+            "resumable_uploads": self.resumable_uploads,
+            "dedupe_hits": self.dedupe_hits,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "compression_ratio": self.bytes_in / self.bytes_uploaded if self.bytes_uploaded else None,
+            "mean_upload_ms": self.upload_seconds / self.uploads * 1000 if self.uploads else None,
+        }
@@ -0,0 +1,228 @@
+import time
+import numpy as np
+from typing import List, Optional
+from src.services.model_workers import run_model
+from src.services.language_id import AUTO, SessionLanguages
+
+class AudioRingBuffer:
+    """
+    Fixed-size float32 ring buffer addressed by absolute sample index
+    Only the most recent `capacity` samples are retained
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.total = 0  # Samples written since the start of the stream
+
+    def write(self, samples: np.ndarray):
+        samples = samples[-self.capacity:]
+        start = self.total % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self.total += len(samples)
+
+    def read(self, start: int, end: Optional[int] = None) -> np.ndarray:
+        """Copy samples [start, end) out of the buffer; start is clamped to what is retained"""
+        end = self.total if end is None else min(end, self.total)
+        start = max(start, self.total - self.capacity, 0)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        indices = np.arange(start, end) % self.capacity
+        return self._data[indices]
+
+def _common_prefix(a: List[str], b: List[str]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x.lower().strip(".,!?") != y.lower().strip(".,!?"):
+            break
+        n += 1
+    return n
+
+def _overlap(previous: List[str], current: List[str], max_words: int = 8) -> int:
+    """Length of the longest suffix of `previous` that `current` starts with"""
+    for n in range(min(max_words, len(previous), len(current)), 0, -1):
+        if _common_prefix(previous[-n:], current[:n]) == n:
+            return n
+    return 0
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of one audio stream
+    stt_service may be a WhisperSTTService or a worker-pool proxy for one
+    Whisper re-decodes a sliding window as audio arrives; words that two
+    consecutive hypotheses agree on become stable, and the window is
+    finalized and slid forward (keeping some overlap) once it is full
+    With source_lang="auto" the spoken language is detected on the first
+    voiced window and reused, re-checked only while its confidence is low
+    """
+    def __init__(
+        self,
+        stt_service,
+        sample_rate: int = 16000,
+        window_seconds: float = 10.0,
+        step_seconds: float = 1.0,
+        overlap_seconds: float = 1.0,
+        min_seconds: float = 0.5,
+        vad=None,
+        stt_options: Optional[dict] = None,
+        session_id: Optional[str] = None,
+        source_lang: str = "en",
+        languages: Optional[SessionLanguages] = None
+    ):
+        self.stt_service = stt_service
+        self.stt_options = stt_options or {}
+        # Decodes are tagged with the session so they can be cancelled when it ends
+        self.session_id = session_id
+        self.source_lang = source_lang
+        self.languages = languages if languages is not None else SessionLanguages()
+        self.language: Optional[str] = None if source_lang == AUTO else source_lang
+        self.vad = vad
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_seconds * sample_rate)
+        self.step_samples = int(step_seconds * sample_rate)
+        self.overlap_samples = int(overlap_seconds * sample_rate)
+        self.min_samples = int(min_seconds * sample_rate)
+        self.buffer = AudioRingBuffer(self.window_samples * 2)
+
+        self.window_start = 0
+        self.decoded_until = 0
+        self.previous_hypothesis: List[str] = []
+        self.stable_words: List[str] = []
+        self.last_final: List[str] = []
+        self.overlapping = False  # Window start was slid back into already-finalized audio
+
+        self.started_at: Optional[float] = None
+        self.first_partial_at: Optional[float] = None
+        self.decode_times: List[float] = []
+        self.skipped_silence = 0
+
+    def push(self, samples: np.ndarray):
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        self.buffer.write(samples)
+
+    def ready(self) -> bool:
+        """Enough new audio has arrived to be worth another decode"""
+        pending = self.buffer.total - self.window_start
+        return pending >= self.min_samples and self.buffer.total - self.decoded_until >= self.step_samples
+
+    async def _identify_language(self, audio: np.ndarray) -> str:
+        estimate = self.languages.get(self.session_id)
+        if estimate is None or self.languages.needs_check(self.session_id):
+            probabilities = await run_model(
+                self.stt_service, "detect_language", audio, self.sample_rate,
+                session_id=self.session_id, **self.stt_options
+            )
+            if probabilities:
+                estimate = self.languages.observe(self.session_id, probabilities)
+        # Undetectable (e.g. detection failed): fall back to the old default
+        return estimate[0] if estimate is not None else "en"
+
+    async def _decode(self, audio: np.ndarray) -> List[str]:
+        start = time.perf_counter()
+        if self.source_lang == AUTO:
+            self.language = await self._identify_language(audio)
+        text = await run_model(
+            self.stt_service, "transcribe", audio, self.sample_rate,
+            session_id=self.session_id, language=self.language, **self.stt_options
+        )
+        self.decode_times.append(time.perf_counter() - start)
+        words = text.split()
+        # Drop words repeated from the overlap with the previous final
+        if self.overlapping and self.last_final:
+            words = words[_overlap(self.last_final, words):]
+        return words
+
+    def _final(self, words: List[str]) -> Optional[dict]:
+        if not words:
+            return None
+        self.last_final = words
+        return {
+            "type": "final",
+            "text": " ".join(words),
+            "start": self.window_start / self.sample_rate,
+            "end": self.decoded_until / self.sample_rate,
+        }
+
+    async def step(self) -> List[dict]:
+        """
+        Decode the current window and return the messages to send
+        Partial messages carry the stable prefix and the still-changing tail
+        """
+        end = self.buffer.total
+
+        # Silence since the last decode: endpoint the utterance instead of decoding
+        if self.vad is not None and not self.vad.is_speech(self.buffer.read(self.decoded_until, end), self.sample_rate):
+            self.skipped_silence += 1
+            self.decoded_until = end
+            messages = []
+            final = self._final(self.previous_hypothesis)
+            if final:
+                messages.append(final)
+            self.window_start = end
+            self.overlapping = False
+            self.previous_hypothesis = []
+            self.stable_words = []
+            return messages
+
+        audio = self.buffer.read(self.window_start, end)
+        words = await self._decode(audio)
+        self.decoded_until = end
+
+        agreed = _common_prefix(self.previous_hypothesis, words)
+        if agreed > len(self.stable_words):
+            self.stable_words = words[:agreed]
+        self.previous_hypothesis = words
+
+        messages = []
+        if words:
+            if self.first_partial_at is None:
+                self.first_partial_at = time.perf_counter()
+            messages.append({
+                "type": "partial",
+                "stable_text": " ".join(self.stable_words),
+                "text": " ".join(words),
+                "start": self.window_start / self.sample_rate,
+            })
+
+        if end - self.window_start >= self.window_samples:
+            final = self._final(words)
+            if final:
+                messages.append(final)
+            self.window_start = max(self.window_start, end - self.overlap_samples)
+            self.overlapping = True
+            self.previous_hypothesis = []
+            self.stable_words = []
+        return messages
+
+    async def flush(self) -> List[dict]:
+        """Finalize whatever is left in the window at end of stream"""
+        messages = []
+        if self.buffer.total > self.decoded_until and self.buffer.total - self.window_start >= self.min_samples:
+            audio = self.buffer.read(self.window_start)
+            words = await self._decode(audio)
+            self.decoded_until = self.buffer.total
+        else:
+            words = self.previous_hypothesis
+        final = self._final(words)
+        if final:
+            messages.append(final)
+        self.window_start = self.buffer.total
+        self.overlapping = False
+        self.previous_hypothesis = []
+        self.stable_words = []
+        return messages
+
+    def metrics(self) -> dict:
+        ttfp = None
+        if self.first_partial_at is not None and self.started_at is not None:
+            ttfp = (self.first_partial_at - self.started_at) * 1000
+        return {
+            "time_to_first_partial_ms": ttfp,
+            "decodes": len(self.decode_times),
+            "skipped_silence": self.skipped_silence,
+            "mean_decode_ms": float(np.mean(self.decode_times) * 1000) if self.decode_times else None,
+            "audio_seconds": self.buffer.total / self.sample_rate,
+            "language": self.language,
+        }
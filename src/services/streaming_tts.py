@@ -0,0 +1,178 @@
+import asyncio
+import re
+import time
+import numpy as np
+from typing import AsyncIterator, List, Optional
+from src.services.model_workers import run_model
+from src.services.tts_cache import TTSCache
+
+# Sentence ends: Latin punctuation followed by whitespace, or CJK full stops
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|(?<=[。！？])")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+|(?<=[，；：、])")
+
+def _split_words(text: str, limit: int) -> List[str]:
+    pieces, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > limit:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_text(text: str, max_chars: int = 150, first_max_chars: int = 60) -> List[str]:
+    """
+    Split text into synthesis chunks at sentence, then clause, then word boundaries
+    The first chunk is kept short so audio can start early; later ones pack
+    more text, up to max_chars, to limit per-call overhead
+    """
+    pieces = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        limit = first_max_chars if not pieces else max_chars
+        if len(sentence) <= limit:
+            pieces.append(sentence)
+            continue
+        for clause in _CLAUSE_END.split(sentence):
+            clause = clause.strip()
+            if not clause:
+                continue
+            limit = first_max_chars if not pieces else max_chars
+            pieces.extend([clause] if len(clause) <= limit else _split_words(clause, limit))
+
+    chunks: List[str] = []
+    for piece in pieces:
+        # Chunk size doubles from first_max_chars up to max_chars, so each chunk is
+        # synthesized while the shorter one before it plays
+        limit = min(max_chars, first_max_chars * 2 ** max(len(chunks) - 1, 0))
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= limit:
+            chunks[-1] = f"{chunks[-1]} {piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+class _Done:
+    pass
+
+class StreamingSynthesizer:
+    """
+    Synthesizes text chunk by chunk and yields audio as each chunk is ready
+    With two_stage the acoustic model works on chunk N+1 while the vocoder
+    renders chunk N; otherwise whole-chunk synthesize() calls are pipelined
+    tts_service may be a VITSService or a worker-pool proxy for one; with a
+    cache, chunks synthesized before are replayed without touching the model
+    """
+    def __init__(
+        self,
+        tts_service,
+        sample_rate: int = 16000,
+        max_chars: int = 150,
+        first_max_chars: int = 60,
+        lookahead: int = 1,
+        two_stage: bool = True,
+        cache: Optional[TTSCache] = None
+    ):
+        self.tts_service = tts_service
+        self.cache = cache
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.first_max_chars = first_max_chars
+        self.lookahead = lookahead
+        self.two_stage = two_stage
+
+        self.started_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.chunks = 0
+        self.cached_chunks = 0
+        self.audio_samples = 0
+
+    async def stream(
+        self,
+        text: str,
+        lang: str = "en",
+        voice: str = "default",
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[np.ndarray]:
+        self.started_at = time.perf_counter()
+        chunks = split_text(text, self.max_chars, self.first_max_chars)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.lookahead)
+        first_stage = "spectrogram" if self.two_stage else "synthesize"
+
+        async def lookup(key: str) -> Optional[np.ndarray]:
+            if self.cache is None:
+                return None
+            if self.cache.disk_dir:
+                return await asyncio.to_thread(self.cache.get, key)
+            return self.cache.get(key)
+
+        async def produce():
+            try:
+                for chunk in chunks:
+                    # Two-stage chunks are raw vocoder output, not peak-normalized like synthesize()
+                    key = self.cache.make_key(
+                        chunk, lang, voice, peak_normalized=not self.two_stage
+                    ) if self.cache is not None else None
+                    cached = await lookup(key) if key is not None else None
+                    if cached is not None:
+                        await queue.put((key, cached, True))
+                        continue
+                    result = await run_model(
+                        self.tts_service, first_stage, chunk, lang=lang, voice=voice, session_id=session_id
+                    )
+                    await queue.put((key, result, False))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(_Done)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is _Done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                key, audio, cached = item
+                if cached:
+                    self.cached_chunks += 1
+                else:
+                    if self.two_stage:
+                        audio = await run_model(self.tts_service, "vocode", audio, session_id=session_id)
+                    if key is not None and len(audio) > 0:
+                        if self.cache.disk_dir:
+                            await asyncio.to_thread(self.cache.set, key, audio)
+                        else:
+                            self.cache.set(key, audio)
+                if len(audio) == 0:
+                    continue
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.perf_counter()
+                self.chunks += 1
+                self.audio_samples += len(audio)
+                yield audio
+        finally:
+            producer.cancel()
+            self.finished_at = time.perf_counter()
+
+    def metrics(self) -> dict:
+        ttfa = total = None
+        if self.started_at is not None:
+            if self.first_audio_at is not None:
+                ttfa = (self.first_audio_at - self.started_at) * 1000
+            if self.finished_at is not None:
+                total = (self.finished_at - self.started_at) * 1000
+        return {
+            "time_to_first_audio_ms": ttfa,
+            "total_ms": total,
+            "chunks": self.chunks,
+            "cached_chunks": self.cached_chunks,
+            "audio_seconds": self.audio_samples / self.sample_rate,
+        }
@@ -0,0 +1,320 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; spans from sub-millisecond cache hits to multi-second transcriptions
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines += [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self._values.items()]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (non-cumulative), sum, count
+        self._values: Dict[LabelKey, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total!r}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+# A collector returns (name, help, type, [(labels, value), ...]) for values read at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]
+
+class MetricsRegistry:
+    """Counters and histograms recorded as work happens, plus gauges read from services' stats() at scrape time"""
+    def __init__(self, namespace: str = "linguasync"):
+        self.namespace = namespace
+        self._metrics: "OrderedDict[str, object]" = OrderedDict()
+        self._collectors: List[Collector] = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kwargs):
+        full_name = f"{self.namespace}_{name}"
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, help, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines += metric.render()
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning("Metrics collector failed: %s", e)
+                continue
+            for name, help, kind, samples in families:
+                full_name = f"{self.namespace}_{name}"
+                lines += [f"# HELP {full_name} {help}", f"# TYPE {full_name} {kind}"]
+                lines += [
+                    f"{full_name}{_format_labels(_label_key(labels))} {_format_value(value)}"
+                    for labels, value in samples if value is not None
+                ]
+        return "\n".join(lines) + "\n"
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "attributes", "error")
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str] = None, attributes: Optional[dict] = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+class Tracer:
+    """
+    Keeps the spans of the most recent traces in memory
+    The current span lives in a context variable, so it follows a request into
+    the tasks and threads it starts; spans opened outside any trace are not kept
+    """
+    def __init__(self, max_traces: int = 500, max_spans_per_trace: int = 1000):
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, trace_id: Optional[str] = None, **attributes):
+        """Start a new trace with a root span"""
+        trace_id = trace_id or uuid.uuid4().hex
+        with self._lock:
+            self._traces[trace_id] = []
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        with self._span(Span(trace_id, name, attributes=attributes)) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """A child of the current span; a no-op outside a trace"""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        with self._span(Span(parent.trace_id, name, parent.span_id, attributes)) as span:
+            yield span
+
+    @contextmanager
+    def _span(self, span: Span):
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Closed from another context, e.g. an async generator finalized elsewhere
+                _current_span.set(None)
+            with self._lock:
+                spans = self._traces.get(span.trace_id)
+                if spans is not None and len(spans) < self.max_spans_per_trace:
+                    spans.append(span)
+
+    def get(self, trace_id: str) -> Optional[List[dict]]:
+        with self._lock:
+            spans = self._traces.get(trace_id)
+            if spans is None:
+                return None
+            return [span.to_dict() for span in sorted(spans, key=lambda span: span.start)]
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        """Root span of the latest finished traces, newest first"""
+        with self._lock:
+            traces = list(self._traces.items())[-limit:]
+        summaries = []
+        for trace_id, spans in reversed(traces):
+            root = next((span for span in spans if span.parent_id is None), None)
+            if root is not None:
+                summaries.append({"trace_id": trace_id, "spans": len(spans), **root.to_dict()})
+        return summaries
+
+metrics = MetricsRegistry()
+tracer = Tracer()
+
+stage_seconds = metrics.histogram("stage_duration_seconds", "Time spent in each instrumented stage")
+stage_errors = metrics.counter("stage_errors_total", "Instrumented stages that raised")
+
+@contextmanager
+def instrument(stage: str, **attributes):
+    """Time a block as `stage`: latency histogram, error counter and a span in the current trace"""
+    started = time.perf_counter()
+    try:
+        with tracer.span(stage, **attributes) as span:
+            yield span
+    except BaseException:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage=stage)
+
+def timed(stage: str):
+    """Decorator form of instrument() for sync functions, coroutines and async generators"""
+    def decorate(fn):
+        if inspect.isasyncgenfunction(fn):
+            @functools.wraps(fn)
+            async def generator(*args, **kwargs):
+                with instrument(stage):
+                    async for item in fn(*args, **kwargs):
+                        yield item
+            return generator
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def coroutine(*args, **kwargs):
+                with instrument(stage):
+                    return await fn(*args, **kwargs)
+            return coroutine
+
+        @functools.wraps(fn)
+        def function(*args, **kwargs):
+            with instrument(stage):
+                return fn(*args, **kwargs)
+        return function
+    return decorate
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(level: Optional[str] = None, stream=None):
+    """
+    Send log records through a queue to a background thread that writes them
+    The caller only formats and enqueues, so a slow stdout never blocks a request
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(trace_id)s] %(message)s"))
+    records: queue.Queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(_TraceIdFilter())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO"))
+    # One line per upstream HTTP call is noise at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """Write out whatever is still queued"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+logger = logging.getLogger(__name__)
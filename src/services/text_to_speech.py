@@ -1,44 +1,129 @@
-import torch
-from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+import logging
+import os
+import threading
 import numpy as np
+from typing import Dict, List, Optional
+from src.services.model_registry import ModelRegistry, registry as default_registry
+
+logger = logging.getLogger(__name__)
+
+# Named voices as indices into the CMU ARCTIC x-vectors SpeechT5 was trained with
+DEFAULT_XVECTORS = {"default": 7306}
+
+def _load_speecht5(model_name: str, vocoder_name: str):
+    import torch
+    from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    processor = SpeechT5Processor.from_pretrained(model_name)
+    model = SpeechT5ForTextToSpeech.from_pretrained(model_name)
+    vocoder = SpeechT5HifiGan.from_pretrained(vocoder_name)
+
+    model.to(device)
+    vocoder.to(device)
+    return processor, model, vocoder
+
+def _load_xvectors(path: Optional[str]) -> Dict[str, np.ndarray]:
+    if path:
+        with np.load(path) as data:
+            return {name: data[name].astype(np.float32).reshape(-1) for name in data.files}
+    try:
+        from datasets import load_dataset
+    except ImportError:
+        raise RuntimeError(
+            "The default voices are loaded with the datasets package; "
+            "pip install datasets, or point TTS_VOICES_PATH at an .npz of x-vectors"
+        )
+    dataset = load_dataset("Matthijs/cmu-arctic-xvectors", split="validation")
+    return {name: np.asarray(dataset[index]["xvector"], dtype=np.float32) for name, index in DEFAULT_XVECTORS.items()}
+
+class VoiceBank:
+    """
+    Speaker x-vectors, loaded once and kept resident as tensors on the model's device
+    Voices come from TTS_VOICES_PATH (an .npz of named 512-d vectors) or the CMU ARCTIC set
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path if path is not None else os.getenv("TTS_VOICES_PATH")
+        self._vectors: Optional[Dict[str, np.ndarray]] = None
+        self._tensors: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def vectors(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            if self._vectors is None:
+                try:
+                    self._vectors = _load_xvectors(self.path)
+                except Exception as e:
+                    # Synthesis still works without a speaker embedding, just less naturally
+                    logger.error("Error loading speaker x-vectors: %s", e)
+                    self._vectors = {}
+        return self._vectors
+
+    def embedding(self, voice: str, device):
+        """(1, 512) tensor for a voice; unknown voices get the default, None if no voices loaded"""
+        tensor = self._tensors.get(voice)
+        if tensor is None:
+            vectors = self.vectors()
+            vector = vectors.get(voice, vectors.get("default"))
+            if vector is None:
+                return None
+            import torch
+            tensor = torch.from_numpy(vector).unsqueeze(0).to(device)
+            self._tensors[voice] = tensor
+        return tensor
+
+    def warm_up(self, device):
+        for voice in self.vectors():
+            self.embedding(voice, device)
 
 class VITSService:
-    def __init__(self):
+    def __init__(self, registry: Optional[ModelRegistry] = None):
         self.model_name = "microsoft/speecht5_tts"
         self.vocoder_name = "microsoft/speecht5_hifigan"
-        self.model = None
-        self.processor = None
-        self.vocoder = None
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        
-        try:
-            self.processor = SpeechT5Processor.from_pretrained(self.model_name)
-            self.model = SpeechT5ForTextToSpeech.from_pretrained(self.model_name)
-            self.vocoder = SpeechT5HifiGan.from_pretrained(self.vocoder_name)
-            
-            self.model.to(self.device)
-            self.vocoder.to(self.device)
-        except Exception as e:
-            print(f"Error loading TTS model: {e}")
+        self.registry = registry or default_registry
+        self.registry_key = "speecht5"
+        # torch/transformers are imported and the weights loaded on first use
+        self.registry.register(
+            self.registry_key,
+            lambda: _load_speecht5(self.model_name, self.vocoder_name)
+        )
+        self.voices = VoiceBank()
+
+    def warm_up(self):
+        self.registry.warm_up([self.registry_key])
+        loaded = self.registry.get(self.registry_key)
+        if loaded is not None:
+            self.voices.warm_up(loaded[1].device)
     
-    def synthesize(self, text: str, lang: str = "en") -> np.ndarray:
+    def synthesize(self, text: str, lang: str = "en", voice: str = "default") -> np.ndarray:
         """
         Convert text to speech using SpeechT5
         Returns audio data as numpy array
         """
         try:
-            if not text.strip() or self.model is None or self.processor is None or self.vocoder is None:
+            if not text.strip():
                 return np.zeros(0, dtype=np.float32)
-            
-            # Prepare input
-            inputs = self.processor(text=text, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Generate speech
-            with torch.no_grad():
-                speech = self.model.generate_speech(inputs["input_ids"], self.vocoder)
-                if isinstance(speech, torch.Tensor):
-                    speech = speech.cpu().numpy()
+
+            with self.registry.use(self.registry_key) as loaded:
+                if loaded is None:
+                    return np.zeros(0, dtype=np.float32)
+
+                import torch
+                processor, model, vocoder = loaded
+
+                # Prepare input
+                inputs = processor(text=text, return_tensors="pt")
+                inputs = {k: v.to(model.device) for k, v in inputs.items()}
+
+                # Generate speech
+                with torch.no_grad():
+                    speech = model.generate_speech(
+                        inputs["input_ids"],
+                        speaker_embeddings=self.voices.embedding(voice, model.device),
+                        vocoder=vocoder
+                    )
+                    if isinstance(speech, torch.Tensor):
+                        speech = speech.cpu().numpy()
             
             # Convert to numpy and normalize
             if speech.size > 0:
@@ -47,5 +132,104 @@ class VITSService:
             return speech.astype(np.float32)
             
         except Exception as e:
-            print(f"TTS error: {e}")
-            return np.zeros(0, dtype=np.float32)
\ No newline at end of file
+            logger.error("TTS error: %s", e)
+            return np.zeros(0, dtype=np.float32)
+
+    def spectrogram(self, text: str, lang: str = "en", voice: str = "default") -> np.ndarray:
+        """
+        Acoustic model only: text to a (frames, mel bins) spectrogram
+        Streaming synthesis runs this for the next chunk while vocode() renders the current one
+        """
+        try:
+            if not text.strip():
+                return np.zeros((0, 80), dtype=np.float32)
+
+            with self.registry.use(self.registry_key) as loaded:
+                if loaded is None:
+                    return np.zeros((0, 80), dtype=np.float32)
+
+                import torch
+                processor, model, _ = loaded
+
+                inputs = processor(text=text, return_tensors="pt")
+                inputs = {k: v.to(model.device) for k, v in inputs.items()}
+                with torch.no_grad():
+                    return model.generate_speech(
+                        inputs["input_ids"],
+                        speaker_embeddings=self.voices.embedding(voice, model.device)
+                    ).cpu().numpy()
+
+        except Exception as e:
+            logger.error("TTS spectrogram error: %s", e)
+            return np.zeros((0, 80), dtype=np.float32)
+
+    def vocode(self, spectrogram: np.ndarray) -> np.ndarray:
+        """
+        Render a spectrogram from spectrogram() to a waveform
+        Chunks are not peak-normalized individually so loudness stays even across a stream
+        """
+        try:
+            if len(spectrogram) == 0:
+                return np.zeros(0, dtype=np.float32)
+
+            with self.registry.use(self.registry_key) as loaded:
+                if loaded is None:
+                    return np.zeros(0, dtype=np.float32)
+
+                import torch
+                _, model, vocoder = loaded
+
+                with torch.no_grad():
+                    speech = vocoder(torch.from_numpy(spectrogram).to(model.device)).cpu().numpy()
+            return np.clip(speech, -1.0, 1.0).astype(np.float32)
+
+        except Exception as e:
+            logger.error("TTS vocoder error: %s", e)
+            return np.zeros(0, dtype=np.float32)
+
+    def synthesize_batch(self, texts: List[str], lang: str = "en", voice: str = "default") -> List[np.ndarray]:
+        """
+        Synthesize several texts with one padded forward pass
+        Falls back to per-text synthesis if the batched call fails
+        """
+        empty = np.zeros(0, dtype=np.float32)
+        try:
+            results = [empty] * len(texts)
+            indices = [i for i, text in enumerate(texts) if text.strip()]
+            if not indices:
+                return results
+
+            with self.registry.use(self.registry_key) as loaded:
+                if loaded is None:
+                    return results
+
+                import torch
+                processor, model, vocoder = loaded
+
+                inputs = processor(text=[texts[i] for i in indices], padding=True, return_tensors="pt")
+                inputs = {k: v.to(model.device) for k, v in inputs.items()}
+
+                speaker_embeddings = self.voices.embedding(voice, model.device)
+                if speaker_embeddings is not None:
+                    speaker_embeddings = speaker_embeddings.expand(len(indices), -1)
+
+                with torch.no_grad():
+                    speech, lengths = model.generate_speech(
+                        inputs["input_ids"],
+                        speaker_embeddings=speaker_embeddings,
+                        attention_mask=inputs.get("attention_mask"),
+                        vocoder=vocoder,
+                        return_output_lengths=True
+                    )
+                speech = speech.cpu().numpy()
+
+            for row, (i, length) in enumerate(zip(indices, lengths.tolist())):
+                waveform = speech[row, :int(length)]
+                if waveform.size > 0:
+                    waveform = waveform / np.max(np.abs(waveform))
+                results[i] = waveform.astype(np.float32)
+            return results
+
+        except Exception as e:
+            logger.warning("Batch TTS error, synthesizing individually: %s", e)
+            return [self.synthesize(text, lang, voice) for text in texts]
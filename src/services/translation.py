@@ -1,14 +1,65 @@
 import requests
-from typing import Optional
-import time
-import urllib.parse
+import httpx
+import asyncio
+import os
+import logging
+from typing import List, Optional, Union
+from src.services.rate_limiter import RateLimiter, RateLimitExceeded
+from src.services.telemetry import timed
+
+logger = logging.getLogger(__name__)
+
+class TranslationFailed(Exception):
+    """Upstream answered without a translation"""
 
 class MyMemoryTranslator:
-    def __init__(self):
-        self.api_url = "https://api.mymemory.translated.net/get"
-        self.last_request = 0
-        self.min_delay = 1.0  # Minimum delay between requests in seconds
-    
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        self.api_url = api_url or os.getenv("MYMEMORY_API_URL", "https://api.mymemory.translated.net/get")
+        self.timeout = timeout if timeout is not None else float(os.getenv("TRANSLATOR_TIMEOUT", "10"))
+        self.max_connections = max_connections or int(os.getenv("TRANSLATOR_MAX_CONNECTIONS", "20"))
+        self.max_concurrency = max_concurrency or int(os.getenv("TRANSLATOR_MAX_CONCURRENCY", "8"))
+        # Token bucket shared with other worker processes on this host
+        self.rate_limiter = rate_limiter or RateLimiter.from_env()
+        self.upstream_name = "mymemory"
+        # MyMemory rejects queries over 500 bytes; batches are packed up to this size
+        self.max_query_bytes = 500
+        self.segment_separator = "\n"
+
+        # Pooled keep-alive sessions, one for sync callers and one for the event loop
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=self.max_connections))
+        self.session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=self.max_connections))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Create the shared async client on first use so it binds to the running loop"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    def _parse_response(self, status_code: int, data: Optional[dict]) -> str:
+        """The translated text; raises TranslationFailed when there is none"""
+        if status_code == 200:
+            if data["responseStatus"] == 200:
+                return data["responseData"]["translatedText"]
+            raise TranslationFailed(f"Upstream status {data['responseStatus']}")
+        raise TranslationFailed(f"Upstream HTTP {status_code}")
+
+    @timed("translate_upstream")
     def translate(
         self,
         text: str,
@@ -17,39 +68,130 @@ class MyMemoryTranslator:
     ) -> str:
         """
         Translate text using MyMemory Translation API with rate limiting
+        Blocking; async callers should use translate_async
+        Raises RateLimitExceeded when the upstream quota cannot be met in time
         """
         try:
             if not text.strip():
                 return text
 
-            # Implement rate limiting
-            current_time = time.time()
-            time_since_last = current_time - self.last_request
-            if time_since_last < self.min_delay:
-                time.sleep(self.min_delay - time_since_last)
-            
+            self.rate_limiter.acquire_sync(self.upstream_name)
+
             # Format language codes (MyMemory uses different format)
-            lang_pair = f"{source_lang}|{target_lang}"
-            
-            # URL encode the text
-            encoded_text = urllib.parse.quote(text)
-            
+            params = {"q": text, "langpair": f"{source_lang}|{target_lang}"}
+
             # Make request
-            url = f"{self.api_url}?q={encoded_text}&langpair={lang_pair}"
-            response = requests.get(url)
-            self.last_request = time.time()
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data["responseStatus"] == 200:
-                    return data["responseData"]["translatedText"]
-                else:
-                    print(f"Translation error: {data['responseStatus']}")
-                    return text
-            else:
-                print(f"Translation error: {response.status_code}")
-                return text
-            
+            response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+
+            data = response.json() if response.status_code == 200 else None
+            return self._parse_response(response.status_code, data)
+
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.error("Translation error: %s", e)
+            return text
+
+    @timed("translate_upstream")
+    async def translate_async(
+        self,
+        text: str,
+        source_lang: str = "en",
+        target_lang: str = "es"
+    ) -> str:
+        """
+        Translate text without blocking the event loop
+        Uses the shared pooled client and caps in-flight upstream requests
+        Raises RateLimitExceeded when the upstream quota cannot be met in time;
+        other failures come back as the untranslated input
+        """
+        try:
+            return await self._request_async(text, source_lang, target_lang)
+        except RateLimitExceeded:
+            raise
         except Exception as e:
-            print(f"Translation error: {e}")
-            return text
\ No newline at end of file
+            logger.error("Translation error: %s", e)
+            return text
+
+    async def _request_async(self, text: str, source_lang: str, target_lang: str) -> str:
+        """One upstream call; raises on any failure instead of echoing the input"""
+        if not text.strip():
+            return text
+
+        # Queue for an upstream token before taking a connection slot
+        await self.rate_limiter.acquire(self.upstream_name)
+
+        async with self._semaphore:
+            params = {"q": text, "langpair": f"{source_lang}|{target_lang}"}
+            response = await self._get_client().get(self.api_url, params=params)
+
+        data = response.json() if response.status_code == 200 else None
+        return self._parse_response(response.status_code, data)
+
+    def _pack(self, texts: List[str]) -> List[List[int]]:
+        """Group text indices into as few upstream queries as the size limit allows"""
+        packs, current, current_size = [], [], 0
+        separator_size = len(self.segment_separator.encode())
+        for i, text in enumerate(texts):
+            size = len(text.encode())
+            # Segments that can't be split back out safely go on their own
+            if self.segment_separator in text or size + separator_size > self.max_query_bytes:
+                packs.append([i])
+                continue
+            if current and current_size + separator_size + size > self.max_query_bytes:
+                packs.append(current)
+                current, current_size = [], 0
+            current.append(i)
+            current_size += size + (separator_size if current_size else 0)
+        if current:
+            packs.append(current)
+        return packs
+
+    @timed("translate_batch_upstream")
+    async def translate_batch_async(
+        self,
+        texts: List[str],
+        source_lang: str = "en",
+        target_lang: str = "es"
+    ) -> List[Union[str, Exception]]:
+        """
+        Translate several segments of one language pair with as few upstream calls as possible
+        Returns translations in input order; a segment that failed gets the exception
+        its upstream call raised (RateLimitExceeded, TranslationFailed, ...) instead
+        """
+        results: List[Union[str, Exception]] = list(texts)
+
+        async def run_pack(indices: List[int]):
+            if len(indices) == 1:
+                results[indices[0]] = await self._request_async(texts[indices[0]], source_lang, target_lang)
+                return
+            joined = self.segment_separator.join(texts[i] for i in indices)
+            parts = (await self._request_async(joined, source_lang, target_lang)).split(self.segment_separator)
+            if len(parts) == len(indices):
+                for i, part in zip(indices, parts):
+                    results[i] = part.strip()
+            else:
+                # Upstream merged or split lines; fall back to one call per segment
+                translated = await asyncio.gather(
+                    *(self._request_async(texts[i], source_lang, target_lang) for i in indices),
+                    return_exceptions=True
+                )
+                for i, text in zip(indices, translated):
+                    results[i] = text
+
+        packs = self._pack(texts)
+        # One pack failing doesn't throw away the others
+        outcomes = await asyncio.gather(*(run_pack(pack) for pack in packs), return_exceptions=True)
+        for pack, outcome in zip(packs, outcomes):
+            if isinstance(outcome, Exception):
+                if not isinstance(outcome, RateLimitExceeded):
+                    logger.error("Batch translation error: %s", outcome)
+                for i in pack:
+                    results[i] = outcome
+        return results
+
+    async def aclose(self):
+        """Release pooled connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self.session.close()
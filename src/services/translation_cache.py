@@ -0,0 +1,248 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+from src.services.telemetry import timed
+
+CacheKey = Tuple[str, str, str]
+
+class TranslationCache:
+    """
+    LRU + TTL cache of translations keyed on (normalized text, source_lang, target_lang)
+    An optional SQLite file acts as a second tier that survives restarts
+    """
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: float = 24 * 3600,
+        persist_path: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if persist_path:
+            os.makedirs(os.path.dirname(os.path.abspath(persist_path)), exist_ok=True)
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS translation_cache ("
+                "source_lang TEXT, target_lang TEXT, text TEXT, "
+                "translated_text TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (source_lang, target_lang, text))"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(text: str, source_lang: str, target_lang: str) -> CacheKey:
+        """Normalize unicode form and whitespace so trivially different inputs share an entry"""
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return (normalized, source_lang.lower(), target_lang.lower())
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is None and self._db is not None:
+            value = self._get_disk(key)
+        if value is None:
+            self.misses += 1
+        return value
+
+    def _get_memory(self, key: CacheKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _get_disk(self, key: CacheKey) -> Optional[str]:
+        text, source_lang, target_lang = key
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT translated_text, expires_at FROM translation_cache "
+                "WHERE source_lang = ? AND target_lang = ? AND text = ?",
+                (source_lang, target_lang, text)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        self.disk_hits += 1
+        self.hits += 1
+        self._set_memory(key, row[0], row[1])
+        return row[0]
+
+    def set(self, key: CacheKey, value: str):
+        expires_at = time.time() + self.ttl
+        self._set_memory(key, value, expires_at)
+        if self._db is not None:
+            text, source_lang, target_lang = key
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO translation_cache VALUES (?, ?, ?, ?, ?)",
+                    (source_lang, target_lang, text, value, expires_at)
+                )
+                self._db.commit()
+
+    def _set_memory(self, key: CacheKey, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+        }
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+def _retrieve(task: asyncio.Task):
+    """Mark a shared lookup's failure seen, for when every caller has gone away"""
+    if not task.cancelled():
+        task.exception()
+
+class CachedTranslator:
+    """
+    Wraps any translator exposing translate/translate_async with a TranslationCache
+    Concurrent identical misses share a single upstream call
+    """
+    def __init__(self, translator, cache: Optional[TranslationCache] = None):
+        self.translator = translator
+        self.cache = cache or TranslationCache()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+
+    def _cacheable(self, text: str, translated_text: str, source_lang: str, target_lang: str) -> bool:
+        # Upstream failures come back as the untranslated input; never cache those
+        return bool(translated_text) and (translated_text != text or source_lang == target_lang)
+
+    @timed("translate")
+    def translate(self, text: str, source_lang: str = "en", target_lang: str = "es") -> str:
+        if not text.strip():
+            return text
+        key = self.cache.make_key(text, source_lang, target_lang)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        translated_text = self.translator.translate(text, source_lang, target_lang)
+        if self._cacheable(text, translated_text, source_lang, target_lang):
+            self.cache.set(key, translated_text)
+        return translated_text
+
+    @timed("translate")
+    async def translate_async(self, text: str, source_lang: str = "en", target_lang: str = "es") -> str:
+        if not text.strip():
+            return text
+        key = self.cache.make_key(text, source_lang, target_lang)
+        cached = self.cache._get_memory(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.cache.coalesced += 1
+        else:
+            # The lookup runs as its own task, so a caller that goes away doesn't take it from the others
+            inflight = asyncio.create_task(self._fill(key, text, source_lang, target_lang))
+            inflight.add_done_callback(_retrieve)
+            self._inflight[key] = inflight
+        return await asyncio.shield(inflight)
+
+    async def _fill(self, key: CacheKey, text: str, source_lang: str, target_lang: str) -> str:
+        """Disk tier, then upstream; shared by every concurrent miss on key"""
+        try:
+            cached = None
+            if self.cache._db is not None:
+                cached = await asyncio.to_thread(self.cache._get_disk, key)
+            if cached is not None:
+                return cached
+            self.cache.misses += 1
+            translated_text = await self.translator.translate_async(text, source_lang, target_lang)
+            if self._cacheable(text, translated_text, source_lang, target_lang):
+                if self.cache._db is not None:
+                    await asyncio.to_thread(self.cache.set, key, translated_text)
+                else:
+                    self.cache.set(key, translated_text)
+            return translated_text
+        finally:
+            del self._inflight[key]
+
+    @timed("translate_batch")
+    async def translate_batch_async(
+        self,
+        texts: List[str],
+        source_lang: str = "en",
+        target_lang: str = "es"
+    ) -> List[Union[str, Exception]]:
+        """
+        Serve cached segments and send each distinct miss upstream once
+        Failed segments carry the translator's exception, as translate_batch_async returns them
+        """
+        results: List[Union[str, Exception]] = list(texts)
+        missing: Dict[CacheKey, List[int]] = {}
+        for i, text in enumerate(texts):
+            if not text.strip():
+                continue
+            key = self.cache.make_key(text, source_lang, target_lang)
+            if key in missing:
+                missing[key].append(i)
+                continue
+            if self.cache._db is not None:
+                cached = await asyncio.to_thread(self.cache.get, key)
+            else:
+                cached = self.cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                missing[key] = [i]
+
+        if missing:
+            keys = list(missing)
+            originals = [texts[missing[key][0]] for key in keys]
+            translated = await self.translator.translate_batch_async(originals, source_lang, target_lang)
+            for key, text, translated_text in zip(keys, originals, translated):
+                # Failures come back as exceptions, so any text returned is a real translation
+                if isinstance(translated_text, str) and translated_text:
+                    if self.cache._db is not None:
+                        await asyncio.to_thread(self.cache.set, key, translated_text)
+                    else:
+                        self.cache.set(key, translated_text)
+                for i in missing[key]:
+                    results[i] = translated_text
+        return results
+
+    async def aclose(self):
+        await self.translator.aclose()
+        self.cache.close()
@@ -1,30 +1,137 @@
-from typing import Optional
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
 from src.services.speech_to_text import WhisperSTTService
-from src.services.translation import DeepSeekTranslator
+from src.services.translation import MyMemoryTranslator
+from src.services.translation_cache import TranslationCache, CachedTranslator
 from src.services.text_to_speech import VITSService
-from src.services.speaker_recognition import SpeechBrainDiarization
+from src.services.speaker_recognition import (
+    DiarizedSegment,
+    SpeakerSessions,
+    SpeechBrainDiarization,
+    diarize_windows
+)
+from src.services.vad import VoiceActivityDetector
+from src.services.language_id import AUTO, SessionLanguages
+from src.services.audio_ingest import TARGET_SAMPLE_RATE, prepare_audio
+from src.services.model_workers import ModelProxy, run_model
+from src.services.pipeline import Stage, StagedPipeline
+from src.services.telemetry import timed
 from src.services.storage_service import StorageService
 from src.database.supabase_client import SupabaseClient
 from src.models.translation import TranslationResponse
 import numpy as np
-import base64
+
+logger = logging.getLogger(__name__)
+
+async def _same(text: str) -> str:
+    return text
+
+class SegmentJob:
+    """One speaker turn as it moves through the pipeline stages"""
+    def __init__(
+        self,
+        speaker_id: str,
+        audio: np.ndarray,
+        start: float,
+        end: float,
+        source_lang: str,
+        target_lang: str,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        target_langs: Optional[Callable[[], List[str]]] = None,
+        stt_options: Optional[dict] = None
+    ):
+        self.speaker_id = speaker_id
+        self.audio = audio
+        self.start = start
+        self.end = end
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.user_id = user_id
+        self.session_id = session_id
+        self.target_langs = target_langs
+        self.stt_options = stt_options or {}
+        self.text = ""
+        self.translated_text = ""
+        self.response: Optional[TranslationResponse] = None
+        self.translations: Dict[str, str] = {}
+        self.responses: Dict[str, TranslationResponse] = {}
 
 class TranslationService:
     def __init__(
         self,
-        stt_service: WhisperSTTService,
-        translator: DeepSeekTranslator,
-        tts_service: VITSService,
-        diarization_service: SpeechBrainDiarization,
+        stt_service: Union[WhisperSTTService, ModelProxy],
+        translator: Union[MyMemoryTranslator, CachedTranslator],
+        tts_service: Union[VITSService, ModelProxy],
+        diarization_service: Union[SpeechBrainDiarization, ModelProxy],
         storage_service: StorageService,
-        db_client: SupabaseClient
+        db_client: SupabaseClient,
+        translation_cache: Optional[TranslationCache] = None,
+        vad: Optional[VoiceActivityDetector] = None,
+        queue_size: Optional[int] = None,
+        stage_concurrency: Optional[Dict[str, int]] = None
     ):
         self.stt_service = stt_service
+        # Repeated phrases are served from the cache instead of going upstream
+        if not isinstance(translator, CachedTranslator):
+            translator = CachedTranslator(translator, translation_cache)
         self.translator = translator
         self.tts_service = tts_service
         self.diarization_service = diarization_service
         self.storage_service = storage_service
         self.db_client = db_client
+        self.vad = vad or VoiceActivityDetector()
+        # Speaker clusters stay in this process so ids are stable whichever worker embeds the audio
+        self.speakers = SpeakerSessions()
+        # source_lang="auto": detected on a session's first voiced turns, then reused
+        self.languages = SessionLanguages(
+            min_confidence=float(os.getenv("LANGUAGE_ID_MIN_CONFIDENCE", "0.8")),
+            max_checks=int(os.getenv("LANGUAGE_ID_MAX_CHECKS", "5"))
+        )
+
+        # Turns overlap across stages; a slow stage fills its queue and holds back the ones before it
+        concurrency = {"transcribe": 2, "translate": 4, "synthesize": 2, "store": 2}
+        concurrency.update(stage_concurrency or {})
+        self.pipeline = StagedPipeline(
+            [
+                Stage("transcribe", self._transcribe, concurrency["transcribe"]),
+                Stage("translate", self._translate, concurrency["translate"]),
+                Stage("synthesize", self._synthesize, concurrency["synthesize"]),
+                Stage("store", self._store, concurrency["store"]),
+            ],
+            queue_size=queue_size or int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+        )
+        # One speaker, many listener languages: each turn is transcribed once, then fanned out per language
+        self.broadcast_pipeline = StagedPipeline(
+            [
+                Stage("transcribe", self._transcribe, concurrency["transcribe"]),
+                Stage("translate", self._translate_all, concurrency["translate"]),
+                Stage("synthesize", self._synthesize_all, concurrency["synthesize"]),
+            ],
+            queue_size=self.pipeline.queue_size
+        )
+
+    @timed("diarize")
+    async def diarize(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int,
+        session_id: Optional[str] = None
+    ) -> List[DiarizedSegment]:
+        """Embed windows in the model pool (or a thread) and assign them to this session's speakers"""
+        windows = await run_model(
+            self.diarization_service, "window_embeddings", audio_data, sample_rate, session_id=session_id
+        )
+        if windows is None:
+            return [DiarizedSegment("default_speaker", 0.0, len(audio_data) / sample_rate, audio_data)]
+        starts, embeddings, window = windows
+        return diarize_windows(audio_data, starts, embeddings, self.speakers.get(session_id), window, sample_rate)
+
+    def end_session(self, session_id: str):
+        self.speakers.end(session_id)
+        self.languages.end(session_id)
     
     async def process_audio(
         self,
@@ -32,75 +139,240 @@ class TranslationService:
         sample_rate: int,
         source_lang: str,
         target_lang: str,
-        user_id: Optional[str] = None
-    ) -> TranslationResponse:
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        stt_options: Optional[dict] = None,
+        prepared: bool = False
+    ) -> List[TranslationResponse]:
         """
         Process audio through the complete translation pipeline
-        Returns a TranslationResponse object
+        Returns one TranslationResponse per speaker turn, in order
         """
+        return [
+            response async for response in self.process_audio_stream(
+                audio_data, sample_rate, source_lang, target_lang, user_id, session_id, stt_options, prepared
+            )
+        ]
+
+    @timed("process")
+    async def process_audio_stream(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int,
+        source_lang: str,
+        target_lang: str,
+        user_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        stt_options: Optional[dict] = None,
+        prepared: bool = False
+    ) -> AsyncIterator[TranslationResponse]:
+        """
+        Yield a TranslationResponse per speaker turn, in order, as each one finishes
+        Turns run through STT, translation, TTS and storage concurrently; model
+        calls are tagged with session_id so they can be cancelled when the client goes away.
+        stt_options (see speech_to_text.stt_options) pick the Whisper model and profile;
+        source_lang="auto" detects the language once per session. prepared=True
+        means audio_data already is the 16 kHz buffer prepare_audio() makes, as
+        WebSocketProtocol.read_audio() returns it
+        """
+        produced = False
         try:
-            # Process audio with speaker diarization
-            speakers = self.diarization_service.process(audio_data, sample_rate)
-            
-            results = []
-            for speaker_id, speaker_audio in speakers:
-                # Convert speech to text
-                text = self.stt_service.transcribe(speaker_audio, sample_rate)
-                
-                if not text.strip():
-                    continue
-                
-                # Translate text
-                translated_text = self.translator.translate(
-                    text,
-                    source_lang=source_lang,
-                    target_lang=target_lang
-                )
-                
-                # Convert translated text to speech
-                audio_output = self.tts_service.synthesize(
-                    translated_text,
-                    lang=target_lang
-                )
-                
-                # Convert audio to base64
-                audio_bytes = self.audio_to_bytes(audio_output)
-                audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
-                
-                # Create TranslationResponse object
-                response = TranslationResponse(
-                    original_text=text,
-                    translated_text=translated_text,
-                    speaker_id=speaker_id,
-                    audio_data=audio_base64
-                )
-                
-                # Store translation if user is authenticated
-                if user_id:
-                    await self.db_client.store_translation(response)
-                
-                results.append(response)
-            
-            # Return the first result or a default response
-            if results:
-                return results[0]
-            else:
-                return TranslationResponse(
+            # Downmix, resample to 16 kHz and normalize once; every stage shares this buffer
+            if not prepared:
+                audio_data = prepare_audio(audio_data, sample_rate)
+            sample_rate = TARGET_SAMPLE_RATE
+
+            async def turns():
+                # Only voiced regions reach the models; silence and noise are skipped
+                for start, _, segment_audio in self.vad.segments(audio_data, sample_rate):
+                    for turn in await self.diarize(segment_audio, sample_rate, session_id):
+                        yield SegmentJob(
+                            turn.speaker_id,
+                            turn.audio,
+                            start + turn.start,
+                            start + turn.end,
+                            source_lang,
+                            target_lang,
+                            user_id,
+                            session_id,
+                            stt_options=stt_options
+                        )
+
+            async for job in self.pipeline.run(turns()):
+                produced = True
+                yield job.response
+
+            if not produced:
+                yield TranslationResponse(
                     original_text="",
                     translated_text="",
                     speaker_id="no_speech_detected",
                     audio_data=None
                 )
-                
+
         except Exception as e:
-            print(f"Error in translation service: {e}")
-            return TranslationResponse(
+            logger.error("Error in translation service: %s", e)
+            yield TranslationResponse(
                 original_text="",
                 translated_text="",
                 speaker_id="error",
                 error=str(e)
             )
-    
+
+    @timed("process_broadcast")
+    async def process_audio_broadcast(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int,
+        source_lang: str,
+        target_langs: Callable[[], List[str]],
+        session_id: Optional[str] = None,
+        stt_options: Optional[dict] = None,
+        prepared: bool = False
+    ) -> AsyncIterator[Dict[str, TranslationResponse]]:
+        """
+        Yield {language: TranslationResponse} per speaker turn, in order
+        target_langs() is read as each turn reaches translation, so listeners
+        who join mid-stream get the following turns in their language
+        """
+        try:
+            if not prepared:
+                audio_data = prepare_audio(audio_data, sample_rate)
+            sample_rate = TARGET_SAMPLE_RATE
+
+            async def turns():
+                for start, _, segment_audio in self.vad.segments(audio_data, sample_rate):
+                    for turn in await self.diarize(segment_audio, sample_rate, session_id):
+                        yield SegmentJob(
+                            turn.speaker_id,
+                            turn.audio,
+                            start + turn.start,
+                            start + turn.end,
+                            source_lang,
+                            None,
+                            session_id=session_id,
+                            target_langs=target_langs,
+                            stt_options=stt_options
+                        )
+
+            async for job in self.broadcast_pipeline.run(turns()):
+                yield job.responses
+
+        except Exception as e:
+            logger.error("Error in broadcast translation: %s", e)
+            error = TranslationResponse(original_text="", translated_text="", speaker_id="error", error=str(e))
+            yield {lang: error for lang in target_langs()}
+
+    @timed("identify_language")
+    async def _identify_language(self, job: SegmentJob) -> str:
+        """
+        The session's spoken language, detected by Whisper on its first voiced turn
+        Later turns reuse the cached result; only while its confidence is low
+        are they run through detection again, sharpening the estimate
+        """
+        estimate = self.languages.get(job.session_id)
+        if estimate is None or self.languages.needs_check(job.session_id):
+            probabilities = await run_model(
+                self.stt_service, "detect_language", job.audio, TARGET_SAMPLE_RATE,
+                session_id=job.session_id, **job.stt_options
+            )
+            if probabilities:
+                estimate = self.languages.observe(job.session_id, probabilities)
+                logger.debug("Session %s language: %s (%.2f)", job.session_id, *estimate)
+        # Undetectable (e.g. detection failed): fall back to the old default
+        return estimate[0] if estimate is not None else "en"
+
+    @timed("transcribe")
+    async def _transcribe(self, job: SegmentJob) -> Optional[SegmentJob]:
+        if job.source_lang == AUTO:
+            job.source_lang = await self._identify_language(job)
+        job.text = await run_model(
+            self.stt_service, "transcribe", job.audio, TARGET_SAMPLE_RATE,
+            session_id=job.session_id, language=job.source_lang, **job.stt_options
+        )
+        # Nothing was said; the turn is dropped
+        return job if job.text.strip() else None
+
+    async def _translate(self, job: SegmentJob) -> SegmentJob:
+        job.translated_text = await self.translator.translate_async(
+            job.text,
+            source_lang=job.source_lang,
+            target_lang=job.target_lang
+        )
+        return job
+
+    @timed("synthesize")
+    async def _synthesize(self, job: SegmentJob) -> SegmentJob:
+        audio_output = await run_model(
+            self.tts_service,
+            "synthesize",
+            job.translated_text,
+            lang=job.target_lang,
+            session_id=job.session_id
+        )
+        # Raw WAV bytes; the wire format decides whether they get base64-encoded
+        job.response = TranslationResponse(
+            original_text=job.text,
+            translated_text=job.translated_text,
+            speaker_id=job.speaker_id,
+            audio_data=self.audio_to_bytes(audio_output),
+            start=job.start,
+            end=job.end,
+            source_lang=job.source_lang
+        )
+        return job
+
+    async def _translate_all(self, job: SegmentJob) -> Optional[SegmentJob]:
+        languages = job.target_langs()
+        if not languages:
+            return None  # Nobody is listening
+        texts = await asyncio.gather(*(
+            self.translator.translate_async(job.text, source_lang=job.source_lang, target_lang=lang)
+            if lang != job.source_lang else _same(job.text)
+            for lang in languages
+        ))
+        job.translations = dict(zip(languages, texts))
+        return job
+
+    @timed("synthesize")
+    async def _synthesize_all(self, job: SegmentJob) -> SegmentJob:
+        audio_outputs = await asyncio.gather(*(
+            run_model(self.tts_service, "synthesize", text, lang=lang, session_id=job.session_id)
+            for lang, text in job.translations.items()
+        ))
+        for (lang, text), audio_output in zip(job.translations.items(), audio_outputs):
+            job.responses[lang] = TranslationResponse(
+                original_text=job.text,
+                translated_text=text,
+                speaker_id=job.speaker_id,
+                audio_data=self.audio_to_bytes(audio_output),
+                start=job.start,
+                end=job.end,
+                source_lang=job.source_lang
+            )
+        return job
+
+    async def _store(self, job: SegmentJob) -> SegmentJob:
+        # Store translation if user is authenticated
+        if job.user_id:
+            row_id = await self.db_client.store_translation(
+                job.response, job.user_id, job.source_lang, job.target_lang
+            )
+            # Uploaded in the background; the URL is linked to the row when it's stored
+            if job.response.audio_data:
+                self.storage_service.submit_upload(
+                    job.response.audio_data,
+                    lambda url: self.db_client.link_audio(row_id, url)
+                )
+        return job
+
+    def stats(self) -> dict:
+        stats = self.pipeline.stats()
+        if self.broadcast_pipeline.runs:
+            stats["broadcast"] = self.broadcast_pipeline.stats()
+        stats["language_id"] = self.languages.stats()
+        return stats
+
     def audio_to_bytes(self, audio_data: np.ndarray, sample_rate: int = 16000) -> bytes:
         """Convert numpy array audio data to WAV bytes"""
         import soundfile as sf
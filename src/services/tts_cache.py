@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+import numpy as np
+from src.services.model_workers import run_model
+
+logger = logging.getLogger(__name__)
+
+class TTSCache:
+    """
+    Synthesized audio keyed on a hash of (normalized text, lang, voice)
+    Peak-normalized clips and raw vocoder chunks of the same text are keyed
+    apart, so a cached text plays at the loudness of the path asking for it
+    Memory is an LRU bounded by bytes; an optional directory of raw float32
+    PCM files is a second tier whose hits are memory-mapped, not read
+    """
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: Optional[int] = None
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+        self.disk_bytes = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            for root, _, files in os.walk(disk_dir):
+                self.disk_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith(".pcm"))
+
+    @classmethod
+    def from_env(cls) -> "TTSCache":
+        max_disk = os.getenv("TTS_CACHE_DISK_BYTES")
+        return cls(
+            max_bytes=int(os.getenv("TTS_CACHE_BYTES", str(64 * 1024 * 1024))),
+            disk_dir=os.getenv("TTS_CACHE_DIR"),  # e.g. cache/tts
+            max_disk_bytes=int(max_disk) if max_disk else None
+        )
+
+    @staticmethod
+    def make_key(text: str, lang: str = "en", voice: str = "default", peak_normalized: bool = True) -> str:
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        # Clip keys are unchanged from before raw chunks were cached, so existing disk entries still hit
+        kind = "" if peak_normalized else "raw\0"
+        return hashlib.sha256(f"{kind}{lang.lower()}\0{voice}\0{normalized}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pcm")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+        if self.disk_dir:
+            audio = self._get_disk(key)
+            if audio is not None:
+                return audio
+        self.misses += 1
+        return None
+
+    def _get_disk(self, key: str) -> Optional[np.ndarray]:
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        # Empty files can't be mapped; they are cached silence
+        audio = np.memmap(path, dtype="<f4", mode="r") if size else np.zeros(0, dtype=np.float32)
+        os.utime(path)  # Recency for disk eviction
+        self.disk_hits += 1
+        self.hits += 1
+        self._set_memory(key, audio)
+        return audio
+
+    def set(self, key: str, audio: np.ndarray):
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        audio.setflags(write=False)  # Shared by every caller that hits this entry
+        self._set_memory(key, audio)
+        if self.disk_dir:
+            self._set_disk(key, audio)
+
+    def _set_memory(self, key: str, audio: np.ndarray):
+        if audio.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.nbytes
+            self._entries[key] = audio
+            self.bytes += audio.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def _set_disk(self, key: str, audio: np.ndarray):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            audio.astype("<f4", copy=False).tofile(tmp_path)
+            # Atomic, so concurrent readers never map a half-written file
+            os.replace(tmp_path, path)
+            self.disk_bytes += audio.nbytes
+        except OSError as e:
+            logger.error("Error writing TTS cache file: %s", e)
+            return
+        if self.max_disk_bytes is not None and self.disk_bytes > self.max_disk_bytes:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        """Remove least recently used files until the directory fits max_disk_bytes"""
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith(".pcm"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        self.disk_bytes = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                self.disk_bytes -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "disk_bytes": self.disk_bytes if self.disk_dir else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+        }
+
+def _retrieve(task: asyncio.Task):
+    """Mark a shared synthesis's failure seen, for when every caller has gone away"""
+    if not task.cancelled():
+        task.exception()
+
+class CachedTTS:
+    """
+    Model handle serving synthesize() from a TTSCache in front of a TTS service or pool proxy
+    Hits never reach the model, so they cost neither a worker hop nor torch;
+    concurrent identical misses share one synthesis
+    """
+    def __init__(self, tts_service, cache: Optional[TTSCache] = None):
+        self.tts_service = tts_service
+        self.cache = cache or TTSCache()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def call(self, method: str, *args, session_id: Optional[str] = None, **kwargs):
+        if method != "synthesize":
+            return await run_model(self.tts_service, method, *args, session_id=session_id, **kwargs)
+        return await self.synthesize(*args, session_id=session_id, **kwargs)
+
+    async def synthesize(
+        self,
+        text: str,
+        lang: str = "en",
+        voice: str = "default",
+        session_id: Optional[str] = None
+    ) -> np.ndarray:
+        key = self.cache.make_key(text, lang, voice)
+        if self.cache.disk_dir:
+            cached = await asyncio.to_thread(self.cache.get, key)
+        else:
+            cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.cache.coalesced += 1
+        else:
+            # Synthesis runs as its own task, so a caller that goes away doesn't take it from the others
+            inflight = asyncio.create_task(self._fill(key, text, lang, voice))
+            inflight.add_done_callback(_retrieve)
+            self._inflight[key] = inflight
+        return await asyncio.shield(inflight)
+
+    async def _fill(self, key: str, text: str, lang: str, voice: str) -> np.ndarray:
+        try:
+            # Not tagged with the first caller's session: cancelling that session mustn't cancel the others'
+            audio = await run_model(self.tts_service, "synthesize", text, lang=lang, voice=voice)
+            # Failed synthesis comes back empty; don't pin that as the answer
+            if len(audio) > 0:
+                if self.cache.disk_dir:
+                    await asyncio.to_thread(self.cache.set, key, audio)
+                else:
+                    self.cache.set(key, audio)
+            return audio
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return self.cache.stats()
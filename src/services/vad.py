@@ -0,0 +1,101 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+class VoiceActivityDetector:
+    """
+    Energy + zero-crossing-rate voice activity detection, vectorized over frames
+    A frame is voiced when it is loud enough above the estimated noise floor
+    and not dominated by high-ZCR noise; hangover keeps short pauses inside
+    a segment and bursts shorter than min_speech_ms are dropped
+    """
+    def __init__(
+        self,
+        frame_ms: float = 30.0,
+        energy_threshold_db: float = -45.0,
+        noise_margin_db: float = 10.0,
+        zcr_threshold: float = 0.25,
+        loud_margin_db: float = 20.0,
+        hangover_ms: float = 300.0,
+        min_speech_ms: float = 150.0
+    ):
+        self.frame_ms = frame_ms
+        self.energy_threshold_db = energy_threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.zcr_threshold = zcr_threshold
+        self.loud_margin_db = loud_margin_db
+        self.hangover_ms = hangover_ms
+        self.min_speech_ms = min_speech_ms
+
+    def _frames(self, audio: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, int]:
+        frame_len = max(1, int(sample_rate * self.frame_ms / 1000))
+        n_frames = len(audio) // frame_len
+        # Non-overlapping frames as a reshaped view; the ragged tail is ignored
+        return audio[:n_frames * frame_len].reshape(n_frames, frame_len), frame_len
+
+    def frame_flags(self, audio: np.ndarray, sample_rate: int = 16000) -> Tuple[np.ndarray, int]:
+        """Return (per-frame voiced flags, frame length in samples)"""
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        frames, frame_len = self._frames(audio, sample_rate)
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool), frame_len
+
+        energy_db = 10 * np.log10(np.mean(np.square(frames, dtype=np.float32), axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_len
+
+        # Raise the threshold above the noise floor only when the buffer has quiet
+        # frames to estimate it from; uniformly loud buffers use the absolute threshold
+        noise_floor, peak = np.percentile(energy_db, [10, 90])
+        threshold = self.energy_threshold_db
+        if peak - noise_floor > self.noise_margin_db:
+            threshold = max(threshold, noise_floor + self.noise_margin_db)
+        voiced = (energy_db > threshold) & (
+            (zcr < self.zcr_threshold) | (energy_db > threshold + self.loud_margin_db)
+        )
+
+        # Hangover: a voiced frame keeps the following frames voiced
+        hangover = int(self.hangover_ms / self.frame_ms)
+        if hangover > 0 and voiced.any():
+            voiced = np.convolve(voiced.astype(np.int32), np.ones(hangover + 1, dtype=np.int32))[:len(voiced)] > 0
+
+        # Drop bursts too short to be speech
+        min_frames = int(self.min_speech_ms / self.frame_ms) + hangover
+        if min_frames > 1 and voiced.any():
+            edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+            starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+            for start, end in zip(starts, ends):
+                if end - start < min_frames:
+                    voiced[start:end] = False
+        return voiced, frame_len
+
+    def segments(
+        self,
+        audio: np.ndarray,
+        sample_rate: int = 16000
+    ) -> List[Tuple[float, float, np.ndarray]]:
+        """
+        Find voiced regions
+        Returns (start_seconds, end_seconds, audio view) tuples
+        """
+        voiced, frame_len = self.frame_flags(audio, sample_rate)
+        if not voiced.any():
+            return []
+        edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        return [
+            (
+                start * frame_len / sample_rate,
+                end * frame_len / sample_rate,
+                audio[start * frame_len:end * frame_len]
+            )
+            for start, end in zip(starts, ends)
+        ]
+
+    def is_speech(self, audio: np.ndarray, sample_rate: int = 16000) -> bool:
+        voiced, _ = self.frame_flags(audio, sample_rate)
+        return bool(voiced.any())
+
+    def speech_ratio(self, audio: np.ndarray, sample_rate: int = 16000) -> Optional[float]:
+        voiced, _ = self.frame_flags(audio, sample_rate)
+        return float(voiced.mean()) if len(voiced) else None
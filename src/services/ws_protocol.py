@@ -0,0 +1,201 @@
+import base64
+import io
+import json
+import struct
+import time
+from typing import Optional, Tuple, Union
+import numpy as np
+from src.models.translation import TranslationResponse
+from src.services.audio_ingest import (
+    TARGET_SAMPLE_RATE,
+    decode_audio,
+    load_audio,
+    pcm_to_float32,
+    prepare_audio,
+    wav_payload
+)
+
+# Binary frame: 4-byte big-endian header length, header (JSON or msgpack), payload
+_FRAME_PREFIX = struct.Struct(">I")
+
+AUDIO_FORMATS = ("pcm_s16le", "wav", "opus")
+HEADER_CODECS = ("json", "msgpack")
+
+def _msgpack():
+    try:
+        import msgpack
+        return msgpack
+    except ImportError:
+        return None
+
+def encode_frame(header: dict, payload: Union[bytes, memoryview] = b"", header_codec: str = "json") -> bytes:
+    if header_codec == "msgpack":
+        packed = _msgpack().packb(header, use_bin_type=True)
+    else:
+        packed = json.dumps(header, separators=(",", ":")).encode()
+    return b"".join((_FRAME_PREFIX.pack(len(packed)), packed, payload))
+
+def decode_frame(data: bytes, header_codec: str = "json") -> Tuple[dict, memoryview]:
+    """Split a binary frame into its header and a view of the payload"""
+    view = memoryview(data)
+    (length,) = _FRAME_PREFIX.unpack_from(view)
+    end = _FRAME_PREFIX.size + length
+    if end > len(view):
+        raise ValueError("Frame header length exceeds frame size")
+    header = view[_FRAME_PREFIX.size:end]
+    if header_codec == "msgpack":
+        return _msgpack().unpackb(header, raw=False), view[end:]
+    return json.loads(bytes(header)), view[end:]
+
+def encode_samples(samples: np.ndarray, sample_rate: int, audio_format: str) -> Tuple[bytes, dict]:
+    """Encode float32 samples as raw 16-bit PCM, WAV, FLAC or Opus"""
+    channels = 1 if samples.ndim == 1 else samples.shape[1]
+    meta = {"format": audio_format, "sample_rate": sample_rate, "channels": channels}
+    if audio_format == "pcm_s16le":
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes(), meta
+    import soundfile as sf
+    with io.BytesIO() as audio_buffer:
+        if audio_format == "opus":
+            sf.write(audio_buffer, samples, sample_rate, format="OGG", subtype="OPUS")
+        elif audio_format == "flac":
+            sf.write(audio_buffer, samples, sample_rate, format="FLAC", subtype="PCM_16")
+        else:
+            sf.write(audio_buffer, samples, sample_rate, format="WAV")
+        return audio_buffer.getvalue(), meta
+
+def encode_audio(wav: bytes, audio_format: str) -> Tuple[Union[bytes, memoryview], dict]:
+    """
+    Re-package a WAV for a binary frame
+    16-bit WAVs become raw PCM by slicing off the header, without copying
+    """
+    format_code, channels, sample_rate, bits, payload = wav_payload(wav)
+    if audio_format == "wav":
+        return wav, {"format": "wav", "sample_rate": sample_rate, "channels": channels}
+    if audio_format == "pcm_s16le" and format_code == 1 and bits == 16:
+        return payload, {"format": "pcm_s16le", "sample_rate": sample_rate, "channels": channels}
+    samples, sample_rate = decode_audio(wav)
+    return encode_samples(samples, sample_rate, audio_format)
+
+class WebSocketProtocol:
+    """
+    Wire format of one /ws connection, chosen by the client at connect time
+
+    json (default, what existing clients speak): text frames; audio is a
+    base64 WAV in the audio_data field
+    binary (?protocol=binary&header=json|msgpack&audio=pcm_s16le|wav|opus):
+    every message is one binary frame with a small header; audio travels
+    as the raw payload instead of base64 text. Uploaded audio is framed the
+    same way, with {"type": "audio", "encoding": ..., "sample_rate": ...}
+
+    Control messages from the client are JSON text frames in both modes
+    """
+    def __init__(self, mode: str = "json", header_codec: str = "json", audio_format: str = "pcm_s16le"):
+        self.mode = mode
+        self.header_codec = header_codec
+        self.audio_format = audio_format
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.encode_seconds = 0.0
+
+    @classmethod
+    def negotiate(cls, params) -> "WebSocketProtocol":
+        if params.get("protocol") != "binary":
+            return cls()
+        header_codec = params.get("header", "json")
+        if header_codec not in HEADER_CODECS or (header_codec == "msgpack" and _msgpack() is None):
+            header_codec = "json"
+        audio_format = params.get("audio", "pcm_s16le")
+        if audio_format not in AUDIO_FORMATS:
+            audio_format = "pcm_s16le"
+        return cls("binary", header_codec, audio_format)
+
+    @property
+    def binary(self) -> bool:
+        return self.mode == "binary"
+
+    def hello(self) -> Optional[dict]:
+        """What was agreed, sent first to binary clients; JSON clients get nothing extra"""
+        if not self.binary:
+            return None
+        return {
+            "type": "hello",
+            "protocol": self.mode,
+            "header": self.header_codec,
+            "audio": self.audio_format,
+        }
+
+    def encode(self, message: dict) -> Union[str, bytes]:
+        if self.binary:
+            return encode_frame(message, header_codec=self.header_codec)
+        return json.dumps(message)
+
+    def encode_response(self, response: TranslationResponse) -> Union[str, bytes]:
+        if not self.binary:
+            return json.dumps(response.dict())
+        header = response.dict(exclude={"audio_data"})
+        header["type"] = "translation"
+        payload = b""
+        if response.audio_data:
+            payload, header["audio"] = encode_audio(response.audio_data, self.audio_format)
+        return encode_frame(header, payload, self.header_codec)
+
+    def encode_audio_chunk(self, header: dict, samples: np.ndarray, sample_rate: int) -> Union[str, bytes]:
+        """One piece of streamed audio; JSON clients get it as a base64 WAV"""
+        if not self.binary:
+            wav, _ = encode_samples(samples, sample_rate, "wav")
+            return json.dumps({**header, "audio_data": base64.b64encode(wav).decode()})
+        payload, meta = encode_samples(samples, sample_rate, self.audio_format)
+        return encode_frame({**header, "audio": meta}, payload, self.header_codec)
+
+    async def _send(self, websocket, data: Union[str, bytes]):
+        if isinstance(data, bytes):
+            await websocket.send_bytes(data)
+            self.bytes_sent += len(data)
+        else:
+            await websocket.send_text(data)
+            self.bytes_sent += len(data.encode())
+        self.messages_sent += 1
+
+    async def send_encoded(self, websocket, data: Union[str, bytes]):
+        """Send a message encoded earlier, e.g. once for many listeners"""
+        await self._send(websocket, data)
+
+    async def send(self, websocket, message: dict):
+        start = time.perf_counter()
+        data = self.encode(message)
+        self.encode_seconds += time.perf_counter() - start
+        await self._send(websocket, data)
+
+    async def send_response(self, websocket, response: TranslationResponse):
+        start = time.perf_counter()
+        data = self.encode_response(response)
+        self.encode_seconds += time.perf_counter() - start
+        await self._send(websocket, data)
+
+    async def send_audio(self, websocket, header: dict, samples: np.ndarray, sample_rate: int):
+        start = time.perf_counter()
+        data = self.encode_audio_chunk(header, samples, sample_rate)
+        self.encode_seconds += time.perf_counter() - start
+        await self._send(websocket, data)
+
+    def read_audio(self, data: bytes) -> np.ndarray:
+        """Uploaded audio as the pipeline's 16 kHz mono buffer"""
+        if not self.binary:
+            return load_audio(data)
+        header, payload = decode_frame(data, self.header_codec)
+        encoding = header.get("encoding", "wav")
+        if encoding in ("pcm_s16le", "pcm_f32le"):
+            samples = pcm_to_float32(payload, encoding)
+            channels = int(header.get("channels", 1))
+            if channels > 1:
+                samples = samples[:len(samples) // channels * channels].reshape(-1, channels)
+            return prepare_audio(samples, int(header.get("sample_rate", TARGET_SAMPLE_RATE)))
+        return load_audio(payload)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "messages_sent": self.messages_sent,
+            "bytes_sent": self.bytes_sent,
+            "encode_ms": self.encode_seconds * 1000,
+        }
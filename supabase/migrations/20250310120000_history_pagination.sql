@@ -0,0 +1,30 @@
+/*
+  # Index translation history for paginated, filtered reads
+
+  1. Indexes
+    - `translations_user_created_idx` on (user_id, created_at desc, id desc)
+      - Serves the history listing and its keyset cursor, newest first
+    - `translations_user_langs_created_idx` on (user_id, source_lang, target_lang, created_at desc, id desc)
+      - Serves the same listing filtered by language pair
+
+  2. Full-text search
+    - `search` (tsvector), generated from `original_text` and `translated_text`
+      - Uses the `simple` configuration: no stemming or stop words, so it
+        behaves the same for every language the app translates
+    - `translations_search_idx`, a GIN index on `search`
+*/
+
+CREATE INDEX IF NOT EXISTS translations_user_created_idx
+  ON translations (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS translations_user_langs_created_idx
+  ON translations (user_id, source_lang, target_lang, created_at DESC, id DESC);
+
+ALTER TABLE translations
+  ADD COLUMN IF NOT EXISTS search tsvector
+  GENERATED ALWAYS AS (
+    to_tsvector('simple', coalesce(original_text, '') || ' ' || coalesce(translated_text, ''))
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS translations_search_idx
+  ON translations USING GIN (search);
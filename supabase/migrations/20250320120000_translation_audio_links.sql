@@ -0,0 +1,18 @@
+/*
+  # Let users link audio to their own translations
+
+  1. Security
+    - Add a policy for authenticated users to:
+      - Update their own translations
+    - Audio is uploaded after its translation row is written, and the row's
+      `audio_url` is set afterwards; without an UPDATE policy that update
+      matches no rows
+*/
+
+-- Policy to allow users to update their own translations
+CREATE POLICY "Users can update own translations"
+  ON translations
+  FOR UPDATE
+  TO authenticated
+  USING (auth.uid() = user_id)
+  WITH CHECK (auth.uid() = user_id);